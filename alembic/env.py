@@ -12,6 +12,7 @@ from botcommand.models.model import BotCommandModel
 from role.models.model import RoleModel
 from permission.models.model import PermissionModel
 from bot_request.models.model import BotRequestModel
+from bot_request.models.rollup import BotRequestRollupModel
 from config import get_settings
 
 # this is the Alembic Config object, which provides
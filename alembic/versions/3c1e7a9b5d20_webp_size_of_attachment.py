@@ -0,0 +1,28 @@
+"""webp size of attachment
+
+Revision ID: 3c1e7a9b5d20
+Revises: 8397fee27e3a
+Create Date: 2026-10-19 12:04:11.208431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e7a9b5d20'
+down_revision: Union[str, Sequence[str], None] = '8397fee27e3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attachment', sa.Column('webp_size', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('attachment', 'webp_size')
@@ -0,0 +1,28 @@
+"""tg file id of attachment
+
+Revision ID: 6a0d2f4c8e51
+Revises: 3c1e7a9b5d20
+Create Date: 2026-10-19 15:37:42.519806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a0d2f4c8e51'
+down_revision: Union[str, Sequence[str], None] = '3c1e7a9b5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attachment', sa.Column('tg_file_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('attachment', 'tg_file_id')
@@ -0,0 +1,30 @@
+"""phash of attachment
+
+Revision ID: 9d4b7e2a1f63
+Revises: 6a0d2f4c8e51
+Create Date: 2026-10-19 17:12:08.304127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4b7e2a1f63'
+down_revision: Union[str, Sequence[str], None] = '6a0d2f4c8e51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attachment', sa.Column('phash', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_attachment_phash'), 'attachment', ['phash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attachment_phash'), table_name='attachment')
+    op.drop_column('attachment', 'phash')
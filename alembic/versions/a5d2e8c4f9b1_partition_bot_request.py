@@ -0,0 +1,97 @@
+"""partition bot_request by month
+
+Revision ID: a5d2e8c4f9b1
+Revises: f1c6d3a8e2b7
+Create Date: 2026-10-19 21:26:44.905137
+
+"""
+from datetime import UTC, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d2e8c4f9b1'
+down_revision: Union[str, Sequence[str], None] = 'f1c6d3a8e2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Секции создаются заранее на столько месяцев вперед
+PREMAKE_MONTHS = 3
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('ALTER TABLE bot_request RENAME TO bot_request_old')
+    op.execute('ALTER TABLE bot_request_old RENAME CONSTRAINT bot_request_pkey TO bot_request_old_pkey')
+    op.execute('ALTER TABLE bot_request_old RENAME CONSTRAINT bot_request_user_id_fkey TO bot_request_old_user_id_fkey')
+
+    # Ключ секционирования должен входить в первичный ключ
+    op.execute(
+        "CREATE TABLE bot_request ("
+        "user_id BIGINT NOT NULL, "
+        "text VARCHAR NOT NULL, "
+        "request_type VARCHAR NOT NULL, "
+        "send_datetime TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "id INTEGER NOT NULL DEFAULT nextval('bot_request_id_seq'), "
+        "CONSTRAINT bot_request_pkey PRIMARY KEY (id, send_datetime), "
+        "CONSTRAINT bot_request_user_id_fkey FOREIGN KEY (user_id) "
+        "REFERENCES users (id) ON DELETE CASCADE"
+        ") PARTITION BY RANGE (send_datetime)"
+    )
+    op.execute('ALTER SEQUENCE bot_request_id_seq OWNED BY bot_request.id')
+
+    # ### Monthly partitions: from the oldest request up to PREMAKE_MONTHS ahead ###
+    now = datetime.now(UTC)
+    oldest = op.get_bind().execute(sa.text('SELECT min(send_datetime) FROM bot_request_old')).scalar()
+    month = (oldest or now).astimezone(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), PREMAKE_MONTHS)
+    while month <= last:
+        upto = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE bot_request_y{month.year:04d}m{month.month:02d} "
+            f"PARTITION OF bot_request "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upto.isoformat()}')"
+        )
+        month = upto
+
+    op.execute(
+        'INSERT INTO bot_request (user_id, text, request_type, send_datetime, id) '
+        'SELECT user_id, text, request_type, send_datetime, id FROM bot_request_old'
+    )
+    op.execute('DROP TABLE bot_request_old')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('ALTER TABLE bot_request RENAME TO bot_request_partitioned')
+    op.execute('ALTER TABLE bot_request_partitioned RENAME CONSTRAINT bot_request_pkey TO bot_request_partitioned_pkey')
+    op.execute(
+        'ALTER TABLE bot_request_partitioned '
+        'RENAME CONSTRAINT bot_request_user_id_fkey TO bot_request_partitioned_user_id_fkey'
+    )
+    op.create_table('bot_request',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('text', sa.String(), nullable=False),
+    sa.Column('request_type', sa.String(), nullable=False),
+    sa.Column('send_datetime', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('bot_request_id_seq')"), nullable=False),
+    # Имена явно: у секций остаются ограничения bot_request_user_id_fkey,
+    # и автоматическое имя получило бы суффикс
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='bot_request_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id', name='bot_request_pkey')
+    )
+    op.execute('ALTER SEQUENCE bot_request_id_seq OWNED BY bot_request.id')
+    op.execute(
+        'INSERT INTO bot_request (user_id, text, request_type, send_datetime, id) '
+        'SELECT user_id, text, request_type, send_datetime, id FROM bot_request_partitioned'
+    )
+    # Секции удаляются вместе с секционированной таблицей
+    op.execute('DROP TABLE bot_request_partitioned')
@@ -0,0 +1,34 @@
+"""bot request rollup
+
+Revision ID: b7e3c5a9d812
+Revises: 9d4b7e2a1f63
+Create Date: 2026-10-19 19:04:51.772310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c5a9d812'
+down_revision: Union[str, Sequence[str], None] = '9d4b7e2a1f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'bot_request_rollup',
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'text'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('bot_request_rollup')
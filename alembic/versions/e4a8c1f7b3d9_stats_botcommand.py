@@ -0,0 +1,43 @@
+"""stats botcommand
+
+Revision ID: e4a8c1f7b3d9
+Revises: b7e3c5a9d812
+Create Date: 2026-10-19 20:12:37.418026
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a8c1f7b3d9'
+down_revision: Union[str, Sequence[str], None] = 'b7e3c5a9d812'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Идентификаторы команд заданы явно в fill_db, поэтому берем следующий за максимальным
+    op.execute(
+        "INSERT INTO botcommands (id, name) "
+        "SELECT COALESCE(MAX(id), 0) + 1, 'stats' FROM botcommands "
+        "WHERE NOT EXISTS (SELECT 1 FROM botcommands WHERE name = 'stats')"
+    )
+    # ### Admin role only ###
+    op.execute(
+        "INSERT INTO permissions (role_id, botcommand_id) "
+        "SELECT 1, id FROM botcommands WHERE name = 'stats' "
+        "ON CONFLICT DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "DELETE FROM permissions WHERE botcommand_id IN "
+        "(SELECT id FROM botcommands WHERE name = 'stats')"
+    )
+    op.execute("DELETE FROM botcommands WHERE name = 'stats'")
@@ -0,0 +1,56 @@
+"""unique names of global_var and botcommands
+
+Revision ID: f1c6d3a8e2b7
+Revises: e4a8c1f7b3d9
+Create Date: 2026-10-19 20:41:09.263514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6d3a8e2b7'
+down_revision: Union[str, Sequence[str], None] = 'e4a8c1f7b3d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Уникальность нужна для INSERT ... ON CONFLICT (name)
+    # ### Удаление дубликатов: у переменных остается последняя запись ###
+    op.execute(
+        'DELETE FROM global_var g USING global_var newer '
+        'WHERE newer.name = g.name AND newer.id > g.id'
+    )
+    # ### У команд остается первая запись, доступ к дубликатам переносится на нее ###
+    op.execute(
+        'INSERT INTO permissions (role_id, botcommand_id) '
+        'SELECT p.role_id, kept.id FROM permissions p '
+        'JOIN botcommands b ON b.id = p.botcommand_id '
+        'JOIN botcommands kept ON kept.name = b.name AND kept.id < b.id '
+        'WHERE NOT EXISTS ('
+        'SELECT 1 FROM botcommands older WHERE older.name = b.name AND older.id < kept.id'
+        ') '
+        'ON CONFLICT DO NOTHING'
+    )
+    op.execute(
+        'DELETE FROM permissions p USING botcommands b, botcommands kept '
+        'WHERE b.id = p.botcommand_id AND kept.name = b.name AND kept.id < b.id'
+    )
+    op.execute(
+        'DELETE FROM botcommands b USING botcommands kept '
+        'WHERE kept.name = b.name AND kept.id < b.id'
+    )
+
+    op.create_unique_constraint('global_var_name_key', 'global_var', ['name'])
+    op.create_unique_constraint('botcommands_name_key', 'botcommands', ['name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('botcommands_name_key', 'botcommands', type_='unique')
+    op.drop_constraint('global_var_name_key', 'global_var', type_='unique')
@@ -0,0 +1,26 @@
+#!/bin/bash
+set -e
+
+# Потоковая реплика основной БД (сервис db_replica, профиль replica).
+# При первом запуске копия данных снимается pg_basebackup: -R записывает
+# standby.signal и primary_conninfo, -C -S создает слот репликации, чтобы
+# основная БД не удалила WAL, который реплика еще не получила
+export PGPASSWORD="${POSTGRES__PASSWORD}"
+SLOT_NAME=db_replica
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_isready -h db -p "${POSTGRES__PORT}" -U "${POSTGRES__USER}"; do
+        sleep 1
+    done
+    # Слот мог остаться от прошлой реплики, данные которой удалены
+    psql -h db -p "${POSTGRES__PORT}" -U "${POSTGRES__USER}" -d "${POSTGRES__DB}" -c \
+        "SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots WHERE slot_name = '${SLOT_NAME}'"
+
+    mkdir -p "$PGDATA"
+    chown postgres:postgres "$PGDATA"
+    chmod 0700 "$PGDATA"
+    gosu postgres pg_basebackup -h db -p "${POSTGRES__PORT}" -U "${POSTGRES__USER}" \
+        -D "$PGDATA" -R -X stream -C -S "${SLOT_NAME}" --checkpoint=fast
+fi
+
+exec docker-entrypoint.sh postgres -c hot_standby=on
@@ -0,0 +1,7 @@
+#!/bin/bash
+set -e
+
+# Разрешает подключения репликации (pg_basebackup и потоковая репликация
+# для сервиса db_replica). Запускается образом postgres при создании БД
+# из /docker-entrypoint-initdb.d
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
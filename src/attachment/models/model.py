@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from base.model import BaseModel
 from attachment.schemas.schema import (
@@ -19,6 +19,14 @@ class AttachmentModel(BaseModel):
         file_name (Mapped[str]): Имя файла
         file_extension (Mapped[str]): Расширение файла
         file_size (Mapped[int]): Размер файла в байтах
+        width (Mapped[int]): Ширина медиа файла
+        height (Mapped[int]): Высота медиа файла
+        webp_size (Mapped[int]): Размер WebP-варианта в байтах. \
+            `None` - вариант не создавался, `0` - вариант не меньше оригинала
+        tg_file_id (Mapped[str]): `file_id` файла в Telegram после первой \
+            отправки ботом. Повторные отправки используют его вместо загрузки файла
+        phash (Mapped[int]): Перцептивный хеш (dHash) изображения. \
+            Почти одинаковые изображения имеют близкие хеши
     '''
     __tablename__ = 'attachment'
 
@@ -34,6 +42,9 @@ class AttachmentModel(BaseModel):
     file_size: Mapped[int] = mapped_column()
     width: Mapped[int] = mapped_column(nullable=True)
     height: Mapped[int] = mapped_column(nullable=True)
+    webp_size: Mapped[int] = mapped_column(nullable=True)
+    tg_file_id: Mapped[str] = mapped_column(nullable=True)
+    phash: Mapped[int] = mapped_column(BigInteger, nullable=True, index=True)
 
     message: Mapped['MessageModel'] = relationship(
         'MessageModel',
@@ -88,6 +99,8 @@ class AttachmentModel(BaseModel):
                 file_size=schema.file_size,
                 width=schema.width,
                 height=schema.height,
+                webp_size=schema.webp_size,
+                phash=schema.phash,
             )
         elif type(schema) is AttachmentMinioSchema:
             return cls(
@@ -98,6 +111,8 @@ class AttachmentModel(BaseModel):
                 file_size=schema.file_size,
                 width=schema.width,
                 height=schema.height,
+                webp_size=schema.webp_size,
+                phash=schema.phash,
             )
         else:
             return cls(
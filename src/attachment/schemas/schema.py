@@ -32,9 +32,13 @@ class AttachmentMinioSchema(AttachmentSimpleSchema):
         file_size (int): Размер файла (байт)
         width (int): Ширина медиа файла
         height (int): Высота медиа файла
+        webp_size (int | None): Размер WebP-варианта (байт)
+        phash (int | None): Перцептивный хеш изображения
     '''
 
     # minio_file_url: str | None
+    webp_size: int | None = None
+    phash: int | None = None
 
 
 class AttachmentSchema(AttachmentMinioSchema):
@@ -50,6 +54,8 @@ class AttachmentSchema(AttachmentMinioSchema):
         file_size (int): Размер файла (байт)
         width (int): Ширина медиа файла
         height (int): Высота медиа файла
+        webp_size (int | None): Размер WebP-варианта (байт)
+        phash (int | None): Перцептивный хеш изображения
     '''
 
     tg_msg_id: int
@@ -0,0 +1,354 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncGenerator, Awaitable, Callable
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from db.database import async_session
+from attachment.models.model import AttachmentModel
+from attachment.repositories.repository import AttachmentRepository
+from global_var.services.service import GlobalVarService
+from storage.services.minio_service import MinioService
+
+
+class AttachmentBackfillService:
+    '''
+    Фоновая обработка уже загруженного медиа-контента. Строки `attachment` \
+        обходятся пачками по `id` (keyset), каждая пачка - в отдельной \
+        сессии БД, а объекты MinIO обрабатываются параллельно с \
+        ограничением количества одновременных запросов
+    '''
+
+    def __init__(
+        self,
+        minio_service: MinioService,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        concurrency: int = 8,
+        batch_size: int = 500,
+    ) -> None:
+        '''
+        Фоновая обработка уже загруженного медиа-контента
+
+        Args:
+            minio_service (MinioService): Сервис MinIO
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            concurrency (int): Количество одновременных запросов к MinIO
+            batch_size (int): Количество строк `attachment` в пачке
+        '''
+        self.minio_service = minio_service
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.logger = logging.getLogger('tg_logger')
+        self.__settings = get_settings()
+
+    async def __iter_batches(self, *where: Any, last_id: int = 0) -> AsyncGenerator[list[AttachmentModel]]:
+        '''
+        Обход строк `attachment` пачками по возрастанию `id`
+
+        Args:
+            *where (Any): Дополнительные условия выборки
+            last_id (int): `id`, после которого начинается обход. По-умолчанию: `0`
+
+        Yields:
+            list[AttachmentModel]: Пачка медиафайлов, отсоединенная от сессии
+        '''
+        while True:
+            async with self.session_factory() as db:
+                batch = list((await db.scalars(
+                    select(AttachmentModel)
+                    .where(AttachmentModel.id > last_id, *where)
+                    .order_by(AttachmentModel.id)
+                    .limit(self.batch_size)
+                )).all())
+                db.expunge_all()
+
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield batch
+
+    async def __run_batch(
+        self,
+        batch: list[AttachmentModel],
+        handler: Callable[[AttachmentModel, list[dict[str, Any]]], Awaitable[str]],
+        stats: dict[str, int],
+        rows: list[dict[str, Any]],
+    ) -> list[int]:
+        '''
+        Параллельная обработка пачки медиафайлов
+
+        Args:
+            batch (list[AttachmentModel]): Пачка медиафайлов
+            handler (Callable[[AttachmentModel, list[dict[str,Any]]], Awaitable[str]]): \
+                Обработка медиафайла. Строки для массового UPDATE добавляет \
+                в переданный список, возвращает ключ `stats`
+            stats (dict[str,int]): Счетчики прогресса
+            rows (list[dict[str,Any]]): Строки для массового UPDATE этой пачки
+
+        Returns:
+            list[int]: `id` медиафайлов, которые не удалось обработать, по возрастанию
+        '''
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed: list[int] = []
+
+        async def run(attachment: AttachmentModel) -> None:
+            async with semaphore:
+                try:
+                    stats[await handler(attachment, rows)] += 1
+                except Exception as e:
+                    stats['failed'] += 1
+                    failed.append(attachment.id)
+                    self.logger.warning(
+                        f'Не удалось обработать {attachment.file_name}.{attachment.file_extension} '
+                        f'(id {attachment.id}): {e}'
+                    )
+
+        await asyncio.gather(*[run(attachment) for attachment in batch])
+        return sorted(failed)
+
+    async def thumbnails(self, force: bool = False) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Создание превью для изображений, загруженных до появления превью
+
+        Args:
+            force (bool): Пересоздать уже существующие превью. По-умолчанию: `False`
+
+        Yields:
+            dict[str,int]: Прогресс после каждой пачки
+        ```
+        {
+            "processed": processed_count, [int]
+            "created": created_count, [int]
+            "skipped": skipped_count, [int]
+            "failed": failed_count [int]
+        }
+        ```
+        '''
+        stats = {'processed': 0, 'created': 0, 'skipped': 0, 'failed': 0}
+
+        async def handle(attachment: AttachmentModel, rows: list[dict[str, Any]]) -> str:
+            object_name = self.minio_service.get_thumbnail_object_name(attachment.file_name)
+            if not force and await self.minio_service.object_exists(object_name):
+                return 'skipped'
+            data = await self.minio_service.get_object_bytes(
+                f'{attachment.file_name}.{attachment.file_extension}'
+            )
+            await self.minio_service.upload_thumbnail(attachment.file_name, data)
+            return 'created'
+
+        image_extensions = self.__settings.attachment.image_extensions
+        async for batch in self.__iter_batches(AttachmentModel.file_extension.in_(image_extensions)):
+            await self.__run_batch(batch, handle, stats, [])
+            stats['processed'] += len(batch)
+            yield dict(stats)
+
+    async def webp(self, workers: int | None = None) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Создание WebP-вариантов для изображений, у которых их еще нет. \
+            Перекодирование выполняется в пуле процессов. Результат \
+            записывается в `attachment.webp_size` после каждой пачки, \
+            поэтому прерванная конвертация продолжится с того же места
+
+        Args:
+            workers (int | None): Количество процессов. По-умолчанию: количество ядер
+
+        Yields:
+            dict[str,int]: Прогресс после каждой пачки
+        ```
+        {
+            "processed": processed_count, [int]
+            "created": created_count, [int]
+            "skipped": not_smaller_count, [int]
+            "failed": failed_count, [int]
+            "original_bytes": original_bytes, [int]
+            "webp_bytes": webp_bytes [int]
+        }
+        ```
+        '''
+        loop = asyncio.get_running_loop()
+        quality = self.__settings.attachment.webp_quality
+        stats = {
+            'processed': 0, 'created': 0, 'skipped': 0, 'failed': 0,
+            'original_bytes': 0, 'webp_bytes': 0,
+        }
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            async def handle(attachment: AttachmentModel, rows: list[dict[str, Any]]) -> str:
+                data = await self.minio_service.get_object_bytes(
+                    f'{attachment.file_name}.{attachment.file_extension}'
+                )
+                encoded = await loop.run_in_executor(pool, MinioService.encode_webp, data, quality)
+                webp_size = await self.minio_service.upload_webp(attachment.file_name, data, encoded)
+                rows.append({'id': attachment.id, 'webp_size': webp_size})
+                if not webp_size:
+                    return 'skipped'
+                stats['original_bytes'] += len(data)
+                stats['webp_bytes'] += webp_size
+                return 'created'
+
+            image_extensions = self.__settings.attachment.image_extensions
+            async for batch in self.__iter_batches(
+                AttachmentModel.file_extension.in_(image_extensions),
+                AttachmentModel.webp_size.is_(None),
+            ):
+                rows: list[dict[str, Any]] = []
+                await self.__run_batch(batch, handle, stats, rows)
+                async with self.session_factory() as db:
+                    await AttachmentRepository(db).bulk_update(AttachmentModel, 'id', rows)
+                    await db.commit()
+                stats['processed'] += len(batch)
+                yield dict(stats)
+
+    async def hashes(self, workers: int | None = None) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Вычисление перцептивных хешей изображений, загруженных до появления \
+            столбца `phash`. Хеши вычисляются в пуле процессов и \
+            записываются после каждой пачки, поэтому прерванное \
+            вычисление продолжится с того же места
+
+        Args:
+            workers (int | None): Количество процессов. По-умолчанию: количество ядер
+
+        Yields:
+            dict[str,int]: Прогресс после каждой пачки
+        ```
+        {
+            "processed": processed_count, [int]
+            "updated": updated_count, [int]
+            "failed": failed_count [int]
+        }
+        ```
+        '''
+        loop = asyncio.get_running_loop()
+        stats = {'processed': 0, 'updated': 0, 'failed': 0}
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            async def handle(attachment: AttachmentModel, rows: list[dict[str, Any]]) -> str:
+                data = await self.minio_service.get_object_bytes(
+                    f'{attachment.file_name}.{attachment.file_extension}'
+                )
+                phash = await loop.run_in_executor(pool, MinioService.image_hash, data)
+                rows.append({'id': attachment.id, 'phash': phash})
+                return 'updated'
+
+            image_extensions = self.__settings.attachment.image_extensions
+            async for batch in self.__iter_batches(
+                AttachmentModel.file_extension.in_(image_extensions),
+                AttachmentModel.phash.is_(None),
+            ):
+                rows: list[dict[str, Any]] = []
+                await self.__run_batch(batch, handle, stats, rows)
+                async with self.session_factory() as db:
+                    await AttachmentRepository(db).bulk_update(AttachmentModel, 'id', rows)
+                    await db.commit()
+                stats['processed'] += len(batch)
+                yield dict(stats)
+
+    async def dimensions(
+        self,
+        rate: float | None = None,
+        header_size: int = 64 * 1024,
+        restart: bool = False,
+    ) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Заполнение `width`/`height` изображений, загруженных до появления \
+            этих столбцов. Из MinIO читается только начало файла \
+            (ranged `get_object`), размер определяется в пуле потоков, \
+            строки обновляются массовым UPDATE. В глобальной переменной \
+            сохраняется `id`, до которого все изображения обработаны без \
+            ошибок, поэтому прерванное заполнение продолжится с того же места, \
+            а изображения с ошибкой будут обработаны при следующем запуске
+
+        Args:
+            rate (float | None): Максимум запросов к MinIO в секунду. `None` - без ограничения
+            header_size (int): Сколько байт читать с начала файла. Если \
+                заголовок не поместился, файл читается целиком
+            restart (bool): Начать с первой строки, а не с сохраненной позиции
+
+        Yields:
+            dict[str,int]: Прогресс после каждой пачки
+        ```
+        {
+            "processed": processed_count, [int]
+            "updated": updated_count, [int]
+            "full_reads": full_reads_count, [int]
+            "failed": failed_count [int]
+        }
+        ```
+        '''
+        cursor_name = 'dimensions_backfill_last_id'
+        stats = {'processed': 0, 'updated': 0, 'full_reads': 0, 'failed': 0}
+
+        interval = 1 / rate if rate else 0
+        throttle_lock = asyncio.Lock()
+        next_request = 0.0
+
+        async def throttle() -> None:
+            nonlocal next_request
+            if not interval:
+                return
+            async with throttle_lock:
+                delay = next_request - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_request = max(next_request, time.monotonic()) + interval
+
+        async def handle(attachment: AttachmentModel, rows: list[dict[str, Any]]) -> str:
+            object_name = f'{attachment.file_name}.{attachment.file_extension}'
+            await throttle()
+            data = await self.minio_service.get_object_bytes(object_name, length=header_size)
+            size = await asyncio.to_thread(MinioService.read_image_size, data)
+
+            if size is None and len(data) >= header_size:
+                stats['full_reads'] += 1
+                await throttle()
+                data = await self.minio_service.get_object_bytes(object_name)
+                size = await asyncio.to_thread(MinioService.read_image_size, data)
+            if size is None:
+                raise ValueError('не удалось определить размер изображения')
+
+            rows.append({'id': attachment.id, 'width': size[0], 'height': size[1]})
+            return 'updated'
+
+        last_id = 0
+        if not restart:
+            async with self.session_factory() as db:
+                last_id = int(await GlobalVarService(db).get_value(cursor_name) or 0)
+        # После первой ошибки позиция больше не сдвигается до конца обхода
+        stalled = False
+
+        image_extensions = self.__settings.attachment.image_extensions
+        async for batch in self.__iter_batches(
+            AttachmentModel.file_extension.in_(image_extensions),
+            or_(
+                AttachmentModel.width.is_(None),
+                AttachmentModel.height.is_(None),
+                AttachmentModel.width == 0,
+            ),
+            last_id=last_id,
+        ):
+            rows: list[dict[str, Any]] = []
+            failed = await self.__run_batch(batch, handle, stats, rows)
+            if not stalled:
+                if failed:
+                    stalled = True
+                    last_id = failed[0] - 1
+                    self.logger.warning(
+                        f'Размеры не определены для id {failed}, '
+                        f'позиция заполнения остается на {last_id}'
+                    )
+                else:
+                    last_id = batch[-1].id
+            elif failed:
+                self.logger.warning(f'Размеры не определены для id {failed}')
+
+            async with self.session_factory() as db:
+                await AttachmentRepository(db).bulk_update(AttachmentModel, 'id', rows)
+                await GlobalVarService(db).set_value(cursor_name, str(last_id))
+                await db.commit()
+            stats['processed'] += len(batch)
+            yield dict(stats)
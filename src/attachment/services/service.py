@@ -1,10 +1,13 @@
 from io import BytesIO
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from PIL import Image
 
 from async_requests import download_file
+from config import get_settings
 from base.service import BaseService
 from attachment.models.model import AttachmentModel
+from attachment.schemas.schema import AttachmentMinioSchema
 from attachment.repositories.repository import AttachmentRepository
 from exceptions.exception import AlreadyExistsError
 from storage.services.minio_service import MinioService
@@ -30,15 +33,33 @@ class AttachmentService(BaseService[AttachmentModel]):
         )
         self.minio_service = minio_service
 
+    @staticmethod
+    def get_media_url(media_msg_id: int) -> str:
+        '''
+        Ссылка на пост канала с медиафайлом, которая сохраняется в `tg_file_url`. \
+            Ссылка не зависит от способа добавления поста (парсинг `t.me/s`, \
+            `channel_post`, экспорт канала), поэтому по ней находятся уже \
+            загруженные медиафайлы. Пост альбома - отдельное сообщение \
+            канала, поэтому у каждого медиафайла альбома своя ссылка
+
+        Args:
+            media_msg_id (int): ID поста с медиафайлом
+
+        Returns:
+            str: Ссылка на пост
+        '''
+        return f'https://t.me/{get_settings().telegram.channel_name}/{media_msg_id}'
+
     async def upload_files(
         self,
-        *tg_msg_data: tuple[int, str]
+        *tg_msg_data: tuple[int, int, str]
     ) -> list[AttachmentModel] | None:
         '''
         Загрузка медиафайлов в MinIO и MinIO-ссылок на них в БД
 
         Args:
-            tg_msg_data (tuple[int, str]): ID сообщения и URL медиа-контента
+            tg_msg_data (tuple[int, int, str]): ID сообщения, ID поста \
+                с медиафайлом и URL, по которому медиафайл скачивается
 
         Returns:
             list[AttachmentModel]|None: SQL-Alchemy созданного медиа-контента
@@ -50,28 +71,150 @@ class AttachmentService(BaseService[AttachmentModel]):
             Exception: Прочие ошибки MinIO
         '''
         models = []
-        for message_id, file_url in tg_msg_data:
+        for message_id, media_msg_id, file_url in tg_msg_data:
             response = await download_file(file_url)
-            file = response['file']
+            model = await self.__store_file(
+                message_id,
+                self.get_media_url(media_msg_id),
+                response['file'],
+                response['ext'],
+            )
+            models.append(model)
+        return models
+
+    async def upload_file_objects(
+        self,
+        *files: tuple[int, int, BytesIO, str]
+    ) -> list[AttachmentModel]:
+        '''
+        Загрузка уже скачанных медиафайлов в MinIO и MinIO-ссылок на них в БД.
+        Файлы, которые уже были загружены ранее, пропускаются
+
+        Args:
+            files (tuple[int, int, BytesIO, str]): ID сообщения, ID поста \
+                с медиафайлом, файл и его расширение
+
+        Returns:
+            list[AttachmentModel]: SQL-Alchemy модели созданного медиа-контента
+
+        Raises:
+            WasNotCreatedError: Не удалось загрузить в MinIO
+            FileIsTooLargeError: Файл слишком большой для MinIO
+            Exception: Прочие ошибки MinIO
+        '''
+        models = []
+        for message_id, media_msg_id, file, file_ext in files:
+            file_url = self.get_media_url(media_msg_id)
+            if await self.exists({'tg_file_url': file_url}, raise_exc=False):
+                continue
+            model = await self.__store_file(message_id, file_url, file, file_ext)
+            models.append(model)
+        return models
+
+    async def __store_file(
+        self,
+        message_id: int,
+        file_url: str,
+        file: BytesIO,
+        file_ext: str,
+    ) -> AttachmentModel:
+        '''
+        Загрузка файла в MinIO и создание записи о нем в БД. Если \
+            включено `attachment.dedup_enabled` и такое же изображение \
+            (тот же перцептивный хеш и размер) уже загружено, новая запись \
+            ссылается на существующий объект, и файл повторно не загружается
+
+        Args:
+            message_id (int): ID сообщения
+            file_url (str): URL медиа-контента
+            file (BytesIO): Файл
+            file_ext (str): Расширение файла
+
+        Returns:
+            AttachmentModel: SQL-Alchemy модель созданного медиа-контента
+
+        Raises:
+            AlreadyExistsError: Данный медиафайл уже загружен
+            Exception: Ошибки MinIO
+        '''
+        settings = get_settings().attachment
+        phash = None
+        minio_schema = None
+        if settings.dedup_enabled and file_ext.lower() in settings.image_extensions:
+            phash = await self.minio_service.compute_image_hash(file.getvalue())
+            size = self.minio_service.read_image_size(file.getvalue())
+            if phash is not None and size is not None and not self.minio_service.is_degenerate_hash(phash):
+                minio_schema = await self.__get_duplicate(phash, *size)
+
+        if minio_schema is None:
             try:
                 minio_schema = await self.minio_service.upload_file(
                     file=file,
-                    file_ext=response['ext']
+                    file_ext=file_ext,
+                    phash=phash,
                 )
             except Exception as exc:
                 raise Exception(f'MinIO: {exc}')
-            else:
-                model = AttachmentModel.from_schema(
-                    minio_schema,
-                    tg_msg_id=message_id,
-                    tg_file_url=file_url,
-                )
 
-                filter = {
-                    'tg_file_url': file_url
-                }
-                if await self.exists(filter, raise_exc=False):
-                    raise AlreadyExistsError('Данный медиафайл уже загружен')
-                model = await self.create(model)
-                models.append(model)
-        return models
+        model = AttachmentModel.from_schema(
+            minio_schema,
+            tg_msg_id=message_id,
+            tg_file_url=file_url,
+        )
+
+        filter = {
+            'tg_file_url': file_url
+        }
+        if await self.exists(filter, raise_exc=False):
+            raise AlreadyExistsError('Данный медиафайл уже загружен')
+        return await self.create(model, refresh=False)
+
+    async def __get_duplicate(self, phash: int, width: int, height: int) -> AttachmentMinioSchema | None:
+        '''
+        Поиск уже загруженного изображения с тем же перцептивным хешем. \
+            Хеш совпадает и у похожих изображений, поэтому дубликатом \
+            считается только изображение того же размера
+
+        Args:
+            phash (int): Перцептивный хеш изображения
+            width (int): Ширина изображения
+            height (int): Высота изображения
+
+        Returns:
+            AttachmentMinioSchema | None: Данные существующего объекта. \
+                `None` - такого изображения нет
+        '''
+        duplicate = await self.repository.scalar_first(
+            select(AttachmentModel)
+            .where(
+                AttachmentModel.phash == phash,
+                AttachmentModel.width == width,
+                AttachmentModel.height == height,
+            )
+            .order_by(AttachmentModel.id)
+            .limit(1)
+        )
+        if duplicate is None:
+            return None
+        return AttachmentMinioSchema(
+            file_name=duplicate.file_name,
+            file_extension=duplicate.file_extension,
+            file_size=duplicate.file_size,
+            width=width,
+            height=height,
+            webp_size=duplicate.webp_size,
+            phash=phash,
+        )
+
+    async def set_tg_file_ids(self, file_ids: dict[int, str]) -> None:
+        '''
+        Сохранение `file_id`, полученных от Telegram после отправки медиафайлов
+
+        Args:
+            file_ids (dict[int, str]): `file_id` по ID медиафайла
+        '''
+        await self.repository.bulk_update(
+            AttachmentModel,
+            'id',
+            [{'id': id, 'tg_file_id': file_id} for id, file_id in file_ids.items()],
+        )
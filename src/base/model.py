@@ -10,6 +10,8 @@ class BaseSimpleModel(DeclarativeBase):
     '''
     __abstract__ = True
     metadata = MetaData()
+    # Значения, сгенерированные БД, возвращаются тем же INSERT/UPDATE ... RETURNING
+    __mapper_args__ = {'eager_defaults': True}
 
     model_config = {
         'from_attributes': True
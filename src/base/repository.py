@@ -1,7 +1,10 @@
-from typing import Any, TypeVar
-from sqlalchemy import ScalarResult, Select, Delete
+from typing import Any, Iterable, TypeVar
+from sqlalchemy import Boolean, ScalarResult, Select, Delete, bindparam, literal_column, text, update
 from typing import Sequence
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import lazyload
+from sqlalchemy.orm.attributes import instance_state
 from base.model import BaseModel, BaseSimpleModel
 
 
@@ -43,47 +46,304 @@ class BaseRepository[T: BaseModel | BaseSimpleModel]:
     ) -> ScalarResult[T] | None:
         return (await self.db.execute(statement)).scalars().unique()
 
-    async def create(self, model: T) -> T:
+    async def create(self, model: T, refresh: bool = True) -> T:
         '''
-        Добавление сущности
+        Добавление сущности. Идентификатор и другие значения, \
+            сгенерированные БД, заполняются из `INSERT ... RETURNING`
 
         Args:
             model (T): SQLAlchemy-модель сущности с обновленными данными
+            refresh (bool): Перечитать сущность со связанными моделями. \
+                Не нужно, если связи не используются или уже заданы
 
         Returns:
             T: модель с обновленными данными
         '''
         self.db.add(model)
         await self.db.flush()
-        if not isinstance(model, BaseSimpleModel):
+        if refresh and not isinstance(model, BaseSimpleModel):
             await self.db.refresh(model)
         return model
 
+    @staticmethod
+    def column_values(model: T) -> dict[str, Any]:
+        '''
+        Значения столбцов модели, которые были заданы. Незаданные (`None`) \
+            пропускаются, чтобы сработали значения по-умолчанию БД
+
+        Args:
+            model (T): SQLAlchemy-модель сущности
+
+        Returns:
+            dict[str, Any]: `{"Название_столбца": Значение}`
+        '''
+        values = {}
+        for attr in instance_state(model).mapper.column_attrs:
+            value = getattr(model, attr.key)
+            if value is not None:
+                values[attr.key] = value
+        return values
+
+    async def insert_or_get(
+        self,
+        model_class: type[T],
+        values: dict[str, Any],
+        index_elements: list[str],
+        load_relationships: bool = True,
+    ) -> tuple[T, bool]:
+        '''
+        Добавление строки или получение существующей одним \
+            `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`. У существующей \
+            строки столбец ограничения "обновляется" тем же значением, \
+            остальные столбцы не меняются
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            values (dict[str, Any]): Значения столбцов
+            index_elements (list[str]): Столбцы ограничения уникальности
+            load_relationships (bool): Подгружать связи с `lazy='selectin'`. \
+                По-умолчанию: `True`. `False` - только столбцы, без \
+                дополнительных запросов
+
+        Returns:
+            tuple[T, bool]: Модель и признак того, что строка добавлена
+        '''
+        statement = insert(model_class).values(values)
+        column = index_elements[0]
+        insert_or_get = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: statement.excluded[column]},
+        ).returning(
+            model_class,
+            # У добавленной строки xmax = 0, у существующей - ID транзакции
+            literal_column('xmax = 0', Boolean),
+        )
+        if not load_relationships:
+            insert_or_get = insert_or_get.options(lazyload('*'))
+        model, created = (await self.db.execute(
+            insert_or_get,
+            execution_options={'populate_existing': True},
+        )).one()
+        return model, created
+
+    async def upsert(
+        self,
+        model_class: type[T],
+        values: dict[str, Any],
+        index_elements: list[str],
+        update_columns: list[str] | None = None,
+    ) -> T:
+        '''
+        Добавление или обновление строки одним \
+            `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            values (dict[str, Any]): Значения столбцов
+            index_elements (list[str]): Столбцы ограничения уникальности
+            update_columns (list[str] | None): Столбцы, обновляемые у \
+                существующей строки. По-умолчанию: `None` - все из \
+                `values`, кроме `index_elements`
+
+        Returns:
+            T: Добавленная или обновленная модель
+        '''
+        if update_columns is None:
+            update_columns = [c for c in values if c not in index_elements]
+        # Без обновляемых столбцов строка "обновляется" тем же значением,
+        # иначе RETURNING не вернет уже существующую строку
+        update_columns = update_columns or index_elements[:1]
+
+        statement = insert(model_class).values(values)
+        upsert = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: statement.excluded[c] for c in update_columns},
+        ).returning(model_class)
+        return (await self.db.scalars(
+            upsert,
+            execution_options={'populate_existing': True},
+        )).one()
+
+    async def copy_to_temp_table(
+        self,
+        model_class: type[T],
+        columns: list[str],
+        records: Iterable[tuple[Any, ...]],
+    ) -> str:
+        '''
+        Загрузка строк через COPY во временную таблицу со столбцами \
+            таблицы модели. Таблица удаляется при завершении транзакции
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            columns (list[str]): Названия заполняемых столбцов
+            records (Iterable[tuple[Any, ...]]): Строки в порядке `columns`
+
+        Returns:
+            str: Имя временной таблицы
+        '''
+        table_name = model_class.__tablename__
+        tmp_table_name = f'tmp_copy_{table_name}'
+        columns_str = ', '.join(f'"{c}"' for c in columns)
+
+        await self.db.execute(text(
+            f'CREATE TEMP TABLE IF NOT EXISTS "{tmp_table_name}" ON COMMIT DROP AS '
+            f'SELECT {columns_str} FROM "{table_name}" WITH NO DATA'
+        ))
+        await self.db.execute(text(f'TRUNCATE "{tmp_table_name}"'))
+
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(  # type: ignore
+            tmp_table_name,
+            records=records,
+            columns=columns,
+        )
+        return tmp_table_name
+
+    async def bulk_insert(
+        self,
+        model_class: type[T],
+        columns: list[str],
+        records: Iterable[tuple[Any, ...]],
+    ) -> int:
+        '''
+        Массовое добавление строк через COPY во временную таблицу \
+            и `INSERT ... SELECT ... ON CONFLICT DO NOTHING`. \
+            Строки, нарушающие ограничения уникальности, пропускаются
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            columns (list[str]): Названия заполняемых столбцов
+            records (Iterable[tuple[Any, ...]]): Строки в порядке `columns`
+
+        Returns:
+            int: Количество добавленных строк
+        '''
+        table_name = model_class.__tablename__
+        columns_str = ', '.join(f'"{c}"' for c in columns)
+        tmp_table_name = await self.copy_to_temp_table(model_class, columns, records)
+
+        result = await self.db.execute(text(
+            f'INSERT INTO "{table_name}" ({columns_str}) '
+            f'SELECT {columns_str} FROM "{tmp_table_name}" '
+            f'ON CONFLICT DO NOTHING'
+        ))
+        return result.rowcount  # type: ignore
+
+    async def bulk_update(
+        self,
+        model_class: type[T],
+        key: str,
+        rows: list[dict[str, Any]],
+    ) -> None:
+        '''
+        Массовое обновление строк одним `UPDATE ... WHERE key = ...` \
+            с executemany
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            key (str): Столбец, по которому ищутся обновляемые строки
+            rows (list[dict[str, Any]]): Новые значения. У всех строк \
+                должен быть одинаковый набор столбцов, включая `key`
+        '''
+        if not rows:
+            return
+        table = model_class.__table__
+        columns = [c for c in rows[0] if c != key]
+        statement = (
+            update(table)  # type: ignore
+            .where(table.c[key] == bindparam(f'b_{key}'))  # type: ignore
+            .values({c: bindparam(f'b_{c}') for c in columns})
+        )
+        await self.db.execute(
+            statement,
+            [{f'b_{c}': v for c, v in row.items()} for row in rows]
+        )
+
     async def update(
         self,
         model: T,
-        filter: dict[str, Any]
-    ) -> T:
+        filter: dict[str, Any],
+        refresh: bool = True,
+    ) -> T | None:
         '''
-        Обновление сущности
+        Обновление сущности одним `UPDATE ... RETURNING`. У модели, \
+            загруженной этой сессией, записываются измененные атрибуты, \
+            у новой модели - заданные (не `None`) столбцы. Возвращенная \
+            строка перезаписывает модель, уже загруженную сессией
 
         Args:
             model (T): SQLAlchemy-модель сущности с обновленными данными
             filter (dict[str, Any]): фильтр поиска сущности в БД \
                 `{"Название_атрибута": Значение_атрибута}`
+            refresh (bool): Подгрузить связи с `lazy='selectin'`. \
+                `False` - только столбцы, без дополнительных запросов
 
         Returns:
-            T: модель с обновленными данными
+            T | None: модель с обновленными данными. `None` - сущность не найдена
 
         Raises:
             ValueError: Неверный фильтр поиска
         '''
         self.check_filters(filter)
-        merged = await self.db.merge(model)
-        await self.db.flush()
-        if not isinstance(merged, BaseSimpleModel):
-            await self.db.refresh(merged)
-        return merged
+        state = instance_state(model)
+        if state.persistent and state.session is self.db.sync_session:
+            values = {
+                attr.key: getattr(model, attr.key)
+                for attr in state.mapper.column_attrs
+                if state.attrs[attr.key].history.has_changes()
+            }
+        else:
+            values = self.column_values(model)
+        # Без изменений строка "обновляется" тем же значением первичного
+        # ключа, чтобы RETURNING вернул ее одним запросом
+        values = values or {c.name: c for c in state.mapper.primary_key}
+
+        model_class = state.mapper.class_
+        statement = update(model_class).filter_by(**filter).values(values).returning(model_class)
+        if not refresh:
+            statement = statement.options(lazyload('*'))
+        # Изменения модели записываются этим же UPDATE, а не автоматическим flush
+        with self.db.no_autoflush:
+            return (await self.db.scalars(
+                statement,
+                execution_options={'populate_existing': True},
+            )).first()
+
+    async def update_returning(
+        self,
+        model_class: type[T],
+        filter: dict[str, Any],
+        values: dict[str, Any],
+    ) -> list[T]:
+        '''
+        Обновление столбцов одним `UPDATE ... RETURNING`. Модели, уже \
+            загруженные сессией, получают новые значения из возвращенных строк
+
+        Args:
+            model_class (type[T]): Класс SQLAlchemy-модели сущности
+            filter (dict[str, Any]): фильтр поиска сущностей в БД \
+                `{"Название_атрибута": Значение_атрибута}`
+            values (dict[str, Any]): Новые значения столбцов
+
+        Returns:
+            list[T]: Обновленные модели
+
+        Raises:
+            ValueError: Неверный фильтр поиска
+        '''
+        self.check_filters(filter)
+        statement = (
+            update(model_class)
+            .filter_by(**filter)
+            .values(values)
+            .returning(model_class)
+        )
+        return list((await self.db.scalars(
+            statement,
+            execution_options={'populate_existing': True},
+        )).all())
 
     async def delete(self, statement: Delete, filter: dict[str, Any]) -> None:
         '''
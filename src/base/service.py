@@ -3,7 +3,7 @@ from typing import Any, TypeVar
 from base.model import BaseModel
 from base.repository import BaseRepository
 from sqlalchemy import Select, delete, select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import lazyload, selectinload
 from exceptions.exception import NotFoundError, WasNotCreatedError
 from sqlalchemy.orm.strategy_options import _AttrType
 
@@ -41,12 +41,13 @@ class BaseService[M]:
         self.single_model_name = single_model_name
         self.multiple_models_name = multiple_models_name
 
-    async def create(self, model: M) -> M:
+    async def create(self, model: M, refresh: bool = True) -> M:
         '''
         Создать новую сущность в базе данных
 
         Args:
             model (M): Данные для создания сущности
+            refresh (bool): Перечитать сущность со связанными моделями
 
         Returns:
             M: SQLAlchemy-модель сущности
@@ -54,13 +55,7 @@ class BaseService[M]:
         Raises:
             WasNotCreatedError: Не удалось создать сущность
         '''
-        try:
-            model = await self.repository.create(model)
-            await self.repository.db.flush()
-        except Exception as e:
-            await self.repository.db.rollback()
-            raise e
-
+        model = await self.repository.create(model, refresh)
         if model is None:
             raise WasNotCreatedError(
                 f'Не удалось создать {self.single_model_name}'
@@ -103,6 +98,95 @@ class BaseService[M]:
             raise self._not_found_by_filter_error(filter)
         return model
 
+    async def get_or_none(
+        self,
+        filter: dict[str, Any],
+        model_attrs: list[_AttrType] = [],
+        load_relationships: bool = True,
+    ) -> M | None:
+        '''
+        Поиск сущности одним запросом, без предварительной проверки \
+            существования
+
+        Args:
+            filter (dict[str, Any]): Фильтр поиска сущности в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+            model_attrs (list[_AttrType]): Дополнительно подгружаемые сложные \
+                аттрибуты SQLAlchemy модели
+            load_relationships (bool): Подгружать связи с `lazy='selectin'`. \
+                По-умолчанию: `True`. `False` - только столбцы и `model_attrs`, \
+                без дополнительных запросов
+
+        Returns:
+            M | None: SQLAlchemy-модель сущности. `None` - не найдена
+        '''
+        statement = self._add_model_attrs_to_statement(
+            select(self.model_class),
+            model_attrs
+        )
+        if not load_relationships:
+            statement = statement.options(lazyload('*'))
+        return await self.repository.scalar_one_or_none(
+            statement.filter_by(**filter)
+        )
+
+    async def get_or_create(
+        self,
+        model: M,
+        index_elements: list[str],
+        load_relationships: bool = True,
+    ) -> tuple[M, bool]:
+        '''
+        Поиск сущности по `index_elements`, а если ее нет - создание \
+            одним `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`. \
+            Связи с `lazy='selectin'` подгружаются отдельными запросами, \
+            если не отключены через `load_relationships`
+
+        Args:
+            model (M): Данные для создания сущности
+            index_elements (list[str]): Столбцы ограничения уникальности, \
+                по которым ищется сущность
+            load_relationships (bool): Подгружать связи с `lazy='selectin'`. \
+                По-умолчанию: `True`
+
+        Returns:
+            tuple[M, bool]: `(model, created)`. `model` - SQLAlchemy-модель \
+                сущности, `created` - сущность была создана
+        '''
+        return await self.repository.insert_or_get(
+            self.model_class,
+            self.repository.column_values(model),
+            index_elements,
+            load_relationships,
+        )
+
+    async def upsert(
+        self,
+        model: M,
+        index_elements: list[str],
+        update_columns: list[str] | None = None,
+    ) -> M:
+        '''
+        Создание сущности или обновление существующей одним запросом
+
+        Args:
+            model (M): Данные сущности
+            index_elements (list[str]): Столбцы ограничения уникальности, \
+                по которым ищется существующая сущность
+            update_columns (list[str] | None): Обновляемые столбцы \
+                существующей сущности. По-умолчанию: `None` - все \
+                заданные, кроме `index_elements`
+
+        Returns:
+            M: SQLAlchemy-модель сущности
+        '''
+        return await self.repository.upsert(
+            self.model_class,
+            self.repository.column_values(model),
+            index_elements,
+            update_columns,
+        )
+
     async def get_multiple(
         self,
         filter: dict[str, Any],
@@ -140,14 +224,20 @@ class BaseService[M]:
 
         return models
 
-    async def update(self, model: M, filter: dict[str, Any]) -> M:
+    async def update(
+        self,
+        model: M,
+        filter: dict[str, Any],
+        refresh: bool = True,
+    ) -> M:
         '''
-        Обновление существующей сущности
+        Обновление существующей сущности одним `UPDATE ... RETURNING`
 
         Args:
             model (M): SQLAlchemy-модель обновляемой сущности
             filter (dict[str, Any]): фильтр поиска сущности в БД. \
                 `{"Название_атрибута": Значение_атрибута}`
+            refresh (bool): Подгрузить связанные модели
 
         Returns:
             M: SQLAlchemy-модель обновляемой сущности
@@ -155,17 +245,10 @@ class BaseService[M]:
         Raises:
             NotFoundError: Не удалось найти сущность
         '''
-
-        if not await self.exists(filter, raise_exc=False):
+        updated = await self.repository.update(model, filter, refresh)
+        if updated is None:
             raise self._not_found_by_filter_error(filter)
-
-        try:
-            model = await self.repository.update(model, filter)
-            await self.repository.db.flush()
-        except Exception as e:
-            await self.repository.db.rollback()
-            raise e
-        return model
+        return updated
 
     async def delete(self, filter: dict[str, Any]) -> None:
         '''
@@ -180,15 +263,11 @@ class BaseService[M]:
         '''
         if not await self.exists(filter):
             raise self._not_found_by_filter_error(filter)
-        try:
-            await self.repository.delete(
-                statement=delete(self.model_class),
-                filter={"id": id}
-            )
-            await self.repository.db.flush()
-        except Exception as e:
-            await self.repository.db.rollback()
-            raise e
+        await self.repository.delete(
+            statement=delete(self.model_class).filter_by(**filter),
+            filter=filter
+        )
+        await self.repository.db.flush()
 
     async def get_all(self, model_attrs: list[_AttrType] = []):
         '''
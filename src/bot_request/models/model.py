@@ -22,8 +22,12 @@ class BotRequestModel(BaseModel):
         text (Mapped[str]): Текст сообщения
         send_datetime (datetime): Дата и время отправки запроса
         request_type (str): Тип запроса (inline, chat и т.п.)
+
+    Таблица секционирована по месяцам `send_datetime` \
+        (см. `BotRequestPartitionManager`)
     '''
     __tablename__ = 'bot_request'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (send_datetime)'}
 
     user_id: Mapped[int] = mapped_column(
         ForeignKey('users.id', ondelete='CASCADE'),
@@ -42,8 +46,10 @@ class BotRequestModel(BaseModel):
 
     # sended_pic_url: Mapped[str] = mapped_column()
 
+    # Ключ секционирования входит в первичный ключ
     send_datetime: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         default=lambda: datetime.now(UTC)
     )
 
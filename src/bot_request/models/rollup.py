@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from base.model import BaseSimpleModel
+
+
+class BotRequestRollupModel(BaseSimpleModel):
+    '''
+    SQL Alchemy модель количества одинаковых запросов боту за сутки
+
+    Args:
+        bucket (Mapped[datetime]): Начало суток (UTC)
+        text (Mapped[str]): Текст запроса
+        count (Mapped[int]): Количество запросов за сутки
+    '''
+    __tablename__ = 'bot_request_rollup'
+
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    text: Mapped[str] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
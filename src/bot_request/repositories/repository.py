@@ -1,10 +1,15 @@
-from base.repository import BaseRepository
-from message.models.model import MessageModel
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from base.repository import BaseRepository
+from bot_request.models.model import BotRequestModel
+
 
-class BotRequestRepository(BaseRepository[MessageModel]):
+class BotRequestRepository(BaseRepository[BotRequestModel]):
     '''Обработка запросов боту в БД'''
+    COLUMNS = ['user_id', 'text', 'request_type', 'send_datetime']
 
     def __init__(self, db: AsyncSession):
         '''
@@ -14,3 +19,32 @@ class BotRequestRepository(BaseRepository[MessageModel]):
             db (AsyncSession): Асинхронная сессия БД
         '''
         super().__init__(db)
+
+    async def insert_requests(
+        self,
+        records: Iterable[tuple[int, str, str, datetime]],
+    ) -> list[tuple[int, str, str, datetime]]:
+        '''
+        Массовое добавление запросов боту через COPY. Запросы пользователей, \
+            которых еще нет в `users` (их создание не закоммичено), \
+            не добавляются, а возвращаются
+
+        Args:
+            records (Iterable[tuple[int, str, str, datetime]]): Строки \
+                в порядке `COLUMNS`
+
+        Returns:
+            list[tuple[int, str, str, datetime]]: Не добавленные строки
+        '''
+        tmp_table_name = await self.copy_to_temp_table(BotRequestModel, self.COLUMNS, records)
+        columns_str = ', '.join(f't."{c}"' for c in self.COLUMNS)
+        user_exists = 'EXISTS (SELECT 1 FROM users u WHERE u.id = t.user_id)'
+
+        await self.db.execute(text(
+            f'INSERT INTO bot_request ({columns_str.replace("t.", "")}) '
+            f'SELECT {columns_str} FROM "{tmp_table_name}" t WHERE {user_exists}'
+        ))
+        skipped = await self.db.execute(text(
+            f'SELECT {columns_str} FROM "{tmp_table_name}" t WHERE NOT {user_exists}'
+        ))
+        return [tuple(row) for row in skipped.all()]  # type: ignore
@@ -0,0 +1,211 @@
+import asyncio
+import gzip
+import logging
+import re
+from datetime import UTC, datetime
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.database import async_session
+from bot_request.models.model import BotRequestModel
+from bot_request.services.rollup import BotRequestRollupService
+from global_var.services.service import GlobalVarService
+
+
+class BotRequestPartitionManager:
+    '''
+    Помесячные секции `bot_request`. Секции создаются на \
+        `premake_months` месяцев вперед, а секции старше \
+        `retention_months` месяцев отсоединяются и удаляются целиком, \
+        без построчного DELETE. Перед удалением секция может быть \
+        сохранена в `archive_dir` (CSV в gzip). Секции, строки которых \
+        еще не учтены в суточных счетчиках, не удаляются
+    '''
+    TABLE_NAME = BotRequestModel.__tablename__
+    PARTITION_NAME_RE = re.compile(rf'^{TABLE_NAME}_y(\d{{4}})m(\d{{2}})$')
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        premake_months: int = 3,
+        retention_months: int = 12,
+        archive_dir: Path | None = None,
+        interval: float = 86400,
+    ) -> None:
+        '''
+        Помесячные секции `bot_request`
+
+        Args:
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            premake_months (int): На сколько месяцев вперед создаются секции
+            retention_months (int): Сколько месяцев хранятся запросы, \
+                не считая текущего. `0` - хранятся всегда
+            archive_dir (Path | None): Папка для архивов удаляемых секций. \
+                По-умолчанию: `None` - не архивировать
+            interval (float): Период обслуживания секций (секунд)
+        '''
+        self.session_factory = session_factory
+        self.premake_months = premake_months
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.logger = logging.getLogger('tg_logger')
+
+    @staticmethod
+    def add_months(month: datetime, months: int) -> datetime:
+        index = month.year * 12 + month.month - 1 + months
+        return month.replace(year=index // 12, month=index % 12 + 1)
+
+    @classmethod
+    def partition_name(cls, month: datetime) -> str:
+        return f'{cls.TABLE_NAME}_y{month.year:04d}m{month.month:02d}'
+
+    @staticmethod
+    def current_month() -> datetime:
+        return datetime.now(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    async def get_partitions(self, db: AsyncSession) -> list[tuple[str, datetime]]:
+        '''
+        Получение помесячных секций
+
+        Args:
+            db (AsyncSession): Асинхронная сессия БД
+
+        Returns:
+            list[tuple[str, datetime]]: Имя секции и начало ее месяца по возрастанию
+        '''
+        names = (await db.scalars(
+            text(
+                'SELECT c.relname FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid '
+                'JOIN pg_class p ON p.oid = i.inhparent '
+                'WHERE p.relname = :table_name'
+            ),
+            {'table_name': self.TABLE_NAME},
+        )).all()
+
+        partitions = []
+        for name in names:
+            match = self.PARTITION_NAME_RE.match(name)
+            if match:
+                month = datetime(int(match[1]), int(match[2]), 1, tzinfo=UTC)
+                partitions.append((name, month))
+        return sorted(partitions, key=lambda p: p[1])
+
+    async def create_partitions(self) -> list[str]:
+        '''
+        Создание секций с текущего месяца на `premake_months` месяцев вперед
+
+        Returns:
+            list[str]: Имена созданных секций
+        '''
+        created = []
+        async with self.session_factory() as db:
+            existing = {name for name, _ in await self.get_partitions(db)}
+            for i in range(self.premake_months + 1):
+                month = self.add_months(self.current_month(), i)
+                name = self.partition_name(month)
+                if name in existing:
+                    continue
+                await db.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self.TABLE_NAME}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') "
+                    f"TO ('{self.add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+            await db.commit()
+        return created
+
+    async def drop_expired(self) -> list[str]:
+        '''
+        Отсоединение и удаление секций старше `retention_months` месяцев. \
+            Каждая секция удаляется отдельной транзакцией
+
+        Returns:
+            list[str]: Имена удаленных секций
+        '''
+        if self.retention_months <= 0:
+            return []
+
+        cutoff = self.add_months(self.current_month(), -self.retention_months)
+        dropped = []
+        async with self.session_factory() as db:
+            rollup_last_id = int(
+                await GlobalVarService(db).get_value(BotRequestRollupService.CURSOR_NAME) or 0
+            )
+            for name, month in await self.get_partitions(db):
+                if self.add_months(month, 1) > cutoff:
+                    break
+                max_id = await db.scalar(text(f'SELECT max(id) FROM "{name}"'))
+                if max_id is not None and max_id > rollup_last_id:
+                    self.logger.warning(
+                        f'Секция {name} не удалена: запросы еще не учтены в суточных счетчиках'
+                    )
+                    continue
+
+                await db.execute(text(f'ALTER TABLE "{self.TABLE_NAME}" DETACH PARTITION "{name}"'))
+                if self.archive_dir is not None and max_id is not None:
+                    await self.__archive(db, name)
+                await db.execute(text(f'DROP TABLE "{name}"'))
+                await db.commit()
+                dropped.append(name)
+        return dropped
+
+    async def __archive(self, db: AsyncSession, name: str) -> Path:
+        '''
+        Сохранение секции в `archive_dir/<name>.csv.gz`
+
+        Returns:
+            Path: Путь к архиву
+        '''
+        assert self.archive_dir is not None
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_dir / f'{name}.csv.gz'
+
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        with gzip.open(path, 'wb') as file:
+            await raw_connection.driver_connection.copy_from_table(  # type: ignore
+                name,
+                output=file,
+                format='csv',
+                header=True,
+            )
+        return path
+
+    async def maintain(self) -> dict[str, list[str]]:
+        '''
+        Создание будущих и удаление устаревших секций
+
+        Returns:
+            dict[str,list[str]]: Имена секций
+        ```
+        {
+            "created": created_partitions, [list[str]]
+            "dropped": dropped_partitions [list[str]]
+        }
+        ```
+        '''
+        return {
+            'created': await self.create_partitions(),
+            'dropped': await self.drop_expired(),
+        }
+
+    async def run(self) -> None:
+        '''
+        Периодическое обслуживание секций. Работает до отмены задачи
+        '''
+        while True:
+            try:
+                result = await self.maintain()
+                if result['created'] or result['dropped']:
+                    self.logger.info(
+                        f'Секции запросов боту: создано {result["created"]}, '
+                        f'удалено {result["dropped"]}'
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f'Не удалось обслужить секции запросов боту: {e}')
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,110 @@
+from datetime import UTC, datetime, timedelta
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot_request.models.model import BotRequestModel
+from bot_request.models.rollup import BotRequestRollupModel
+from global_var.services.service import GlobalVarService
+
+
+class BotRequestRollupService:
+    '''
+    Суточные счетчики запросов боту в `bot_request_rollup`. Счетчики \
+        пополняются только новыми строками `bot_request`: `id` последней \
+        учтенной строки хранится в глобальной переменной. Учитываются \
+        только запросы старше `delay` секунд: `id` выдаются до коммита, \
+        и строка с меньшим `id` из более медленной транзакции может \
+        появиться позже строк с большими `id`
+    '''
+    CURSOR_NAME = 'bot_request_rollup_last_id'
+
+    def __init__(self, db: AsyncSession, chunk_size: int = 100000, delay: float = 60) -> None:
+        '''
+        Суточные счетчики запросов боту
+
+        Args:
+            db (AsyncSession): Асинхронная сессия БД
+            chunk_size (int): Количество строк `bot_request`, учитываемых \
+                одной транзакцией
+            delay (float): Сколько секунд запрос не учитывается после \
+                получения. Должно с запасом превышать задержку фоновой записи
+        '''
+        self.db = db
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.global_var_service = GlobalVarService(db)
+
+    @staticmethod
+    def __bucket():
+        # Константы вместо параметров, чтобы выражение в GROUP BY совпало с SELECT
+        utc = literal_column("'UTC'")
+        return func.timezone(
+            utc,
+            func.date_trunc(literal_column("'day'"), func.timezone(utc, BotRequestModel.send_datetime)),
+        )
+
+    async def rollup(self) -> int:
+        '''
+        Учет новых строк `bot_request` в суточных счетчиках. Каждая часть \
+            из `chunk_size` строк учитывается и коммитится вместе с \
+            новой позицией, поэтому строки не учитываются дважды
+
+        Returns:
+            int: Количество обновленных счетчиков
+        '''
+        last_id = int(await self.global_var_service.get_value(self.CURSOR_NAME) or 0)
+        max_id = await self.db.scalar(
+            select(func.max(BotRequestModel.id))
+            .where(BotRequestModel.send_datetime < datetime.now(UTC) - timedelta(seconds=self.delay))
+        )
+        if max_id is None or max_id <= last_id:
+            return 0
+
+        updated = 0
+        while last_id < max_id:
+            upto = min(last_id + self.chunk_size, max_id)
+            bucket = self.__bucket()
+            source = (
+                select(bucket, BotRequestModel.text, func.count())
+                .where(
+                    BotRequestModel.id > last_id,
+                    BotRequestModel.id <= upto,
+                    BotRequestModel.text != '',
+                )
+                .group_by(bucket, BotRequestModel.text)
+            )
+            statement = insert(BotRequestRollupModel).from_select(['bucket', 'text', 'count'], source)
+            statement = statement.on_conflict_do_update(
+                index_elements=['bucket', 'text'],
+                set_={'count': BotRequestRollupModel.count + statement.excluded.count},
+            )
+            result = await self.db.execute(statement)
+            await self.global_var_service.set_value(self.CURSOR_NAME, str(upto))
+            await self.db.commit()
+
+            updated += result.rowcount  # type: ignore
+            last_id = upto
+        return updated
+
+    async def get_top_queries(self, limit: int, since: datetime | None = None) -> list[str]:
+        '''
+        Получение самых частых запросов по суточным счетчикам
+
+        Args:
+            limit (int): Количество запросов
+            since (datetime | None): Учитывать сутки начиная с этого момента. \
+                По-умолчанию: `None` - все время
+
+        Returns:
+            list[str]: Тексты запросов по убыванию частоты
+        '''
+        query = (
+            select(BotRequestRollupModel.text)
+            .group_by(BotRequestRollupModel.text)
+            .order_by(func.sum(BotRequestRollupModel.count).desc())
+            .limit(limit)
+        )
+        if since is not None:
+            query = query.where(BotRequestRollupModel.bucket >= since)
+        return list((await self.db.scalars(query)).all())
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.database import async_session
+from bot_request.repositories.repository import BotRequestRepository
+
+
+class BotRequestWriter:
+    '''
+    Фоновая запись запросов боту. Обработчики кладут запрос в ограниченную \
+        очередь в памяти и не ждут БД, а фоновая задача записывает \
+        накопленные запросы одним COPY каждые `batch_size` запросов \
+        или `flush_interval` секунд. При переполнении очереди запросы \
+        отбрасываются и учитываются в `stats`
+    '''
+    MAX_ATTEMPTS = 30
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        batch_size: int = 500,
+        flush_interval: float = 1,
+        max_queue_size: int = 10000,
+    ) -> None:
+        '''
+        Фоновая запись запросов боту
+
+        Args:
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            batch_size (int): Максимум запросов в одной записи
+            flush_interval (float): Максимальная задержка записи (секунд)
+            max_queue_size (int): Максимум запросов, ожидающих записи
+        '''
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger('tg_logger')
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0}
+        self.__queue: asyncio.Queue[tuple[tuple[int, str, str, datetime], int]] = asyncio.Queue(max_queue_size)
+        self.__closed = False
+
+    def submit(self, user_id: int, text: str, request_type: str) -> bool:
+        '''
+        Постановка запроса в очередь на запись. Не блокирует
+
+        Args:
+            user_id (int): Идентификатор пользователя
+            text (str): Текст запроса
+            request_type (str): Тип запроса (inline, chat и т.п.)
+
+        Returns:
+            bool: `True` - запрос поставлен в очередь, `False` - отброшен
+        '''
+        return self.__put((user_id, text, request_type, datetime.now(UTC)), 0)
+
+    def __put(self, record: tuple[int, str, str, datetime], attempt: int) -> bool:
+        if self.__closed:
+            self.stats['dropped'] += 1
+            return False
+        try:
+            self.__queue.put_nowait((record, attempt))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            return False
+        if not attempt:
+            self.stats['queued'] += 1
+        return True
+
+    async def __collect(self) -> list[tuple[tuple[int, str, str, datetime], int]]:
+        '''
+        Сбор пачки из очереди: до `batch_size` запросов, не дольше \
+            `flush_interval`. После `close` очередь выбирается без ожидания
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch: list[tuple[tuple[int, str, str, datetime], int]] = []
+        while len(batch) < self.batch_size:
+            if self.__closed:
+                if self.__queue.empty():
+                    break
+                batch.append(self.__queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.__queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    async def __write(self, batch: list[tuple[tuple[int, str, str, datetime], int]]) -> None:
+        attempts = {record: attempt for record, attempt in batch}
+        try:
+            async with self.session_factory() as db:
+                skipped = await BotRequestRepository(db).insert_requests([record for record, _ in batch])
+                await db.commit()
+        except Exception as exc:
+            self.stats['failed'] += len(batch)
+            self.logger.warning(f'Не удалось записать {len(batch)} запросов боту: {exc}')
+            return
+
+        self.stats['written'] += len(batch) - len(skipped)
+        for record in skipped:
+            # Пользователь мог быть создан в еще не закоммиченной транзакции -
+            # повторяем в следующих пачках
+            attempt = attempts.get(record, 0) + 1
+            if attempt >= self.MAX_ATTEMPTS:
+                self.stats['failed'] += 1
+            else:
+                self.__put(record, attempt)
+
+    async def run(self) -> None:
+        '''
+        Фоновая запись запросов. Завершается после `close`, \
+            записав все, что осталось в очереди
+        '''
+        while not (self.__closed and self.__queue.empty()):
+            batch = await self.__collect()
+            if batch:
+                await self.__write(batch)
+
+    def close(self) -> None:
+        '''
+        Остановка приема запросов. `run` запишет оставшиеся и завершится
+        '''
+        self.__closed = True
@@ -10,7 +10,7 @@ if TYPE_CHECKING:
 
 class BotCommandModel(BaseModel):
     __tablename__ = 'botcommands'
-    name: Mapped[str] = mapped_column(nullable=False)
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
 
     permissions = relationship(
         'PermissionModel',
@@ -1,4 +1,11 @@
+from typing import Any
+from sqlalchemy import delete, select
 from base.service import BaseService
+from db.database import replica_router
+from db.events import after_commit
+from permission.dependencies.get_permission_cache import get_permission_cache
+from permission.models.model import PermissionModel
+from permission.services.cache import PermissionCache
 from botcommand.models.model import BotCommandModel
 from botcommand.repositories.repository import EndpointRepository
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,12 +17,15 @@ class BotCommandService(BaseService[BotCommandModel]):
     Бизнес-логика команд бота
     '''
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: PermissionCache | None = None):
         '''
         Бизнес логика команд бота
 
         Args:
             db (AsyncSession): Асинхронная сессия БД
+            cache (PermissionCache | None): Кеш проверки доступа, который \
+                сбрасывается после изменения команд бота. По-умолчанию: `None` - \
+                общий кеш процесса
         '''
         super().__init__(
             EndpointRepository(db),
@@ -23,13 +33,15 @@ class BotCommandService(BaseService[BotCommandModel]):
             single_model_name="команда бота",
             multiple_models_name="команды бота"
         )
+        self.cache = cache or get_permission_cache()
 
-    async def create(self, model: BotCommandModel) -> BotCommandModel:
+    async def create(self, model: BotCommandModel, refresh: bool = True) -> BotCommandModel:
         '''
         Создание команды бота
 
         Args:
             model (PermissionModel): SQLAlchemy-модель команды бота
+            refresh (bool): Подгрузить связанные модели
 
         Returns:
             PermissionModel: SQLAlchemy-модель команды бота
@@ -37,11 +49,62 @@ class BotCommandService(BaseService[BotCommandModel]):
         Raises:
             WasNotCreatedError: Ручка не была создана
         '''
-        filter = {"name": model.name}
-        if not await self.exists(filter, raise_exc=False):
-            return await super().create(model)
-        else:
-            return await self.get(filter)
+        botcommand, created = await self.get_or_create(model, ['name'], load_relationships=refresh)
+        if created:
+            self.__invalidate()
+        return botcommand
+
+    async def update(
+        self,
+        model: BotCommandModel,
+        filter: dict[str, Any],
+        refresh: bool = True,
+    ) -> BotCommandModel:
+        '''
+        Обновление команды бота
+
+        Args:
+            model (BotCommandModel): SQLAlchemy-модель команды бота
+            filter (dict[str, Any]): фильтр поиска сущности в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+            refresh (bool): Перечитать команду бота со связанными моделями
+
+        Returns:
+            BotCommandModel: SQLAlchemy-модель команды бота
+
+        Raises:
+            NotFoundError: Не удалось найти сущность
+        '''
+        botcommand = await super().update(model, filter, refresh)
+        self.__invalidate()
+        return botcommand
+
+    async def delete(self, filter: dict[str, Any]) -> None:
+        '''
+        Удаление команды бота вместе с ее ограничениями доступа
+
+        Args:
+            filter (dict[str, Any]): фильтр поиска сущности в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+
+        Raises:
+            NotFoundError: Не удалось найти сущность
+        '''
+        await self.repository.db.execute(
+            delete(PermissionModel).where(
+                PermissionModel.botcommand_id.in_(select(BotCommandModel.id).filter_by(**filter))
+            )
+        )
+        await super().delete(filter)
+        self.__invalidate()
+
+    def __invalidate(self) -> None:
+        '''
+        Сброс кеша доступа и чтение из основной БД после фиксации изменений: \
+            матрица доступа хранит команды бота по названию
+        '''
+        after_commit(self.repository.db, self.cache.invalidate)
+        after_commit(self.repository.db, replica_router.mark_written)
 
     async def create_with_name(self, botcommand_name: str) -> BotCommandModel:
         '''
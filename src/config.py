@@ -1,7 +1,7 @@
 from pathlib import Path
-from typing import List
+from typing import List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import model_validator
+from pydantic import Field, model_validator
 from typing import Self
 from dotenv import load_dotenv
 
@@ -22,6 +22,9 @@ class MinioSettings(BaseSettings):
     domain: str
     admin_domain: str
     version: str
+    pool_size: int = 32
+    connect_timeout: float = 5
+    read_timeout: float = 60
 
 
 class PostgresSettings(BaseSettings):
@@ -32,9 +35,20 @@ class PostgresSettings(BaseSettings):
     password: str
     version: int
     dump_timeout_seconds: int
+    pool_size: int = 10
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 100
+    max_tracked_statements: int = 500
+    replica_host: str | None = None
+    replica_port: int | None = None
+    replica_max_lag_seconds: float = 5
+    replica_check_interval: float = 1
 
     db_dsn: str = ''
     db_dsn_sync: str = ''
+    db_dsn_replica: str = ''
 
     @model_validator(mode='after')
     def db_dsn_validate(self) -> Self:
@@ -47,6 +61,12 @@ class PostgresSettings(BaseSettings):
                             f'{self.user}:{self.password}@'
                             f'{self.host}:{self.port}/'
                             f'{self.db}')
+
+        if self.replica_host:
+            self.db_dsn_replica = (f'postgresql+asyncpg://'
+                                   f'{self.user}:{self.password}@'
+                                   f'{self.replica_host}:{self.replica_port or self.port}/'
+                                   f'{self.db}')
         return self
 
 
@@ -55,6 +75,10 @@ class TelegramSettings(BaseSettings):
     channel_id: str
     channel_name: str
     chat_id: int
+    storage_chat_id: int | None = None
+    file_id_warm_interval: int = 3600
+    file_id_warm_top_queries: int = 50
+    file_id_warm_batch: int = 100
 
 
 class AttachmentSettings(BaseSettings):
@@ -62,6 +86,52 @@ class AttachmentSettings(BaseSettings):
     extensions: List[str]
     video_extensions: List[str]
     image_extensions: List[str]
+    thumbnail_size: int = 320
+    thumbnail_quality: int = 80
+    webp_enabled: bool = False
+    webp_quality: int = 80
+    fetch_concurrency: int = 8
+    fetch_timeout: float = 15
+    stream_threshold: int = 1024 * 1024
+    stream_chunk_size: int = 64 * 1024
+    hash_workers: int = 2
+    dedup_enabled: bool = False
+    collapse_duplicates: bool = True
+    duplicate_distance: int = 4
+
+
+class BotRequestSettings(BaseSettings):
+    batch_size: int = 500
+    flush_interval_ms: int = 1000
+    max_queue_size: int = 10000
+    partition_premake_months: int = 3
+    retention_months: int = 12
+    archive_dir: str | None = None
+    maintenance_interval: int = 86400
+    rollup_delay: int = 60
+
+
+class SearchSettings(BaseSettings):
+    cache_ttl: float = 600
+    cache_size: int = 1000
+    warm_top_queries: int = 50
+    warm_period_days: int = 7
+    warm_interval: int = 300
+
+
+class PermissionSettings(BaseSettings):
+    user_ttl: float = 300
+    matrix_ttl: float = 300
+    max_cached_users: int = 10000
+
+
+class StorageSettings(BaseSettings):
+    backend: Literal['minio', 'local'] = 'minio'
+    local_root: str = '/app/data/storage'
+
+
+class IngestionSettings(BaseSettings):
+    archive_dir: str | None = None
 
 
 class Settings(BaseSettings):
@@ -78,6 +148,21 @@ class Settings(BaseSettings):
     # Attachments
     attachment: AttachmentSettings
 
+    # Ingestion
+    ingestion: IngestionSettings = Field(default_factory=IngestionSettings)
+
+    # Storage
+    storage: StorageSettings = Field(default_factory=StorageSettings)
+
+    # Permissions
+    permission: PermissionSettings = Field(default_factory=PermissionSettings)
+
+    # Bot requests
+    bot_request: BotRequestSettings = Field(default_factory=BotRequestSettings)
+
+    # Search
+    search: SearchSettings = Field(default_factory=SearchSettings)
+
     model_config = SettingsConfigDict(
         env_nested_delimiter='__',
         env_file=ENV_PATH,
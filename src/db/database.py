@@ -1,16 +1,59 @@
 from typing import AsyncGenerator
 from attachment.models.model import AttachmentModel
 from config import get_settings
+from db.metrics import InstrumentedAsyncPool, db_metrics, instrument_engine
+from db.replica import ReplicaRouter
 from sqlalchemy.ext.asyncio import (
-    create_async_engine, async_sessionmaker, AsyncSession
+    create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 )
-async_engine = create_async_engine(get_settings().postgres.db_dsn, echo=False)
+postgres_settings = get_settings().postgres
+db_metrics.max_statements = postgres_settings.max_tracked_statements
+
+
+def build_engine(dsn: str) -> AsyncEngine:
+    '''
+    Движок БД с настройками пула из `postgres` и сбором статистики запросов
+
+    Args:
+        dsn (str): Строка подключения
+
+    Returns:
+        AsyncEngine: Асинхронный движок SQLAlchemy
+    '''
+    engine = create_async_engine(
+        dsn,
+        echo=False,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=postgres_settings.pool_size,
+        max_overflow=postgres_settings.max_overflow,
+        pool_timeout=postgres_settings.pool_timeout,
+        pool_pre_ping=postgres_settings.pool_pre_ping,
+        connect_args={'prepared_statement_cache_size': postgres_settings.statement_cache_size},
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+async_engine = build_engine(postgres_settings.db_dsn)
 async_session = async_sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+# Необязательная реплика только для чтения
+replica_engine = build_engine(postgres_settings.db_dsn_replica) if postgres_settings.db_dsn_replica else None
+replica_session = async_sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if replica_engine is not None else None
+replica_router = ReplicaRouter(
+    async_session,
+    replica_session,
+    max_lag=postgres_settings.replica_max_lag_seconds,
+    check_interval=postgres_settings.replica_check_interval,
+)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     '''
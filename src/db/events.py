@@ -0,0 +1,34 @@
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+__CALLBACKS_KEY = 'after_commit_callbacks'
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    '''
+    Вызов `callback` после фиксации транзакции сессии. Нужен для действий, \
+        которые должны видеть уже зафиксированные данные: сброс кешей, \
+        `ReplicaRouter.mark_written`. Фиксация точки сохранения \
+        (`begin_nested`) вызовов не запускает, откат транзакции их отменяет
+
+    Args:
+        db (AsyncSession): Асинхронная сессия БД
+        callback (Callable[[], None]): Вызов после фиксации
+    '''
+    db.sync_session.info.setdefault(__CALLBACKS_KEY, []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def __run_callbacks(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    for callback in session.info.pop(__CALLBACKS_KEY, []):
+        callback()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def __drop_callbacks(session: Session, previous_transaction: SessionTransaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(__CALLBACKS_KEY, None)
@@ -0,0 +1,244 @@
+import re
+import time
+from bisect import bisect_left
+from typing import Any
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+# Границы корзин гистограмм (миллисекунд)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_whitespace_re = re.compile(r'\s+')
+_params_list_re = re.compile(r'\(\s*\$\d+(?:\s*::\s*\w+)?(?:\s*,\s*\$\d+(?:\s*::\s*\w+)?)+\s*\)')
+_param_re = re.compile(r'\$\d+(?:::\w+)?')
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalize_sql(statement: str) -> str:
+    '''
+    Приведение SQL к виду без конкретных значений, чтобы одинаковые \
+        запросы с разными параметрами и длиной `IN (...)` считались вместе
+
+    Args:
+        statement (str): SQL-запрос
+
+    Returns:
+        str: Нормализованный запрос
+    '''
+    statement = _whitespace_re.sub(' ', statement).strip()
+    statement = _params_list_re.sub('(...)', statement)
+    statement = _param_re.sub('?', statement)
+    return _literal_re.sub('?', statement)
+
+
+class Histogram:
+    '''
+    Гистограмма значений с фиксированными корзинами
+    '''
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        '''
+        Гистограмма значений с фиксированными корзинами
+
+        Args:
+            buckets (tuple[float, ...]): Верхние границы корзин по возрастанию. \
+                Значения больше последней границы попадают в корзину `+Inf`
+        '''
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        '''
+        Оценка квантиля по корзинам: верхняя граница корзины, \
+            в которую попадает квантиль
+
+        Args:
+            q (float): Квантиль (0-1)
+
+        Returns:
+            float: Оценка квантиля. Для корзины `+Inf` - максимум
+        '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.counts)),
+        }
+
+
+class StatementStats:
+    '''
+    Статистика одного нормализованного запроса
+    '''
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+class DbMetrics:
+    '''
+    Счетчики и гистограммы работы с БД: ожидание соединения из пула, \
+        время и количество строк каждого запроса (по нормализованному SQL) \
+        и ошибки. Заполняются обработчиками событий SQLAlchemy \
+        (`instrument_engine`) и читаются во время работы (`snapshot`)
+    '''
+    OTHER_STATEMENTS = '<other>'
+
+    def __init__(self, max_statements: int = 500) -> None:
+        '''
+        Счетчики и гистограммы работы с БД
+
+        Args:
+            max_statements (int): Максимум различных запросов. Остальные \
+                учитываются вместе под `<other>`
+        '''
+        self.max_statements = max_statements
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+        Обнуление всех счетчиков
+        '''
+        self.started = time.time()
+        self.checkout_wait = Histogram()
+        self.checkouts = 0
+        self.statements: dict[str, StatementStats] = {}
+
+    def observe_checkout(self, wait_ms: float) -> None:
+        self.checkouts += 1
+        self.checkout_wait.observe(wait_ms)
+
+    def __get_statement(self, statement: str) -> StatementStats:
+        key = normalize_sql(statement)
+        stats = self.statements.get(key)
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                key = self.OTHER_STATEMENTS
+            stats = self.statements.setdefault(key, StatementStats())
+        return stats
+
+    def observe_statement(self, statement: str, latency_ms: float, rows: int) -> None:
+        stats = self.__get_statement(statement)
+        stats.latency.observe(latency_ms)
+        stats.rows += max(rows, 0)
+
+    def observe_error(self, statement: str) -> None:
+        self.__get_statement(statement).errors += 1
+
+    def top_statements(self, limit: int = 10) -> list[tuple[str, StatementStats]]:
+        '''
+        Запросы с наибольшим суммарным временем
+
+        Args:
+            limit (int): Количество запросов
+
+        Returns:
+            list[tuple[str, StatementStats]]: Нормализованный SQL и его статистика
+        '''
+        return sorted(
+            self.statements.items(),
+            key=lambda item: item[1].latency.sum,
+            reverse=True,
+        )[:limit]
+
+    def snapshot(self) -> dict[str, Any]:
+        '''
+        Текущие значения всех счетчиков
+
+        Returns:
+            dict[str,Any]: Счетчики
+        ```
+        {
+            "uptime": seconds_since_reset, [float]
+            "checkouts": checkouts_count, [int]
+            "checkout_wait_ms": histogram, [dict]
+            "statements": {
+                normalized_sql: {
+                    "latency_ms": histogram, [dict]
+                    "rows": rows_count, [int]
+                    "errors": errors_count [int]
+                }
+            }
+        }
+        ```
+        '''
+        return {
+            'uptime': time.time() - self.started,
+            'checkouts': self.checkouts,
+            'checkout_wait_ms': self.checkout_wait.snapshot(),
+            'statements': {
+                sql: {
+                    'latency_ms': stats.latency.snapshot(),
+                    'rows': stats.rows,
+                    'errors': stats.errors,
+                }
+                for sql, stats in self.statements.items()
+            },
+        }
+
+
+db_metrics = DbMetrics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    '''
+    Пул соединений, измеряющий время ожидания соединения. В ожидание \
+        входит и открытие нового соединения, если свободных нет
+    '''
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_metrics.observe_checkout((time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine: Engine, metrics: DbMetrics = db_metrics) -> None:
+    '''
+    Подключение сбора времени и количества строк запросов к движку
+
+    Args:
+        engine (Engine): Синхронный движок (`AsyncEngine.sync_engine`)
+        metrics (DbMetrics): Куда записывать статистику
+    '''
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        latency_ms = (time.perf_counter() - context._query_start) * 1000
+        rows = cursor.rowcount
+        if rows < 0:
+            # Для SELECT asyncpg не сообщает rowcount, строки уже получены курсором
+            rows = len(getattr(cursor, '_rows', ()))
+        metrics.observe_statement(statement, latency_ms, rows)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        if context.statement:
+            metrics.observe_error(context.statement)
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class ReplicaRouter:
+    '''
+    Выбор БД для чтения: реплика, если она не отстает, иначе основная БД. \
+        Отставание проверяется не чаще раза в `check_interval` секунд \
+        сравнением позиции WAL основной БД (`pg_current_wal_lsn`) и \
+        воспроизведенной репликой (`pg_last_wal_replay_lsn`). После \
+        `mark_written` чтение идет из основной БД, пока реплика не \
+        воспроизведет записанное, поэтому только что добавленные посты \
+        сразу находятся
+    '''
+
+    def __init__(
+        self,
+        primary_factory: async_sessionmaker[AsyncSession],
+        replica_factory: async_sessionmaker[AsyncSession] | None = None,
+        max_lag: float = 5,
+        check_interval: float = 1,
+    ) -> None:
+        '''
+        Выбор БД для чтения
+
+        Args:
+            primary_factory (async_sessionmaker[AsyncSession]): Фабрика сессий основной БД
+            replica_factory (async_sessionmaker[AsyncSession] | None): Фабрика \
+                сессий реплики. По-умолчанию: `None` - реплики нет
+            max_lag (float): Допустимое отставание реплики (секунд), \
+                если после `mark_written` она уже догнала основную БД
+            check_interval (float): Период проверки отставания (секунд)
+        '''
+        self.primary_factory = primary_factory
+        self.replica_factory = replica_factory
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.logger = logging.getLogger('tg_logger')
+        self.__written = False
+        self.__required_lsn: str | None = None
+        self.__fresh = False
+        self.__checked_at: float | None = None
+        self.__lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica_factory is not None
+
+    def mark_written(self) -> None:
+        '''
+        Отметка записи, которую следующие чтения должны увидеть. \
+            Вызывается после изменения постов или доступа
+        '''
+        if self.enabled:
+            self.__written = True
+            self.__checked_at = None
+
+    async def use_replica(self) -> bool:
+        '''
+        Можно ли сейчас читать из реплики
+
+        Returns:
+            bool: `True` - реплика настроена и не отстает
+        '''
+        if not self.enabled:
+            return False
+        async with self.__lock:
+            if (
+                self.__checked_at is None
+                or time.monotonic() - self.__checked_at >= self.check_interval
+            ):
+                self.__fresh = await self.__check()
+                self.__checked_at = time.monotonic()
+            return self.__fresh
+
+    async def __check(self) -> bool:
+        assert self.replica_factory is not None
+        try:
+            async with self.primary_factory() as db:
+                primary_lsn = await db.scalar(text('SELECT pg_current_wal_lsn()::text'))
+            if self.__written:
+                # Записанное раньше этой позиции должно быть видно на реплике
+                self.__required_lsn = primary_lsn
+                self.__written = False
+
+            async with self.replica_factory() as db:
+                in_recovery, reached, lag = (await db.execute(
+                    text(
+                        'SELECT pg_is_in_recovery(), '
+                        # asyncpg передает pg_lsn числом, поэтому позиция - текстом
+                        'pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS TEXT) AS pg_lsn), '
+                        'EXTRACT(EPOCH FROM clock_timestamp() - pg_last_xact_replay_timestamp())'
+                    ),
+                    {'lsn': self.__required_lsn or primary_lsn},
+                )).one()
+        except Exception as e:
+            self.logger.warning(f'Не удалось проверить отставание реплики: {e}')
+            return False
+
+        if not in_recovery:
+            # Не физическая реплика - отставание по WAL не измерить
+            self.__required_lsn = None
+            return True
+        if self.__required_lsn is not None:
+            if not reached:
+                return False
+            self.__required_lsn = None
+            return True
+        return bool(reached) or (lag is not None and float(lag) <= self.max_lag)
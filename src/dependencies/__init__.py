@@ -1,29 +1,39 @@
+from datetime import timedelta
+from pathlib import Path
+from aiogram import Bot
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
 from bot_request.services.service import BotRequestService
+from bot_request.services.writer import BotRequestWriter
+from bot_request.services.partition import BotRequestPartitionManager
 from config import get_settings
 from db.database import async_engine
 from role.services.service import RoleService
-from storage.services.minio_service import MinioService
+from storage.dependencies.get_minio_services import get_minio_service
 from attachment.services.service import AttachmentService
 from message.services.service import MessageService
 from user.services.service import UserService
 from botcommand.services.service import BotCommandService
 from permission.services.service import PermissionService
+from permission.dependencies.get_permission_cache import get_permission_cache
 from tg.bot.services.media import MediaService
+from tg.bot.services.channel import ChannelService
+from tg.bot.services.warmer import FileIdWarmer
+from tg.bot.services.search_cache import SearchCache
+from tg.bot.services.search_warmer import SearchWarmer
 from global_var.services.service import GlobalVarService
+from ingestion.services.coordinator import IngestionCoordinator
+from ingestion.services.service import IngestionService
+from message.services.scraper import ScraperService
+from ingestion.services.archive import PageArchive
 
 SessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
-
-def get_minio_service():
-    minio_settings = get_settings().minio
-    return MinioService(
-        minio_settings.bucket_name,
-        minio_settings.endpoint,
-        minio_settings.root_user,
-        minio_settings.root_password
-    )
+__ingestion_coordinator: IngestionCoordinator | None = None
+__bot_request_writer: BotRequestWriter | None = None
+__bot_request_partition_manager: BotRequestPartitionManager | None = None
+__search_cache: SearchCache | None = None
+__search_warmer: SearchWarmer | None = None
 
 
 async def get_attachment_service(db: AsyncSession) -> AttachmentService:
@@ -54,7 +64,8 @@ async def get_permission_service(db: AsyncSession) -> PermissionService:
     return PermissionService(
         db,
         await get_botcommand_service(db),
-        await get_role_service(db)
+        await get_role_service(db),
+        get_permission_cache(),
     )
 
 
@@ -67,8 +78,84 @@ async def get_media_service(db: AsyncSession) -> MediaService:
         db,
         await get_message_service(db),
         get_minio_service(),
+        get_search_cache(),
     )
 
 
 async def get_bot_request_service(db: AsyncSession) -> BotRequestService:
-    return BotRequestService(db)
\ No newline at end of file
+    return BotRequestService(db)
+
+
+async def get_channel_service(db: AsyncSession, bot: Bot) -> ChannelService:
+    return ChannelService(db, await get_message_service(db), bot)
+
+
+def get_file_id_warmer(bot: Bot) -> FileIdWarmer:
+    return FileIdWarmer(bot, get_media_service)
+
+
+def get_page_archive() -> PageArchive | None:
+    archive_dir = get_settings().ingestion.archive_dir
+    return PageArchive(archive_dir) if archive_dir else None
+
+
+def get_ingestion_service() -> IngestionService:
+    return IngestionService(
+        ScraperService(get_page_archive()),
+        get_message_service,
+    )
+
+
+def get_ingestion_coordinator() -> IngestionCoordinator:
+    global __ingestion_coordinator
+    if __ingestion_coordinator is None:
+        __ingestion_coordinator = IngestionCoordinator()
+    return __ingestion_coordinator
+
+
+def get_bot_request_writer() -> BotRequestWriter:
+    global __bot_request_writer
+    if __bot_request_writer is None:
+        settings = get_settings().bot_request
+        __bot_request_writer = BotRequestWriter(
+            batch_size=settings.batch_size,
+            flush_interval=settings.flush_interval_ms / 1000,
+            max_queue_size=settings.max_queue_size,
+        )
+    return __bot_request_writer
+
+
+def get_bot_request_partition_manager() -> BotRequestPartitionManager:
+    global __bot_request_partition_manager
+    if __bot_request_partition_manager is None:
+        settings = get_settings().bot_request
+        __bot_request_partition_manager = BotRequestPartitionManager(
+            premake_months=settings.partition_premake_months,
+            retention_months=settings.retention_months,
+            archive_dir=Path(settings.archive_dir) if settings.archive_dir else None,
+            interval=settings.maintenance_interval,
+        )
+    return __bot_request_partition_manager
+
+
+def get_search_cache() -> SearchCache:
+    global __search_cache
+    if __search_cache is None:
+        settings = get_settings().search
+        __search_cache = SearchCache(ttl=settings.cache_ttl, max_size=settings.cache_size)
+    return __search_cache
+
+
+def get_search_warmer() -> SearchWarmer:
+    global __search_warmer
+    if __search_warmer is None:
+        settings = get_settings().search
+        __search_warmer = SearchWarmer(
+            get_media_service,
+            get_search_cache(),
+            top_queries=settings.warm_top_queries,
+            period=timedelta(days=settings.warm_period_days),
+            interval=settings.warm_interval,
+            rollup_delay=get_settings().bot_request.rollup_delay,
+        )
+    return __search_warmer
@@ -0,0 +1,163 @@
+from typing import Any, Callable, TypeVar
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import replica_router
+from db.replica import ReplicaRouter
+
+from bot_request.services.service import BotRequestService
+from role.services.service import RoleService
+from storage.dependencies.get_minio_services import get_minio_service
+from attachment.services.service import AttachmentService
+from message.services.service import MessageService
+from user.services.service import UserService
+from botcommand.services.service import BotCommandService
+from permission.services.service import PermissionService
+from permission.dependencies.get_permission_cache import get_permission_cache
+from tg.bot.services.media import MediaService
+from tg.bot.services.channel import ChannelService
+from global_var.services.service import GlobalVarService
+from dependencies import get_search_cache
+
+T = TypeVar('T')
+
+
+class ServiceContainer:
+    '''
+    Сервисы одного обновления Telegram на общей сессии БД. Каждый сервис \
+        создается при первом обращении и переиспользуется, поэтому \
+        обработчик не строит граф зависимостей заново и не открывает \
+        собственных сессий. Поиск и проверка доступа читают из реплики, \
+        если она настроена и не отстает
+    '''
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        bot: Bot | None = None,
+        router: ReplicaRouter = replica_router,
+    ) -> None:
+        '''
+        Сервисы одного обновления Telegram
+
+        Args:
+            db (AsyncSession): Асинхронная сессия БД обновления
+            bot (Bot | None): Бот, получивший обновление
+            router (ReplicaRouter): Выбор БД для чтения
+        '''
+        self.db = db
+        self.bot = bot
+        self.router = router
+        self.__services: dict[tuple[type, str], Any] = {}
+        self.__read_db: AsyncSession | None = None
+
+    def __get(self, service_class: type[T], factory: Callable[[], T], name: str = '') -> T:
+        key = (service_class, name)
+        if key not in self.__services:
+            self.__services[key] = factory()
+        return self.__services[key]
+
+    async def read_db(self) -> AsyncSession:
+        '''
+        Сессия для чтения: реплики, если она не отстает, иначе сессия обновления
+
+        Returns:
+            AsyncSession: Асинхронная сессия БД
+        '''
+        if self.__read_db is None:
+            if self.router.replica_factory is not None and await self.router.use_replica():
+                self.__read_db = self.router.replica_factory()
+            else:
+                self.__read_db = self.db
+        return self.__read_db
+
+    async def close(self) -> None:
+        '''
+        Закрытие сессии реплики, если она была открыта
+        '''
+        if self.__read_db is not None and self.__read_db is not self.db:
+            await self.__read_db.close()
+
+    async def release(self) -> None:
+        '''
+        Фиксация транзакции обновления и возврат соединений в пул перед \
+            долгой работой без БД (парсинг, отправка файлов в Telegram), \
+            чтобы сессия не простаивала в открытой транзакции. Сервисы \
+            остаются доступны: следующий запрос возьмет соединение заново
+        '''
+        await self.db.commit()
+        await self.close()
+
+    async def global_var_service(self) -> GlobalVarService:
+        return self.__get(GlobalVarService, lambda: GlobalVarService(self.db))
+
+    async def attachment_service(self) -> AttachmentService:
+        return self.__get(AttachmentService, lambda: AttachmentService(self.db, get_minio_service()))
+
+    async def message_service(self) -> MessageService:
+        attachment_service = await self.attachment_service()
+        global_var_service = await self.global_var_service()
+        return self.__get(
+            MessageService,
+            lambda: MessageService(self.db, attachment_service, global_var_service),
+        )
+
+    async def role_service(self) -> RoleService:
+        return self.__get(RoleService, lambda: RoleService(self.db))
+
+    async def botcommand_service(self) -> BotCommandService:
+        return self.__get(BotCommandService, lambda: BotCommandService(self.db))
+
+    async def permission_service(self) -> PermissionService:
+        botcommand_service = await self.botcommand_service()
+        role_service = await self.role_service()
+        read_db = await self.read_db()
+        return self.__get(
+            PermissionService,
+            lambda: PermissionService(
+                self.db, botcommand_service, role_service, get_permission_cache(), read_db
+            ),
+        )
+
+    async def user_service(self) -> UserService:
+        permission_service = await self.permission_service()
+        read_db = await self.read_db()
+        return self.__get(UserService, lambda: UserService(self.db, permission_service, read_db))
+
+    async def read_message_service(self) -> MessageService:
+        read_db = await self.read_db()
+        if read_db is self.db:
+            return await self.message_service()
+        return self.__get(
+            MessageService,
+            lambda: MessageService(
+                read_db,
+                AttachmentService(read_db, get_minio_service()),
+                GlobalVarService(read_db),
+            ),
+            name='read',
+        )
+
+    async def media_service(self) -> MediaService:
+        message_service = await self.message_service()
+        read_message_service = await self.read_message_service()
+        return self.__get(
+            MediaService,
+            lambda: MediaService(
+                self.db,
+                message_service,
+                get_minio_service(),
+                get_search_cache(),
+                read_message_service,
+            ),
+        )
+
+    async def bot_request_service(self) -> BotRequestService:
+        return self.__get(BotRequestService, lambda: BotRequestService(self.db))
+
+    async def channel_service(self) -> ChannelService:
+        if self.bot is None:
+            raise RuntimeError('Обновление получено без бота')
+        message_service = await self.message_service()
+        bot = self.bot
+        return self.__get(ChannelService, lambda: ChannelService(self.db, message_service, bot))
@@ -13,7 +13,7 @@ class GlobalVarModel(BaseModel):
     '''
     __tablename__ = 'global_var'
 
-    name: Mapped[str] = mapped_column(nullable=False)
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
     value: Mapped[str] = mapped_column(nullable=False)
 
     def __eq__(self, value: object) -> bool:
@@ -26,21 +26,14 @@ class GlobalVarService(BaseService[GlobalVarModel]):
         )
 
     async def get_value(self, name: str) -> str | None:
-        filter = {'name': name}
-        if not await self.exists(filter, raise_exc=False):
-            return None
-        model = await self.get(filter)
-        return model.value
+        model = await self.get_or_none({'name': name})
+        return model.value if model is not None else None
 
     async def set_value(self, name: str, value: str) -> None:
-        filter = {'name': name}
-        if await self.exists(filter, raise_exc=False):
-            model = await self.get(filter)
-            model.value = value
-            await self.update(model, filter)
-        else:
-            model = GlobalVarModel.from_schema(GlobalVarSimpleSchema(
+        await self.upsert(
+            GlobalVarModel.from_schema(GlobalVarSimpleSchema(
                 name=name,
                 value=value
-            ))
-            await self.create(model)
+            )),
+            index_elements=['name'],
+        )
@@ -0,0 +1,108 @@
+import os
+import gzip
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+
+class PageArchive:
+    '''
+    Архив страниц `t.me/s/<channel>` на диске. Каждая страница хранится \
+        в отдельном gzip-файле, имя которого - курсор запроса \
+        (`after_<id>`, `before_<id>` или `latest`)
+    '''
+    SUFFIX = '.html.gz'
+
+    def __init__(self, archive_dir: str | Path) -> None:
+        '''
+        Архив страниц `t.me/s/<channel>`
+
+        Args:
+            archive_dir (str | Path): Папка архива
+        '''
+        self.archive_dir = Path(archive_dir)
+
+    @staticmethod
+    def get_cursor(after: int | None = None, before: int | None = None) -> str:
+        '''
+        Получение курсора страницы по параметрам запроса
+
+        Args:
+            after (int | None): ID поста, после которого запрошена страница
+            before (int | None): ID поста, до которого запрошена страница
+
+        Returns:
+            str: Курсор страницы
+        '''
+        if after is not None:
+            return f'after_{after}'
+        if before is not None:
+            return f'before_{before}'
+        return 'latest'
+
+    @classmethod
+    def get_cursor_id(cls, path: Path) -> int:
+        '''
+        Получение ID поста из имени файла страницы. Нужно для обхода \
+            архива в порядке постов
+
+        Args:
+            path (Path): Путь к файлу страницы
+
+        Returns:
+            int: ID поста. `0` - для страниц без ID
+        '''
+        cursor = path.name.removesuffix(cls.SUFFIX)
+        _, _, msg_id = cursor.partition('_')
+        return int(msg_id) if msg_id.isdigit() else 0
+
+    def __write(self, cursor: str, html: str) -> None:
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                gz.write(html.encode('utf-8'))
+            os.replace(tmp_path, self.archive_dir / f'{cursor}{self.SUFFIX}')
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    async def save(self, cursor: str, html: str) -> None:
+        '''
+        Сохранение страницы в архив. Запись атомарная: \
+            файл пишется во временный и затем переименовывается
+
+        Args:
+            cursor (str): Курсор страницы
+            html (str): HTML страницы
+        '''
+        await asyncio.to_thread(self.__write, cursor, html)
+
+    @staticmethod
+    def read(path: Path) -> str:
+        '''
+        Чтение страницы из архива
+
+        Args:
+            path (Path): Путь к файлу страницы
+
+        Returns:
+            str: HTML страницы
+        '''
+        with gzip.open(path, 'rb') as gz:
+            return gz.read().decode('utf-8')
+
+    def iter_pages(self) -> Iterator[Path]:
+        '''
+        Обход страниц архива в порядке постов
+
+        Yields:
+            Path: Путь к файлу страницы
+        '''
+        if not self.archive_dir.exists():
+            return
+        yield from sorted(
+            self.archive_dir.glob(f'*{self.SUFFIX}'),
+            key=self.get_cursor_id,
+        )
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from typing import AsyncGenerator, Callable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+
+from db.database import async_engine, async_session
+from global_var.services.service import GlobalVarService
+
+
+class IngestionCoordinator:
+    '''
+    Запуск парсинга не более чем в одном экземпляре. Экземпляры бота \
+        договариваются через advisory lock Postgres, а повторный `/parse` \
+        в том же процессе подключается к прогрессу уже идущего парсинга \
+        вместо запуска еще одного
+    '''
+    LOCK_KEY: int = 1751936374
+    JOINED_MSG = 'Парсинг уже запущен, показываю его прогресс'
+    REMOTE_MSG = 'Парсинг уже запущен другим экземпляром бота'
+
+    def __init__(
+        self,
+        engine: AsyncEngine = async_engine,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        poll_interval: float = 15,
+    ) -> None:
+        '''
+        Запуск парсинга не более чем в одном экземпляре
+
+        Args:
+            engine (AsyncEngine): Движок БД, через соединение которого \
+                удерживается advisory lock
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            poll_interval (float): Период опроса прогресса парсинга, \
+                запущенного другим экземпляром бота (секунд)
+        '''
+        self.engine = engine
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger('tg_logger')
+        self.__task: asyncio.Task | None = None
+        self.__subscribers: set[asyncio.Queue[str | None]] = set()
+        self.__last_msg: str | None = None
+        self.__lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    async def run(self, job: Callable[[], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+        '''
+        Запуск парсинга или подключение к уже запущенному
+
+        Args:
+            job (Callable[[], AsyncGenerator[str, None]]): Парсинг. \
+                Должен сам открывать сессии БД, т.к. может пережить \
+                обработчик, который его запустил
+
+        Yields:
+            str: Прогресс парсинга
+        '''
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        remote = False
+
+        async with self.__lock:
+            joined = self.is_running
+            if not joined:
+                connection = await self.__try_lock()
+                remote = connection is None
+                if connection is not None:
+                    self.__last_msg = None
+                    self.__task = asyncio.create_task(self.__run_job(job, connection))
+            if not remote:
+                self.__subscribers.add(queue)
+
+        if remote:
+            async for remote_msg in self.__follow_remote():
+                yield remote_msg
+            return
+
+        try:
+            if joined:
+                yield self.JOINED_MSG
+                if self.__last_msg:
+                    yield self.__last_msg
+            while (msg := await queue.get()) is not None:
+                yield msg
+        finally:
+            self.__subscribers.discard(queue)
+
+    async def __try_lock(self) -> AsyncConnection | None:
+        '''
+        Попытка взять advisory lock. Блокировка уровня сессии удерживается \
+            соединением в режиме autocommit, чтобы не держать открытую \
+            транзакцию все время парсинга
+
+        Returns:
+            AsyncConnection | None: Соединение, удерживающее блокировку. \
+                `None` - блокировку удерживает другой экземпляр бота
+        '''
+        connection = await self.engine.connect()
+        try:
+            connection = await connection.execution_options(isolation_level='AUTOCOMMIT')
+            acquired = await connection.scalar(
+                text('SELECT pg_try_advisory_lock(:key)'),
+                {'key': self.LOCK_KEY}
+            )
+        except Exception:
+            await connection.close()
+            raise
+
+        if not acquired:
+            await connection.close()
+            return None
+        return connection
+
+    async def __is_locked(self) -> bool:
+        async with self.engine.connect() as connection:
+            return bool(await connection.scalar(
+                text(
+                    'SELECT EXISTS (SELECT 1 FROM pg_locks '
+                    "WHERE locktype = 'advisory' AND granted "
+                    'AND classid = 0 AND objid::bigint = :key AND objsubid = 1)'
+                ),
+                {'key': self.LOCK_KEY}
+            ))
+
+    def __broadcast(self, msg: str | None) -> None:
+        for queue in self.__subscribers:
+            queue.put_nowait(msg)
+
+    async def __run_job(
+        self,
+        job: Callable[[], AsyncGenerator[str, None]],
+        connection: AsyncConnection,
+    ) -> None:
+        try:
+            async for msg in job():
+                self.__last_msg = msg
+                self.__broadcast(msg)
+        except Exception as e:
+            self.logger.error(f'Парсинг завершился с ошибкой: {e}')
+            self.__broadcast(f'Парсинг завершился с ошибкой: {e}')
+        finally:
+            try:
+                await connection.execute(
+                    text('SELECT pg_advisory_unlock(:key)'),
+                    {'key': self.LOCK_KEY}
+                )
+            finally:
+                await connection.close()
+                self.__broadcast(None)
+
+    async def __follow_remote(self) -> AsyncGenerator[str, None]:
+        '''
+        Прогресс парсинга, запущенного другим экземпляром бота. \
+            Отслеживается по `last_parsed_msg_id`, пока удерживается блокировка
+
+        Yields:
+            str: Прогресс парсинга
+        '''
+        yield self.REMOTE_MSG
+        last_parsed: str | None = None
+        while await self.__is_locked():
+            async with self.session_factory() as db:
+                value = await GlobalVarService(db).get_value('last_parsed_msg_id')
+            if value != last_parsed:
+                last_parsed = value
+                yield f'Парсинг...\n\nСледующее сообщение: {value}'
+            await asyncio.sleep(self.poll_interval)
+        yield 'Парсинг завершен'
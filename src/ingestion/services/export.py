@@ -0,0 +1,300 @@
+import re
+import json
+import asyncio
+import logging
+from io import BytesIO
+from pathlib import Path
+from typing import Any, AsyncGenerator, Iterator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from db.database import async_session
+from dependencies import get_message_service
+from attachment.models.model import AttachmentModel
+from attachment.repositories.repository import AttachmentRepository
+from attachment.schemas.schema import AttachmentMinioSchema
+from attachment.services.service import AttachmentService
+from message.models.model import MessageModel
+from message.repositories.repository import MessageRepository
+from storage.services.minio_service import MinioService
+
+
+class ExportImportService:
+    '''
+    Импорт постов из экспорта канала, сделанного в Telegram Desktop \
+        (`result.json` и папки с медиа). Работает без доступа к t.me
+    '''
+    MESSAGES_ARRAY = re.compile(r'"messages"\s*:\s*\[')
+
+    def __init__(
+        self,
+        minio_service: MinioService,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        batch_size: int = 500,
+        workers: int = 8,
+    ) -> None:
+        '''
+        Импорт постов из экспорта канала
+
+        Args:
+            minio_service (MinioService): Сервис MinIO
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД. \
+                На каждую пачку постов открывается отдельная сессия
+            batch_size (int): Количество постов в одной пачке. По-умолчанию: `500`
+            workers (int): Количество одновременных загрузок в MinIO. По-умолчанию: `8`
+        '''
+        self.minio_service = minio_service
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.workers = workers
+        self.logger = logging.getLogger('tg_logger')
+        self.__settings = get_settings()
+
+    def __iter_messages(self, path: Path, chunk_size: int = 1 << 20) -> Iterator[dict[str, Any]]:
+        '''
+        Потоковое чтение массива `messages` из `result.json` без загрузки \
+            всего файла в память
+
+        Args:
+            path (Path): Путь к `result.json`
+            chunk_size (int): Размер читаемого за раз фрагмента файла
+
+        Yields:
+            dict[str,Any]: Сообщение из экспорта
+
+        Raises:
+            ValueError: Файл не является экспортом канала
+        '''
+        decoder = json.JSONDecoder()
+        with path.open(encoding='utf-8') as f:
+            buffer = ''
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f'В {path} нет списка messages')
+                buffer += chunk
+                match = self.MESSAGES_ARRAY.search(buffer)
+                if match:
+                    buffer = buffer[match.end():]
+                    break
+                buffer = buffer[-32:]
+
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos == len(buffer):
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise ValueError(f'Неожиданный конец файла {path}')
+                    buffer, pos = chunk, 0
+                    continue
+                if buffer[pos] == ']':
+                    return
+
+                try:
+                    message, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+
+                yield message
+                pos = end
+                if pos > chunk_size:
+                    buffer, pos = buffer[pos:], 0
+
+    @staticmethod
+    def __get_text(message: dict[str, Any]) -> str:
+        text = message.get('text', '')
+        if isinstance(text, list):
+            text = ''.join(
+                part if isinstance(part, str) else str(part.get('text', ''))
+                for part in text
+            )
+        return str(text)
+
+    def __get_media_path(self, export_dir: Path, message: dict[str, Any]) -> Path | None:
+        '''
+        Получение пути к медиа-файлу сообщения. Файлы, которые не были \
+            выгружены, и файлы с неподдерживаемым расширением пропускаются
+
+        Args:
+            export_dir (Path): Папка экспорта
+            message (dict[str,Any]): Сообщение из экспорта
+
+        Returns:
+            Path | None: Путь к медиа-файлу
+        '''
+        relative_path = message.get('photo') or message.get('file')
+        if not relative_path or relative_path.startswith('('):
+            return None
+        path = export_dir / relative_path
+        if path.suffix[1:].lower() not in self.__settings.attachment.extensions:
+            return None
+        return path
+
+    def __iter_posts(self, export_dir: Path) -> Iterator[dict[str, Any]]:
+        '''
+        Группировка сообщений экспорта в посты. Как и на `t.me/s`, \
+            альбом - это один пост с ID первого сообщения альбома: \
+            сообщения альбома идут подряд, отправлены в одно время \
+            и текст есть только у одного из них
+
+        Args:
+            export_dir (Path): Папка экспорта
+
+        Yields:
+            dict[str,Any]: Пост
+        ```
+        {
+            "id": message_id, [int]
+            "text": message_text, [str]
+            "media": [(media_message_id, media_path)], [list[tuple[int, Path]]]
+        }
+        ```
+        '''
+        post: dict[str, Any] | None = None
+        last: dict[str, Any] = {}
+        for message in self.__iter_messages(export_dir / 'result.json'):
+            if message.get('type') != 'message':
+                continue
+
+            text = self.__get_text(message)
+            media_path = self.__get_media_path(export_dir, message)
+
+            if (post is not None
+                    and media_path is not None
+                    and post['media']
+                    and message['id'] == last.get('id', 0) + 1
+                    and message.get('date') == last.get('date')
+                    and not (text and post['text'])):
+                post['media'].append((message['id'], media_path))
+                post['text'] = post['text'] or text
+            else:
+                if post is not None:
+                    yield post
+                post = {
+                    'id': message['id'],
+                    'text': text,
+                    'media': [(message['id'], media_path)] if media_path else [],
+                }
+            last = message
+
+        if post is not None:
+            yield post
+
+    async def __upload_media(
+        self,
+        semaphore: asyncio.Semaphore,
+        media_path: Path,
+    ) -> AttachmentMinioSchema | None:
+        async with semaphore:
+            try:
+                data = await asyncio.to_thread(media_path.read_bytes)
+                return await self.minio_service.upload_file(
+                    BytesIO(data),
+                    media_path.suffix[1:].lower(),
+                )
+            except Exception as e:
+                self.logger.warning(f'Не удалось загрузить {media_path.name}: {e}')
+                return None
+
+    async def __import_batch(self, posts: list[dict[str, Any]]) -> tuple[int, int]:
+        '''
+        Загрузка пачки постов: медиа - в MinIO параллельно, \
+            строки `message` и `attachment` - через COPY
+
+        Args:
+            posts (list[dict[str,Any]]): Посты
+
+        Returns:
+            tuple[int, int]: Количество добавленных сообщений и медиа-файлов
+        '''
+        async with self.session_factory() as db:
+            message_repository = MessageRepository(db)
+            existing = set((await db.scalars(
+                select(MessageModel.tg_msg_id).where(
+                    MessageModel.tg_msg_id.in_([p['id'] for p in posts])
+                )
+            )).all())
+            posts = [p for p in posts if p['id'] not in existing and p['text']]
+
+            semaphore = asyncio.Semaphore(self.workers)
+            media = [(p['id'], media_id, path) for p in posts for media_id, path in p['media']]
+            uploaded = await asyncio.gather(*[
+                self.__upload_media(semaphore, path) for _, _, path in media
+            ])
+
+            messages_count = await message_repository.bulk_insert(
+                MessageModel,
+                ['tg_msg_id', 'text'],
+                [(p['id'], p['text']) for p in posts],
+            )
+            attachments_count = await AttachmentRepository(db).bulk_insert(
+                AttachmentModel,
+                ['tg_msg_id', 'tg_file_url', 'file_name', 'file_extension',
+                 'file_size', 'width', 'height', 'webp_size', 'phash'],
+                [
+                    (post_id, AttachmentService.get_media_url(media_id),
+                     schema.file_name, schema.file_extension,
+                     schema.file_size, schema.width, schema.height, schema.webp_size, schema.phash)
+                    for (post_id, media_id, _), schema in zip(media, uploaded)
+                    if schema is not None
+                ],
+            )
+            await db.commit()
+        return messages_count, attachments_count
+
+    async def import_export(self, export_dir: Path) -> AsyncGenerator[dict[str, Any]]:
+        '''
+        Импорт экспорта канала. После импорта `last_parsed_msg_id` \
+            сдвигается за последний импортированный пост, \
+            чтобы `/parse` продолжил с этого места
+
+        Args:
+            export_dir (Path): Папка экспорта с `result.json`
+
+        Yields:
+            dict[str,Any]: Прогресс импорта
+        ```
+        {
+            "messages": imported_messages_count, [int]
+            "attachments": imported_attachments_count, [int]
+            "last": last_msg_id, [int]
+        }
+        ```
+        '''
+        messages_count = 0
+        attachments_count = 0
+        last_msg_id = 0
+        batch: list[dict[str, Any]] = []
+
+        async def flush() -> dict[str, Any]:
+            nonlocal messages_count, attachments_count
+            imported = await self.__import_batch(batch)
+            messages_count += imported[0]
+            attachments_count += imported[1]
+            batch.clear()
+            return {
+                'messages': messages_count,
+                'attachments': attachments_count,
+                'last': last_msg_id,
+            }
+
+        for post in self.__iter_posts(export_dir):
+            batch.append(post)
+            last_msg_id = max(last_msg_id, post['id'], *[m[0] for m in post['media']])
+            if len(batch) >= self.batch_size:
+                yield await flush()
+        if batch:
+            yield await flush()
+
+        if last_msg_id:
+            async with self.session_factory() as db:
+                message_service = await get_message_service(db)
+                await message_service.advance_last_parsed_msg_id(last_msg_id + 1)
+                await db.commit()
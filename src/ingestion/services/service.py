@@ -0,0 +1,410 @@
+import random
+import asyncio
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncGenerator, Awaitable, Callable
+import minio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from db.database import async_session
+from attachment.models.model import AttachmentModel
+from attachment.services.service import AttachmentService
+from ingestion.services.archive import PageArchive
+from message.models.model import MessageModel
+from message.schemas.schema import MessageCreateSchema
+from message.services.scraper import ScraperService
+from message.services.service import MessageService
+
+
+class IngestionService:
+    '''
+    Парсинг постов канала в базу. Каждая страница постов сохраняется \
+        в отдельной сессии БД, которая коммитится и очищается сразу \
+        после страницы, поэтому память не растет на длинном парсинге
+    '''
+
+    def __init__(
+        self,
+        scraper: ScraperService,
+        message_service_factory: Callable[[AsyncSession], Awaitable[MessageService]],
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+    ) -> None:
+        '''
+        Парсинг постов канала в базу
+
+        Args:
+            scraper (ScraperService): Парсер страниц `t.me/s/<channel>`
+            message_service_factory (Callable[[AsyncSession], Awaitable[MessageService]]): \
+                Создание сервиса сообщений для сессии БД
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+        '''
+        self.scraper = scraper
+        self.message_service_factory = message_service_factory
+        self.session_factory = session_factory
+        self.logger = logging.getLogger('tg_logger')
+
+    def __get_msg_url(self, msg_id: int) -> str:
+        settings = get_settings()
+        return f'https://t.me/{settings.telegram.channel_name}/{msg_id}'
+
+    async def __get_last_parsed_msg_id(self) -> int:
+        async with self.session_factory() as db:
+            message_service = await self.message_service_factory(db)
+            return await message_service.get_last_parsed_msg_id()
+
+    async def __ingest_batch(
+        self,
+        parsed: list[dict[str, Any]],
+        current_msg_id: int,
+    ) -> tuple[list[int], set[int], int]:
+        '''
+        Сохранение страницы постов в отдельной сессии БД. Каждый пост \
+            сохраняется в точке сохранения, поэтому ошибка в одном посте \
+            не отменяет остальные посты страницы. После коммита все модели \
+            удаляются из сессии
+
+        Args:
+            parsed (list[dict[str,Any]]): Спаршенные посты
+            current_msg_id (int): ID сообщения, с которого начата страница
+
+        Returns:
+            tuple[list[int], set[int], int]: ID сохраненных и пропущенных \
+                сообщений, ID сообщения, с которого продолжится парсинг
+        '''
+        current_messages_id: list[int] = []
+        skipped_messages_id: set[int] = set()
+
+        async with self.session_factory() as db:
+            message_service = await self.message_service_factory(db)
+            for m in parsed:
+                first_media_id = int(m['id'])
+
+                try:
+                    # Медиафайлы альбома - отдельные посты с ID по порядку
+                    files: list[tuple[int, int, str]] = [
+                        (first_media_id, first_media_id + i, media_url)
+                        for i, media_url in enumerate(m['image_urls'])
+                    ]
+                    schema = MessageCreateSchema(
+                        tg_msg_id=first_media_id,
+                        text=m['text'],
+                    )
+                    async with db.begin_nested():
+                        await message_service.create(
+                            model=MessageModel.from_schema(schema),
+                            files_info=files
+                        )
+                    current_messages_id.append(first_media_id)
+                    current_msg_id += len(files)
+                except Exception as e:
+                    current_msg_id = first_media_id + 1
+                    skipped_messages_id.update([first_media_id])
+                    self.logger.warning(f'Не удалось сохранить сообщение {first_media_id}: {e}')
+
+            await message_service.advance_last_parsed_msg_id(current_msg_id)
+            await db.commit()
+            db.expunge_all()
+
+        return current_messages_id, skipped_messages_id, current_msg_id
+
+    async def parse(self, first_msg_id: int | None, last_msg_id: int | None) -> AsyncGenerator[dict[str, Any]]:
+        '''
+        Парсинг сообщений из канала
+
+        Args:
+            first_msg_id (int | None): ID первого сообщения в очереди на парсинг. Если `None` - id последнего спаршенного сообщения
+            last_msg_id (int | None): ID последнего сообщения в очереди на парсинг.  Если `None` - id последнего сообщения
+        Raises:
+            Exception: Не удалось спарсить сообщения
+
+        Yields:
+            dict[str,Any]: Прогресс парсинга
+        ```
+        {
+            "current": current_msgs_ids, [list[int]]
+            "first": first_msg_id, [int]
+            "last": last_msg_id, [int]
+            "skipped": messages, [set[int]]
+            "total": messages_count [int]
+        }
+        ```
+        '''
+        self.logger.info('Обновление займет продолжительное время...')
+
+        if not first_msg_id:
+            last_parsed = await self.__get_last_parsed_msg_id()
+            first = await self.scraper.get_first_msg_id()
+            first_msg_id = int(max(last_parsed, first))
+
+        _first_msg_id = first_msg_id
+
+        if not last_msg_id:
+            last_msg_id = await self.scraper.get_last_msg_id()
+
+        current_msg_id = first_msg_id
+        while current_msg_id < last_msg_id:
+            last_msg_id = await self.scraper.get_last_msg_id()
+            parsed = await self.scraper.parse_messages(after=current_msg_id - 1)
+
+            if parsed:
+                current_messages_id, skipped_messages_id, current_msg_id = (
+                    await self.__ingest_batch(parsed, current_msg_id)
+                )
+
+                yield {
+                    'current': current_messages_id,
+                    'first': int(_first_msg_id),
+                    'last': int(last_msg_id),
+                    'skipped': skipped_messages_id,
+                    'total': len(current_messages_id),
+                }
+            else:
+                current_msg_id += 1
+            sleep_time = random.randint(5, 10)
+            await asyncio.sleep(sleep_time)
+
+    async def parse_all(self) -> AsyncGenerator[dict[str, Any]]:
+        '''
+        Парсинг всех сообщений из канала
+
+        Raises:
+            Exception: Не удалось спарсить сообщения
+
+        Yields:
+            dict[str,Any]: Прогресс парсинга в формате `parse`
+        '''
+        self.logger.info('Обновление займет продолжительное время...')
+        last_msg_id = await self.scraper.get_last_msg_id()
+        first_msg_id = 0
+        async for msg_batch in self.parse(first_msg_id, last_msg_id):
+            yield msg_batch
+
+    async def parse_new(self) -> AsyncGenerator[dict[str, Any]]:
+        '''
+        Парсинг новых сообщений из канала
+
+        Raises:
+            Exception: Не удалось спарсить сообщения
+
+        Yields:
+            dict[str,Any]: Прогресс парсинга в формате `parse`
+        '''
+        self.logger.info('Обновление займет продолжительное время...')
+        async for msg_batch in self.parse(None, None):
+            yield msg_batch
+
+    async def update_messages_base(self, show_msg=False) -> AsyncGenerator[str, None]:
+        '''
+        Парсинг всех сообщений в канале
+
+        Args:
+            show_msg (bool): Выводить спаршеные сообщения отправителю. По-умолчанию `False`
+
+        Yields:
+            Iterator[AsyncGenerator[str]]: Прогресс парсинга
+        '''
+        yield 'Запуск парсинга...'
+        skipped = set()
+
+        try:
+            async for msg in self.parse_new():
+                if show_msg:
+                    current = msg['current']
+                    skipped.update(msg['skipped'])
+                    current_str = '\n'.join([self.__get_msg_url(msg_id) for msg_id in current])
+                    skipped_str = '\n'.join([self.__get_msg_url(msg_id) for msg_id in skipped])
+                    last = msg['last']
+                    first = msg['first']
+                    total = msg['total']
+                    output = (f'Парсинг...\n\n'
+                              f'Текущие:\n{current_str}\n'
+                              f'Первое: {self.__get_msg_url(first)}\n'
+                              f'Последнее: {self.__get_msg_url(last)}\n' +
+                              (f'Пропущенные:\n{skipped_str}\n' if skipped else '') +
+                              f'Итого сообщений за этот момент: {total}')
+                    yield output
+        except minio.error.S3Error as e:
+            message = e.message or str(e)
+            logging.error(message)
+            yield message
+        yield 'Парсинг завершен'
+
+    @staticmethod
+    def parse_archived_page(path: Path) -> list[dict[str, Any]]:
+        '''
+        Извлечение постов из страницы архива. Выполняется в пуле процессов
+
+        Args:
+            path (Path): Путь к файлу страницы
+
+        Returns:
+            list[dict[str,Any]]: Посты в формате `ScraperService.parse_data`
+        '''
+        return ScraperService().parse_page(PageArchive.read(path))
+
+    async def __reextract_batch(
+        self,
+        posts: dict[int, dict[str, Any]],
+        stats: dict[str, int],
+        fetch_media: bool,
+    ) -> None:
+        '''
+        Обновление строк `message` и `attachment` по заново извлеченным \
+            постам. Изменения пишутся массовыми UPDATE. Ключ медиа, \
+            который уже есть у другой строки, не присваивается
+
+        Args:
+            posts (dict[int, dict[str,Any]]): Посты по ID
+            stats (dict[str,int]): Счетчики, обновляемые по ходу работы
+            fetch_media (bool): Загружать медиа-контент, которого нет в базе
+        '''
+        async with self.session_factory() as db:
+            message_service = await self.message_service_factory(db)
+            existing = {
+                m.tg_msg_id: m
+                for m in await db.scalars(
+                    select(MessageModel).where(MessageModel.tg_msg_id.in_(posts))
+                )
+            }
+            keys = {
+                msg_id: [AttachmentService.get_media_url(msg_id + i) for i in range(len(post['image_urls']))]
+                for msg_id, post in posts.items()
+            }
+            used = set(await db.scalars(
+                select(AttachmentModel.tg_file_url).where(
+                    AttachmentModel.tg_file_url.in_([key for post_keys in keys.values() for key in post_keys])
+                )
+            ))
+
+            text_rows: list[dict[str, Any]] = []
+            attachment_rows: list[dict[str, Any]] = []
+            for msg_id, post in posts.items():
+                message = existing.get(msg_id)
+                if message is None:
+                    stats['missing'] += 1
+                    if fetch_media:
+                        await message_service.create(
+                            MessageModel.from_schema(MessageCreateSchema(
+                                tg_msg_id=msg_id,
+                                text=post['text'],
+                            )),
+                            files_info=[(msg_id, msg_id + i, url) for i, url in enumerate(post['image_urls'])],
+                        )
+                    continue
+
+                if message.text != post['text']:
+                    text_rows.append({'tg_msg_id': msg_id, 'text': post['text']})
+
+                # Строка сопоставляется медиа поста по ключу или по ссылке
+                # на CDN из той же страницы. Строки, которые не удалось
+                # сопоставить, не меняются: это может быть любое медиа поста,
+                # поэтому новые медиа для такого поста не загружаются
+                urls = post['image_urls']
+                post_keys = keys[msg_id]
+                matched: set[int] = set()
+                unmatched = 0
+                for attachment in sorted(message.attachments, key=lambda a: a.id):
+                    index = next(
+                        (
+                            i for i in range(len(urls))
+                            if i not in matched and attachment.tg_file_url in (post_keys[i], urls[i])
+                        ),
+                        None,
+                    )
+                    if index is None:
+                        unmatched += 1
+                        continue
+                    matched.add(index)
+                    if attachment.tg_file_url == post_keys[index]:
+                        continue
+                    if post_keys[index] in used:
+                        stats['skipped'] += 1
+                        continue
+                    used.add(post_keys[index])
+                    attachment_rows.append({'id': attachment.id, 'tg_file_url': post_keys[index]})
+                if unmatched:
+                    stats['skipped'] += unmatched
+                    continue
+
+                new_files = [
+                    (msg_id, msg_id + i, url)
+                    for i, url in enumerate(urls)
+                    if i not in matched and post_keys[i] not in used
+                ]
+                stats['new_media'] += len(new_files)
+                if new_files and fetch_media:
+                    used.update(AttachmentService.get_media_url(media_msg_id) for _, media_msg_id, _ in new_files)
+                    await message_service.attachment_service.upload_files(*new_files)
+
+            await message_service.repository.bulk_update(MessageModel, 'tg_msg_id', text_rows)
+            await message_service.attachment_service.repository.bulk_update(
+                AttachmentModel, 'id', attachment_rows
+            )
+            stats['messages'] += len(text_rows)
+            stats['attachments'] += len(attachment_rows)
+
+            await db.commit()
+            db.expunge_all()
+
+    async def reextract(
+        self,
+        archive: PageArchive,
+        fetch_media: bool = False,
+        workers: int | None = None,
+        batch_size: int = 500,
+    ) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Повторное извлечение постов из архива страниц без обращения к t.me. \
+            Нужно, чтобы применить изменения в `ScraperService.parse_data` \
+            ко всей истории канала
+
+        Args:
+            archive (PageArchive): Архив страниц
+            fetch_media (bool): Загружать посты и медиа-контент, которых \
+                нет в базе. По-умолчанию: `False` - только посчитать их
+            workers (int | None): Количество процессов для разбора страниц. \
+                По-умолчанию: количество ядер
+            batch_size (int): Количество постов, обновляемых за одну транзакцию
+
+        Yields:
+            dict[str,int]: Прогресс
+        ```
+        {
+            "pages": pages_count, [int]
+            "messages": updated_messages_count, [int]
+            "attachments": updated_attachments_count, [int]
+            "new_media": new_media_count, [int]
+            "skipped": skipped_attachments_count, [int]
+            "missing": missing_messages_count [int]
+        }
+        ```
+        '''
+        loop = asyncio.get_running_loop()
+        stats = {'pages': 0, 'messages': 0, 'attachments': 0, 'new_media': 0, 'skipped': 0, 'missing': 0}
+        posts: dict[int, dict[str, Any]] = {}
+        paths = list(archive.iter_pages())
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_size = (workers or 4) * 4
+            for i in range(0, len(paths), chunk_size):
+                chunk = paths[i:i + chunk_size]
+                pages = await asyncio.gather(*[
+                    loop.run_in_executor(pool, self.parse_archived_page, path)
+                    for path in chunk
+                ])
+                for page in pages:
+                    for post in page:
+                        posts[post['id']] = post
+                stats['pages'] += len(chunk)
+
+                if len(posts) >= batch_size:
+                    await self.__reextract_batch(posts, stats, fetch_media)
+                    posts.clear()
+                    yield dict(stats)
+
+        if posts:
+            await self.__reextract_batch(posts, stats, fetch_media)
+        yield dict(stats)
@@ -0,0 +1,289 @@
+import tg.bot
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import timedelta
+
+from attachment.services.backfill import AttachmentBackfillService
+from dependencies import (
+    get_bot_request_partition_manager,
+    get_ingestion_service,
+    get_minio_service,
+    get_page_archive,
+)
+from storage.dependencies.get_minio_services import get_local_backend, get_minio_backend
+from storage.services.gc import StorageGarbageCollector
+from storage.services.migration import StorageMigrationService
+from ingestion.services.export import ExportImportService
+
+
+async def import_export(args: argparse.Namespace) -> None:
+    '''Импорт экспорта канала из Telegram Desktop'''
+    service = ExportImportService(
+        get_minio_service(),
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
+    async for progress in service.import_export(Path(args.path)):
+        print(
+            f'Сообщений: {progress["messages"]}, '
+            f'медиа: {progress["attachments"]}, '
+            f'последнее: {progress["last"]}'
+        )
+
+
+async def reextract(args: argparse.Namespace) -> None:
+    '''Повторное извлечение постов из архива страниц t.me/s'''
+    archive = get_page_archive()
+    if archive is None:
+        raise SystemExit('Архив страниц не настроен: укажите INGESTION__ARCHIVE_DIR')
+
+    service = get_ingestion_service()
+    async for progress in service.reextract(
+        archive,
+        fetch_media=args.fetch_media,
+        workers=args.workers,
+    ):
+        print(
+            f'Страниц: {progress["pages"]}, '
+            f'обновлено сообщений: {progress["messages"]}, '
+            f'обновлено медиа: {progress["attachments"]}, '
+            f'новых медиа: {progress["new_media"]}, '
+            f'пропущено медиа: {progress["skipped"]}, '
+            f'отсутствующих сообщений: {progress["missing"]}'
+        )
+
+
+async def thumbnails(args: argparse.Namespace) -> None:
+    '''Создание превью для ранее загруженных изображений'''
+    service = AttachmentBackfillService(
+        get_minio_service(),
+        concurrency=args.workers,
+        batch_size=args.batch_size,
+    )
+    async for progress in service.thumbnails(force=args.force):
+        print(
+            f'Обработано: {progress["processed"]}, '
+            f'создано: {progress["created"]}, '
+            f'пропущено: {progress["skipped"]}, '
+            f'ошибок: {progress["failed"]}'
+        )
+
+
+async def webp_convert(args: argparse.Namespace) -> None:
+    '''Создание WebP-вариантов для ранее загруженных изображений'''
+    service = AttachmentBackfillService(
+        get_minio_service(),
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+    )
+    progress = None
+    async for progress in service.webp(workers=args.workers):
+        print(
+            f'Обработано: {progress["processed"]}, '
+            f'создано: {progress["created"]}, '
+            f'не меньше оригинала: {progress["skipped"]}, '
+            f'ошибок: {progress["failed"]}'
+        )
+    if progress and progress['original_bytes']:
+        saved = progress['original_bytes'] - progress['webp_bytes']
+        print(
+            f'Оригиналы: {progress["original_bytes"] / 1024 / 1024:.1f} МБ, '
+            f'WebP: {progress["webp_bytes"] / 1024 / 1024:.1f} МБ, '
+            f'сэкономлено: {saved / 1024 / 1024:.1f} МБ '
+            f'({saved / progress["original_bytes"]:.0%})'
+        )
+
+
+async def dimensions(args: argparse.Namespace) -> None:
+    '''Заполнение ширины и высоты ранее загруженных изображений'''
+    service = AttachmentBackfillService(
+        get_minio_service(),
+        concurrency=args.workers,
+        batch_size=args.batch_size,
+    )
+    async for progress in service.dimensions(rate=args.rate, restart=args.restart):
+        print(
+            f'Обработано: {progress["processed"]}, '
+            f'обновлено: {progress["updated"]}, '
+            f'прочитано целиком: {progress["full_reads"]}, '
+            f'ошибок: {progress["failed"]}'
+        )
+
+
+async def phash(args: argparse.Namespace) -> None:
+    '''Вычисление перцептивных хешей ранее загруженных изображений'''
+    service = AttachmentBackfillService(
+        get_minio_service(),
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+    )
+    async for progress in service.hashes(workers=args.workers):
+        print(
+            f'Обработано: {progress["processed"]}, '
+            f'обновлено: {progress["updated"]}, '
+            f'ошибок: {progress["failed"]}'
+        )
+
+
+async def storage_migrate(args: argparse.Namespace) -> None:
+    '''Копирование медиа-контента из MinIO в локальное хранилище'''
+    source = get_minio_backend()
+    target = get_local_backend()
+    await target.initialize()
+    service = StorageMigrationService(source, target, concurrency=args.workers)
+    try:
+        async for progress in service.migrate(overwrite=args.overwrite):
+            print(
+                f'Обработано: {progress["processed"]}, '
+                f'скопировано: {progress["copied"]} '
+                f'({progress["bytes"] / 1024 / 1024:.1f} МБ), '
+                f'пропущено: {progress["skipped"]}, '
+                f'ошибок: {progress["failed"]}'
+            )
+    finally:
+        source.close()
+        target.close()
+
+
+async def storage_gc(args: argparse.Namespace) -> None:
+    '''Удаление файлов хранилища, на которые не ссылается ни одна запись в БД'''
+    collector = StorageGarbageCollector(get_minio_service().backend)
+    async for report in collector.collect(
+        grace_period=timedelta(hours=args.grace_hours),
+        dry_run=not args.delete,
+    ):
+        print(
+            f'{report["prefix"]}: просмотрено {report["scanned"]}, '
+            f'лишних {report["orphans"]} ({report["orphan_bytes"] / 1024 / 1024:.1f} МБ), '
+            f'удалено {report["deleted"]}, '
+            f'пропущено новых {report["recent"]}, '
+            f'пропущено вне порядка {report["unsorted"]}'
+        )
+        for name in report['examples']:
+            print(f'  {name}')
+    if not args.delete:
+        print('Пробный запуск: ничего не удалено. Для удаления добавьте --delete')
+
+
+async def bot_request_partitions(args: argparse.Namespace) -> None:
+    '''Создание будущих и удаление устаревших секций запросов боту'''
+    manager = get_bot_request_partition_manager()
+    if args.retention_months is not None:
+        manager.retention_months = args.retention_months
+    result = await manager.maintain()
+    print(f'Создано секций: {result["created"] or "нет"}')
+    print(f'Удалено секций: {result["dropped"] or "нет"}')
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Служебные команды бота')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser(
+        'import-export',
+        help='Импорт экспорта канала из Telegram Desktop (result.json и папка с медиа)'
+    )
+    command.add_argument('path', help='Папка экспорта')
+    command.add_argument('--batch-size', type=int, default=500)
+    command.add_argument('--workers', type=int, default=8)
+    command.set_defaults(handler=import_export)
+
+    command = commands.add_parser(
+        'reextract',
+        help='Повторное извлечение постов из архива страниц t.me/s без обращения к t.me'
+    )
+    command.add_argument(
+        '--fetch-media',
+        action='store_true',
+        help='Загрузить посты и медиа-контент, которых нет в базе'
+    )
+    command.add_argument('--workers', type=int, default=None)
+    command.set_defaults(handler=reextract)
+
+    command = commands.add_parser(
+        'thumbnails',
+        help='Создание превью для ранее загруженных изображений'
+    )
+    command.add_argument('--force', action='store_true', help='Пересоздать существующие превью')
+    command.add_argument('--batch-size', type=int, default=500)
+    command.add_argument('--workers', type=int, default=8)
+    command.set_defaults(handler=thumbnails)
+
+    command = commands.add_parser(
+        'webp-convert',
+        help='Создание WebP-вариантов для ранее загруженных изображений'
+    )
+    command.add_argument('--batch-size', type=int, default=500)
+    command.add_argument('--workers', type=int, default=None, help='Количество процессов')
+    command.add_argument('--concurrency', type=int, default=8, help='Одновременных запросов к MinIO')
+    command.set_defaults(handler=webp_convert)
+
+    command = commands.add_parser(
+        'dimensions',
+        help='Заполнение ширины и высоты ранее загруженных изображений'
+    )
+    command.add_argument('--rate', type=float, default=None, help='Максимум запросов к MinIO в секунду')
+    command.add_argument('--restart', action='store_true', help='Начать сначала, а не с сохраненной позиции')
+    command.add_argument('--batch-size', type=int, default=500)
+    command.add_argument('--workers', type=int, default=8)
+    command.set_defaults(handler=dimensions)
+
+    command = commands.add_parser(
+        'phash',
+        help='Вычисление перцептивных хешей ранее загруженных изображений'
+    )
+    command.add_argument('--batch-size', type=int, default=500)
+    command.add_argument('--workers', type=int, default=None, help='Количество процессов')
+    command.add_argument('--concurrency', type=int, default=8, help='Одновременных запросов к MinIO')
+    command.set_defaults(handler=phash)
+
+    command = commands.add_parser(
+        'storage-migrate',
+        help='Копирование медиа-контента из MinIO в локальное хранилище (STORAGE__LOCAL_ROOT)'
+    )
+    command.add_argument('--overwrite', action='store_true', help='Перезаписать уже скопированные файлы')
+    command.add_argument('--workers', type=int, default=16)
+    command.set_defaults(handler=storage_migrate)
+
+    command = commands.add_parser(
+        'storage-gc',
+        help='Удаление файлов хранилища, на которые не ссылается ни одна запись в БД'
+    )
+    command.add_argument('--delete', action='store_true', help='Удалить файлы. Без флага - только отчет')
+    command.add_argument(
+        '--grace-hours',
+        type=float,
+        default=24,
+        help='Не трогать файлы моложе указанного количества часов'
+    )
+    command.set_defaults(handler=storage_gc)
+
+    command = commands.add_parser(
+        'bot-request-partitions',
+        help='Создание будущих и удаление устаревших секций запросов боту'
+    )
+    command.add_argument(
+        '--retention-months',
+        type=int,
+        default=None,
+        help='Сколько месяцев хранить запросы (по-умолчанию BOT_REQUEST__RETENTION_MONTHS, 0 - всегда)'
+    )
+    command.set_defaults(handler=bot_request_partitions)
+
+    return parser
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = get_parser().parse_args()
+    minio_service = get_minio_service()
+    await minio_service.initialize()
+    try:
+        await args.handler(args)
+    finally:
+        minio_service.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
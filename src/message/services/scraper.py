@@ -0,0 +1,158 @@
+from typing import Any
+from bs4 import Tag
+from bs4 import BeautifulSoup as bs
+
+import async_requests
+from config import get_settings
+from ingestion.services.archive import PageArchive
+
+
+class ScraperService:
+    '''
+    Парсинг постов канала со страниц `t.me/s/<channel>`. Не работает с БД
+    '''
+
+    def __init__(self, archive: PageArchive | None = None):
+        '''
+        Парсинг постов канала со страниц `t.me/s/<channel>`
+
+        Args:
+            archive (PageArchive | None): Архив, в который сохраняются \
+                загруженные страницы. `None` - страницы не сохраняются
+        '''
+        self.archive = archive
+        self.__settings = get_settings()
+        self.__parsed_messages_at_once = 15
+
+    def parse_data(self, message: Tag) -> dict[str, Any] | None:
+        '''
+        Извлечение данных поста из его HTML
+
+        Args:
+            message (Tag): HTML поста
+
+        Returns:
+            dict[str,Any] | None: Данные поста или `None`, если это не пост
+        ```
+        {
+            "id": message_id, [int]
+            "text": message_text, [str]
+            "image_urls": [image_urls] [list[str]]
+        }
+        ```
+        '''
+        message_text_arr = message.select('.tgme_widget_message_text.js-message_text')
+        parsed_text = message.select(
+            '.tgme_widget_message.text_not_supported_wrap.js-widget_message',
+            limit=1
+        )
+        if parsed_text:
+            message_id = (
+                str(parsed_text[0].get('data-post')).replace(f'{self.__settings.telegram.channel_name}/', ''))
+        else:
+            return None
+        media = message.select('a.tgme_widget_message_photo_wrap')
+        image_urls = []
+        for m in media:
+            style_attr = m.get('style')
+            styles = str(style_attr).split(';')
+            for s in styles:
+                if s.startswith('background-image:url('):
+                    url = s.replace("background-image:url('", '')[:-2]
+                    image_urls.append(url)
+        text = message_text_arr[0].getText() if message_text_arr else ''
+        return {
+            'id': int(message_id),
+            'text': text,
+            'image_urls': image_urls,
+        }
+
+    def parse_page(self, html: str) -> list[dict[str, Any]]:
+        '''
+        Извлечение постов со страницы `t.me/s/<channel>`
+
+        Args:
+            html (str): HTML страницы
+
+        Returns:
+            list[dict[str,Any]]: Посты с текстом в формате `parse_data`
+        '''
+        soup = bs(html, 'html.parser')
+        messages = soup.select('.tgme_widget_message_wrap.js-widget_message_wrap')
+        parsed_data = []
+        for i, m in enumerate(messages):
+            if i > self.__parsed_messages_at_once:
+                break
+            data = self.parse_data(m)
+            if data and data['text'] != '':
+                parsed_data.append(data)
+        return parsed_data
+
+    async def parse_messages(self, after: int | None = None, before: int | None = None) -> list[dict[str, Any]] | None:
+        '''
+        Парсинг сообщений
+
+        Args:
+            after (int, optional): ID поста, после которого будут спаршены сообщения. По-умолчанию: None.
+            before (int, optional): ID поста, до которого будут спаршены сообщения. По-умолчанию: None.
+
+        Returns:
+            list[dict[str,Any]]: Спаршенные сообщения в формате
+        ```
+        [
+            {
+                "id": message_id,
+                "text": message_text,
+                "image_urls": [image_urls]
+            }
+        ]
+            ```
+        '''
+        if before is not None and after is not None:
+            raise ValueError('Нельзя одновременно использовать before и after')
+
+        base_url = f'https://t.me/s/{self.__settings.telegram.channel_name}'
+
+        if after is not None:
+            url = f'{base_url}?after={after}'
+        elif before is not None:
+            url = f'{base_url}?before={before}'
+        else:
+            url = base_url
+
+        try:
+            response = await async_requests.get(url)
+        except Exception as e:
+            raise e
+        else:
+            if self.archive is not None:
+                await self.archive.save(PageArchive.get_cursor(after, before), response.text)
+            return self.parse_page(response.text)
+
+    async def get_last_msg_id(self) -> int:
+        parsed = await self.parse_messages(before=0)
+        if parsed is None:
+            raise Exception('Не удалось спарсить сообщения')
+        last_msg = parsed[-1]
+        last_id = last_msg['id'] + len(last_msg['image_urls']) - 1
+        return last_id
+
+    async def get_first_msg_id(self) -> int:
+        parsed = await self.parse_messages(after=1)
+        if parsed is None:
+            raise Exception('Не удалось спарсить сообщения')
+        first_msg = parsed[0]
+        return first_msg['id']
+
+    async def parse_by_id(self, msg_id: int) -> dict[str, Any] | None:
+        base_url = f'https://t.me/{self.__settings.telegram.channel_name}/{msg_id}#'
+
+        url = base_url
+
+        try:
+            response = await async_requests.get(url)
+        except Exception as e:
+            raise e
+        else:
+            parsed = self.parse_page(response.text)
+            return parsed[0] if parsed else None
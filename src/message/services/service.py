@@ -1,14 +1,9 @@
-from typing import Any, AsyncGenerator
+from io import BytesIO
+from typing import Any
 
 from sqlalchemy import UnaryExpression
-import async_requests
 from attachment.schemas.schema import AttachmentSchema
 from base.model import BaseModel
-from config import get_settings
-from bs4 import Tag
-from bs4 import BeautifulSoup as bs
-import random
-import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 from sqlalchemy.orm.strategy_options import _AttrType
@@ -46,20 +41,25 @@ class MessageService(BaseService[MessageModel]):
         self.attachment_service = attachment_service
         self.global_var_service = global_var_service
         self.logger = logging.getLogger('tg_logger')
-        self.__settings = get_settings()
-        self.__parsed_messages_at_once = 15
 
     async def create(
         self,
         model: MessageModel,
-        files_info: list[tuple[int, str]] | None = None
+        refresh: bool = True,
+        files_info: list[tuple[int, int, str]] | None = None,
     ) -> MessageModel:
         '''
-        Создать сообщение
+        Создать сообщение. Сообщение всегда возвращается с медиа-контентом: \
+            после `INSERT ... ON CONFLICT DO UPDATE RETURNING` связь \
+            `attachments` (`lazy='selectin'`) подгружается вторым SELECT, \
+            поэтому `refresh` ничего не меняет
 
         Args:
             model (MessageModel): SQL Alchemy модель сообщения
-            files_info (list[tuple[int,str]]): Список `ID сообщения` и `URL медиа-контента`
+            refresh (bool): Перечитать сообщение со связанными моделями
+            files_info (list[tuple[int,int,str]]): Список `ID сообщения`, \
+                `ID поста с медиафайлом` и `URL медиа-контента`. Медиафайлы, \
+                которые уже прикреплены к сообщению, повторно не загружаются
 
         Returns:
             MessageModel: SQLAlchemy-модель сообщения
@@ -67,253 +67,88 @@ class MessageService(BaseService[MessageModel]):
         Raises:
             WasNotCreatedError: Не удалось создать сообщение
         '''
-        # model.attachments = []
-        filter = {'tg_msg_id': model.tg_msg_id}
-        if await self.exists(filter, raise_exc=False):
-            existing = await self.get(filter)
-            existing.text = model.text
-            existing.attachments = model.attachments
-            model = await super().update(existing, filter)
-        else:
-            model = await super().create(model)
+        attachments = list(model.attachments)
+        message = await self.upsert(model, ['tg_msg_id'], ['text'])
         if files_info:
-            try:
-                attachments = await self.attachment_service.upload_files(*files_info)
-            except Exception as e:
-                raise e
-            else:
-                model.attachments = attachments or []
-                await super().update(model, filter)
-
-        return model
-
-    async def __parse_data(self, message: Tag) -> dict[str, Any] | None:
-        message_text_arr = message.select('.tgme_widget_message_text.js-message_text')
-        parsed_text = message.select(
-            '.tgme_widget_message.text_not_supported_wrap.js-widget_message',
-            limit=1
-        )
-        if parsed_text:
-            message_id = (
-                str(parsed_text[0].get('data-post')).replace(f'{self.__settings.telegram.channel_name}/', ''))
-        else:
-            return None
-        media = message.select('a.tgme_widget_message_photo_wrap')
-        image_urls = []
-        for m in media:
-            style_attr = m.get('style')
-            styles = str(style_attr).split(';')
-            for s in styles:
-                if s.startswith('background-image:url('):
-                    url = s.replace("background-image:url('", '')[:-2]
-                    image_urls.append(url)
-        text = message_text_arr[0].getText() if message_text_arr else ''
-        return {
-            'id': int(message_id),
-            'text': text,
-            'image_urls': image_urls,
-        }
-
-    async def __parse_messages(self, after: int | None = None, before: int | None = None) -> list[dict[str, Any]] | None:
+            existing = {a.tg_file_url: a for a in message.attachments}
+            urls = [self.attachment_service.get_media_url(media_msg_id) for _, media_msg_id, _ in files_info]
+            uploaded = iter(await self.attachment_service.upload_files(
+                *[file for file, url in zip(files_info, urls) if url not in existing]
+            ) or [])
+            attachments = [existing[url] if url in existing else next(uploaded) for url in urls]
+        message.attachments = attachments
+        await self.db.flush()
+
+        return message
+
+    async def get_last_parsed_msg_id(self) -> int:
         '''
-        Парсинг сообщений
-
-        Args:
-            after (int, optional): ID поста, после которого будут спаршены сообщения. По-умолчанию: None.
-            before (int, optional): ID поста, до которого будут спаршены сообщения. По-умолчанию: None.
+        Получение ID сообщения, с которого продолжится парсинг
 
         Returns:
-            list[dict[str,Any]]: Спаршенные сообщения в формате 
-        ```
-        [
-            {
-                "id": message_id,
-                "text": message_text,
-                "image_urls": [image_urls]
-            }
-        ]
-            ```
+            int: ID сообщения
         '''
-        if before is not None and after is not None:
-            raise ValueError('Нельзя одновременно использовать before и after')
-
-        base_url = f'https://t.me/s/{self.__settings.telegram.channel_name}'
-
-        if after is not None:
-            url = f'{base_url}?after={after}'
-        elif before is not None:
-            url = f'{base_url}?before={before}'
-        else:
-            url = base_url
-
-        try:
-            response = await async_requests.get(url)
-        except Exception as e:
-            raise e
-        else:
-            soup = bs(response.text, 'html.parser')
-            messages = soup.select('.tgme_widget_message_wrap.js-widget_message_wrap')
-            parsed_data = []
-            for i, m in enumerate(messages):
-                if i > self.__parsed_messages_at_once:
-                    break
-                data = await self.__parse_data(m)
-                if data and data['text'] != '':
-                    parsed_data.append(data)
-            return parsed_data
-
-    async def __get_last_msg_id(self) -> int:
-        parsed = await self.__parse_messages(before=0)
-        if parsed is None:
-            raise Exception('Не удалось спарсить сообщения')
-        last_msg = parsed[-1]
-        last_id = last_msg['id'] + len(last_msg['image_urls']) - 1
-        return last_id
-
-    async def __get_first_msg_id(self) -> int:
-        parsed = await self.__parse_messages(after=1)
-        if parsed is None:
-            raise Exception('Не удалось спарсить сообщения')
-        first_msg = parsed[0]
-        return first_msg['id']
-
-    async def __get_last_parsed_msg_id(self) -> int:
         value = await self.global_var_service.get_value('last_parsed_msg_id') or 1
         return int(value)
 
-    async def __set_last_parsed_msg_id(self, value: int) -> None:
-        await self.global_var_service.set_value('last_parsed_msg_id', str(value))
-
-    async def parse(self, first_msg_id: int | None, last_msg_id: int | None) -> AsyncGenerator[dict[str, Any]]:
+    async def set_last_parsed_msg_id(self, value: int) -> None:
         '''
-        Парсинг сообщений из канала
+        Сохранение ID сообщения, с которого продолжится парсинг
 
         Args:
-            first_msg_id (int | None): ID первого сообщения в очереди на парсинг. Если `None` - id последнего спаршенного сообщения
-            last_msg_id (int | None): ID последнего сообщения в очереди на парсинг.  Если `None` - id последнего сообщения
-        Raises:
-            Exception: Не удалось спарсить сообщения
-
-        Yields:
-            dict[str,Any]: Прогресс парсинга 
-        ```
-        {
-            "current": current_msgs_ids, [list[int]]
-            "first": first_msg_id, [int]
-            "last": last_msg_id, [int]
-            "messages": messages, [list[MessageModel]]
-            "skipped": messages, [list[int]]
-            "total": messages_count [int]
-        }
-        ```
+            value (int): ID сообщения
         '''
-        self.logger.info('Обновление займет продолжительное время...')
-
-        if not first_msg_id:
-            last_parsed = await self.__get_last_parsed_msg_id()
-            first = await self.__get_first_msg_id()
-            first_msg_id = int(max(last_parsed, first))
-
-        _first_msg_id = first_msg_id
-
-        if not last_msg_id:
-            last_msg_id = await self.__get_last_msg_id()
-
-        current_msg_id = first_msg_id
-        while current_msg_id < last_msg_id:
-            last_msg_id = await self.__get_last_msg_id()
-            parsed = await self.__parse_messages(after=current_msg_id - 1)
-            models: list[MessageModel] = []
-            skipped_messages_id: set[int] = set()
-
-            if parsed:
-                current_messages_id = []
-                for m in parsed:
-                    first_media_id = int(m['id'])
-
-                    try:
-                        files: list[tuple[int, str]] = [(first_media_id, media_url) for media_url in m['image_urls']]
-                        schema = MessageCreateSchema(
-                            tg_msg_id=first_media_id,
-                            text=m['text'],
-                        )
-                        model = await self.create(
-                            model=MessageModel.from_schema(schema),
-                            files_info=files
-                        )
-                        models.append(model)
-                        current_messages_id.append(first_media_id)
-                        current_msg_id += len(files)
-                    except Exception as e:
-                        current_msg_id = first_media_id + 1
-                        skipped_messages_id.update([first_media_id])
-                        print(e)
-
-                await self.__set_last_parsed_msg_id(current_msg_id)
-                total = len(models)
-
-                yield {
-                    'current': current_messages_id,
-                    'first': int(_first_msg_id),
-                    'last': int(last_msg_id),
-                    'messages': models,
-                    'skipped': skipped_messages_id,
-                    'total': total,
-                }
-            else:
-                current_msg_id += 1
-            sleep_time = random.randint(5, 10)
-            await asyncio.sleep(sleep_time)
+        await self.global_var_service.set_value('last_parsed_msg_id', str(value))
 
-    async def parse_all(self) -> AsyncGenerator[dict[str, Any]]:
+    async def advance_last_parsed_msg_id(self, value: int) -> None:
         '''
-        Парсинг всех сообщений из канала
+        Сдвиг ID сообщения, с которого продолжится парсинг, вперед. \
+            Если сохраненное значение уже больше `value`, оно не меняется
 
-        Raises:
-            Exception: Не удалось спарсить сообщения
-
-        Yields:
-            dict[str,Any]: Прогресс парсинга 
-        ```
-        {
-            "current": current_msgs_ids, [list[int]]
-            "first": first_msg_id, [int]
-            "last": last_msg_id, [int]
-            "messages": messages, [list[MessageModel]]
-            "skipped": messages, [list[int]]
-            "total": messages_count [int]
-        }
-        ```
+        Args:
+            value (int): ID сообщения
         '''
-        self.logger.info('Обновление займет продолжительное время...')
-        last_msg_id = await self.__get_last_msg_id()
-        first_msg_id = 0
-        async for msg_batch in self.parse(first_msg_id, last_msg_id):
-            yield msg_batch
+        if value > await self.get_last_parsed_msg_id():
+            await self.set_last_parsed_msg_id(value)
 
-    async def parse_new(self) -> AsyncGenerator[dict[str, Any]]:
+    async def ingest(
+        self,
+        tg_msg_id: int,
+        text: str | None,
+        files: list[tuple[int, int, BytesIO, str]] | None = None,
+    ) -> MessageModel:
         '''
-        Парсинг новых сообщений из канала
+        Добавление сообщения, полученного напрямую из канала через Bot API. \
+            В отличие от `create`, уже загруженный медиа-контент сообщения \
+            не перезаписывается, а дополняется
 
-        Raises:
-            Exception: Не удалось спарсить сообщения
+        Args:
+            tg_msg_id (int): ID сообщения
+            text (str | None): Текст сообщения. Если `None` - текст не меняется
+            files (list[tuple[int, int, BytesIO, str]] | None): ID сообщения, \
+                ID поста с медиафайлом, файл и его расширение
+
+        Returns:
+            MessageModel: SQLAlchemy-модель сообщения
 
-        Yields:
-            dict[str,Any]: Прогресс парсинга 
-        ```
-        {
-            "current": current_msgs_ids, [list[int]]
-            "first": first_msg_id, [int]
-            "last": last_msg_id, [int]
-            "messages": messages, [list[MessageModel]]
-            "skipped": messages, [list[int]]
-            "total": messages_count [int]
-        }
-        ```
+        Raises:
+            WasNotCreatedError: Не удалось создать сообщение
         '''
-        self.logger.info('Обновление займет продолжительное время...')
-        async for msg_batch in self.parse(None, None):
-            yield msg_batch
+        filter = {'tg_msg_id': tg_msg_id}
+        model = await self.get_or_none(filter)
+        if model is not None:
+            if text is not None and model.text != text:
+                await self.repository.update_returning(MessageModel, filter, {'text': text})
+        else:
+            model = await super().create(MessageModel.from_schema(MessageCreateSchema(
+                tg_msg_id=tg_msg_id,
+                text=text or '',
+            )), refresh=False)
+
+        if files:
+            await self.attachment_service.upload_file_objects(*files)
+            await self.db.refresh(model, ['attachments'])
+        return model
 
     async def find_with_value(
         self,
@@ -343,22 +178,3 @@ class MessageService(BaseService[MessageModel]):
             order_by=order_by,
             model_attrs=model_attrs,
         )
-
-    async def parse_by_id(self, msg_id: int) -> dict[str, Any] | None:
-        base_url = f'https://t.me/{self.__settings.telegram.channel_name}/{msg_id}#'
-
-        url = base_url
-
-        try:
-            response = await async_requests.get(url)
-        except Exception as e:
-            raise e
-        else:
-            soup = bs(response.text, 'html.parser')
-            messages = soup.select('.tgme_widget_message_wrap.js-widget_message_wrap')
-            for i, m in enumerate(messages):
-                if i > self.__parsed_messages_at_once:
-                    break
-                data = await self.__parse_data(m)
-                if data and data['text'] != '':
-                    return data
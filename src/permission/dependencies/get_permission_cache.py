@@ -0,0 +1,22 @@
+from config import get_settings
+from permission.services.cache import PermissionCache
+
+__permission_cache: PermissionCache | None = None
+
+
+def get_permission_cache() -> PermissionCache:
+    '''
+    Общий для процесса кеш проверки доступа. Создается при первом вызове
+
+    Returns:
+        PermissionCache: Кеш проверки доступа
+    '''
+    global __permission_cache
+    if __permission_cache is None:
+        settings = get_settings().permission
+        __permission_cache = PermissionCache(
+            user_ttl=settings.user_ttl,
+            matrix_ttl=settings.matrix_ttl,
+            max_users=settings.max_cached_users,
+        )
+    return __permission_cache
@@ -0,0 +1,111 @@
+import time
+from typing import NamedTuple
+
+
+class CachedUser(NamedTuple):
+    '''
+    Данные пользователя, нужные для проверки доступа
+
+    Args:
+        id (int): Идентификатор
+        user_name (str | None): @username
+        role_id (int): Идентификатор роли
+    '''
+    id: int
+    user_name: str | None
+    role_id: int
+
+
+class PermissionCache:
+    '''
+    Кеш проверки доступа в памяти процесса: матрица "команда бота -> роли" \
+        и роли пользователей. Матрица загружается целиком при запуске и \
+        перечитывается по истечении `matrix_ttl`, роль пользователя хранится \
+        `user_ttl` секунд. Изменения доступа через сервисы сбрасывают кеш сразу
+    '''
+
+    def __init__(self, user_ttl: float = 300, matrix_ttl: float = 300, max_users: int = 10000) -> None:
+        '''
+        Кеш проверки доступа в памяти процесса
+
+        Args:
+            user_ttl (float): Время жизни роли пользователя (секунд)
+            matrix_ttl (float): Время жизни матрицы доступа (секунд)
+            max_users (int): Максимум пользователей в кеше. При переполнении \
+                вытесняются самые старые записи
+        '''
+        self.user_ttl = user_ttl
+        self.matrix_ttl = matrix_ttl
+        self.max_users = max_users
+        self.__matrix: dict[str, frozenset[int]] | None = None
+        self.__matrix_expires = 0.0
+        self.__users: dict[int, tuple[CachedUser, float]] = {}
+
+    def get_matrix(self) -> dict[str, frozenset[int]] | None:
+        '''
+        Получение матрицы доступа
+
+        Returns:
+            dict[str,frozenset[int]] | None: Роли по названию команды бота. \
+                `None` - матрица не загружена или устарела
+        '''
+        if self.__matrix is None or time.monotonic() >= self.__matrix_expires:
+            return None
+        return self.__matrix
+
+    def set_matrix(self, matrix: dict[str, frozenset[int]]) -> None:
+        '''
+        Сохранение матрицы доступа
+
+        Args:
+            matrix (dict[str,frozenset[int]]): Роли по названию команды бота
+        '''
+        self.__matrix = matrix
+        self.__matrix_expires = time.monotonic() + self.matrix_ttl
+
+    def get_user(self, id: int) -> CachedUser | None:
+        '''
+        Получение пользователя из кеша
+
+        Args:
+            id (int): Идентификатор пользователя
+
+        Returns:
+            CachedUser | None: Пользователь. `None` - нет в кеше или устарел
+        '''
+        cached = self.__users.get(id)
+        if cached is None:
+            return None
+        user, expires = cached
+        if time.monotonic() >= expires:
+            del self.__users[id]
+            return None
+        return user
+
+    def set_user(self, user: CachedUser) -> None:
+        '''
+        Сохранение пользователя в кеш
+
+        Args:
+            user (CachedUser): Пользователь
+        '''
+        self.__users.pop(user.id, None)
+        while len(self.__users) >= self.max_users:
+            del self.__users[next(iter(self.__users))]
+        self.__users[user.id] = (user, time.monotonic() + self.user_ttl)
+
+    def invalidate_user(self, id: int) -> None:
+        '''
+        Удаление пользователя из кеша, например после смены роли
+
+        Args:
+            id (int): Идентификатор пользователя
+        '''
+        self.__users.pop(id, None)
+
+    def invalidate(self) -> None:
+        '''
+        Сброс всего кеша после изменения ролей или ограничений доступа
+        '''
+        self.__matrix = None
+        self.__users.clear()
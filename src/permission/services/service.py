@@ -1,8 +1,13 @@
+from typing import Any
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import replica_router
+from db.events import after_commit
 from permission.repositories.repository import PermissionRepository
 from base.service import BaseService
 from permission.models.model import PermissionModel
 from permission.schemas.schema import PermissionSimpleSchema
+from permission.services.cache import CachedUser, PermissionCache
 from botcommand.services.service import BotCommandService
 from role.services.service import RoleService
 from role.models.model import RoleModel
@@ -21,7 +26,9 @@ class PermissionService(BaseService[PermissionModel]):
     def __init__(
         self, db: AsyncSession,
         botcommand_service: BotCommandService,
-        role_service: RoleService
+        role_service: RoleService,
+        cache: PermissionCache,
+        read_db: AsyncSession | None = None,
     ):
         '''
         Бизнес-логика ограничения доступа к ручкам по ролям
@@ -30,9 +37,14 @@ class PermissionService(BaseService[PermissionModel]):
             db (AsyncSession): Асинхронная сессия БД
             botcommand_service (BotCommandService): Сервис команд бота
             role_service (RoleService): Сервис ролей
+            cache (PermissionCache): Кеш проверки доступа
+            read_db (AsyncSession | None): Сессия для загрузки матрицы доступа \
+                (реплика). По-умолчанию: `None` - `db`
         '''
         self.botcommand_service = botcommand_service
         self.role_service = role_service
+        self.cache = cache
+        self.read_db = read_db or db
         super().__init__(
             PermissionRepository(db),
             PermissionModel,
@@ -40,13 +52,14 @@ class PermissionService(BaseService[PermissionModel]):
             multiple_models_name="ограничения доступа к команде бота по ролям"
         )
 
-    async def create(self, model: PermissionModel) -> PermissionModel:
+    async def create(self, model: PermissionModel, refresh: bool = True) -> PermissionModel:
         '''
         Создание ограничения доступа к команде бота по ролям
 
         Args:
             model (PermissionModel): SQLAlchemy-модель ограничения \
                 доступа к команде бота по ролям
+            refresh (bool): Подгрузить связанные модели
 
         Returns:
             PermissionModel: SQLAlchemy-модель ограничения доступа \
@@ -56,14 +69,56 @@ class PermissionService(BaseService[PermissionModel]):
             WasNotCreatedError: Ограничение доступа к команде бота \
                 по ролям не было создано
         '''
-        filter = {
-            "botcommand_id": model.botcommand_id,
-            "role_id": model.role_id
-        }
-        if not await self.exists(filter, raise_exc=False):
-            return await super().create(model)
-        else:
-            return await self.get(filter)
+        permission, created = await self.get_or_create(
+            model, ['botcommand_id', 'role_id'], load_relationships=refresh
+        )
+        if created:
+            self.__invalidate()
+        return permission
+
+    async def delete(self, filter: dict[str, Any]) -> None:
+        '''
+        Удаление ограничения доступа к команде бота по ролям
+
+        Args:
+            filter (dict[str, Any]): фильтр поиска сущности в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+
+        Raises:
+            NotFoundError: Не удалось найти сущность
+        '''
+        await super().delete(filter)
+        self.__invalidate()
+
+    def __invalidate(self) -> None:
+        '''
+        Сброс кеша доступа и чтение из основной БД после фиксации изменений
+        '''
+        after_commit(self.repository.db, self.cache.invalidate)
+        after_commit(self.repository.db, replica_router.mark_written)
+
+    async def load_matrix(self) -> dict[str, frozenset[int]]:
+        '''
+        Загрузка матрицы доступа "команда бота -> роли" одним запросом \
+            и сохранение ее в кеш
+
+        Returns:
+            dict[str,frozenset[int]]: Роли по названию команды бота
+        '''
+        rows = (await self.read_db.execute(
+            select(BotCommandModel.name, PermissionModel.role_id)
+            .outerjoin(PermissionModel, PermissionModel.botcommand_id == BotCommandModel.id)
+        )).all()
+
+        matrix: dict[str, set[int]] = {}
+        for name, role_id in rows:
+            roles = matrix.setdefault(name, set())
+            if role_id is not None:
+                roles.add(role_id)
+
+        frozen = {name: frozenset(roles) for name, roles in matrix.items()}
+        self.cache.set_matrix(frozen)
+        return frozen
 
     async def create_with_role_and_botcommand(
         self,
@@ -127,33 +182,26 @@ class PermissionService(BaseService[PermissionModel]):
                 по ролям не было создано
             NotFoundError: Роль не найдена
         '''
-        botcommand_exists = self.botcommand_service.exists(
-            {"name": botcommand_name},
-            raise_exc=False
-        )
-        if botcommand_exists:
-            botcommand = await self.botcommand_service.get(
-                {"name": botcommand_name}
-            )
-        elif create_botcommand:
+        botcommand: BotCommandModel | None
+        if create_botcommand:
             botcommand = await self.botcommand_service.create_with_name(
                 botcommand_name
             )
         else:
-            raise NotFoundError('Ручка не найдена')
+            botcommand = await self.botcommand_service.get_or_none(
+                {"name": botcommand_name}
+            )
+            if botcommand is None:
+                raise NotFoundError('Ручка не найдена')
 
         permissions = []
         for role in role_models:
-            filter = {
-                "role_id": role.id,
-                "botcommand_id": botcommand.id
-            }
-            if not await self.exists(filter, raise_exc=False):
-                permission = await self.create_with_role_and_botcommand(
-                    botcommand, role
+            permission = await self.create(PermissionModel.from_schema(
+                PermissionSimpleSchema(
+                    role_id=role.id,
+                    botcommand_id=botcommand.id
                 )
-            else:
-                permission = await self.get(filter)
+            ))
             permissions.append(permission)
 
         return permissions
@@ -161,15 +209,17 @@ class PermissionService(BaseService[PermissionModel]):
     async def check_permission(
         self,
         botcommand_name: str,
-        user_model: UserModel,
+        user_model: UserModel | CachedUser,
         raise_exc: bool = True
     ) -> bool:
         '''
-        Проверка доступа к команде бота для пользователя
+        Проверка доступа к команде бота для пользователя по матрице \
+            доступа из кеша. Матрица загружается из БД, только если \
+            ее нет в кеше или она устарела
 
         Args:
             botcommand_name (str): Название ручки
-            user_model (UserModel): SQLAlchemy-модель роли
+            user_model (UserModel | CachedUser): Пользователь
 
         Returns:
             bool: `True` - доступ есть, `False` - доступа нет
@@ -180,17 +230,13 @@ class PermissionService(BaseService[PermissionModel]):
             ForbiddenError: Доступ запрещен
             NotFoundError: Ручка не найдена
         '''
-        botcommand: BotCommandModel = await self.botcommand_service.get({
-            "name": botcommand_name
-        })
+        matrix = self.cache.get_matrix() or await self.load_matrix()
+        if botcommand_name not in matrix:
+            raise NotFoundError('Ручка не найдена')
         if user_model is None:
             raise UnauthorizedError("Вы неавторизованы")
 
-        filter = {
-            "botcommand_id": botcommand.id,
-            "role_id": user_model.role.id
-        }
-        exists = await self.exists(filter, raise_exc=False)
+        exists = user_model.role_id in matrix[botcommand_name]
         if raise_exc and not exists:
             raise ForbiddenError('Доступ запрещен')
         else:
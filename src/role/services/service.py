@@ -1,5 +1,12 @@
+from typing import Any
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from base.service import BaseService
+from db.database import replica_router
+from db.events import after_commit
+from permission.dependencies.get_permission_cache import get_permission_cache
+from permission.models.model import PermissionModel
+from permission.services.cache import PermissionCache
 from role.repositories.repository import RoleRepository
 from role.models.model import RoleModel
 
@@ -12,12 +19,15 @@ class RoleService(BaseService[RoleModel]):
     TEACHER_ID: int = 2
     STUDENT_ID: int = 3
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: PermissionCache | None = None):
         '''
         Бизнес-логика ролей
 
         Args:
             repository (RoleRepository): Класс обработки данных о ролях в БД
+            cache (PermissionCache | None): Кеш проверки доступа, который \
+                сбрасывается после изменения ролей. По-умолчанию: `None` - \
+                общий кеш процесса
         '''
         super().__init__(
             RoleRepository(db),
@@ -25,13 +35,15 @@ class RoleService(BaseService[RoleModel]):
             single_model_name="роль",
             multiple_models_name="роли"
         )
+        self.cache = cache or get_permission_cache()
 
-    async def create(self, model: RoleModel) -> RoleModel:
+    async def create(self, model: RoleModel, refresh: bool = True) -> RoleModel:
         '''
         Создание роли
 
         Args:
             model (PermissionModel): SQLAlchemy-модель роли
+            refresh (bool): Подгрузить связанные модели
 
         Returns:
             PermissionModel: SQLAlchemy-модель роли
@@ -39,14 +51,31 @@ class RoleService(BaseService[RoleModel]):
         Raises:
             WasNotCreatedError: Роль не была создана
         '''
-        filter = {
-            "id": model.id,
-            "name": model.name
-        }
-        if not await self.exists(filter, raise_exc=False):
-            return await super().create(model)
-        else:
-            return await super().get(filter)
+        if model.id is None:
+            return await super().create(model, refresh)
+        role, _ = await self.get_or_create(model, ['id'], load_relationships=refresh)
+        return role
+
+    async def delete(self, filter: dict[str, Any]) -> None:
+        '''
+        Удаление роли вместе с ее ограничениями доступа. После фиксации \
+            транзакции кеш доступа сбрасывается
+
+        Args:
+            filter (dict[str, Any]): фильтр поиска сущности в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+
+        Raises:
+            NotFoundError: Не удалось найти сущность
+        '''
+        await self.repository.db.execute(
+            delete(PermissionModel).where(
+                PermissionModel.role_id.in_(select(RoleModel.id).filter_by(**filter))
+            )
+        )
+        await super().delete(filter)
+        after_commit(self.repository.db, self.cache.invalidate)
+        after_commit(self.repository.db, replica_router.mark_written)
 
     async def get_admin_role(self) -> RoleModel:
         '''
@@ -1,13 +1,44 @@
 from config import get_settings
+from storage.services.backend import StorageBackend
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_backend import MinioBackend
 from storage.services.minio_service import MinioService
 
-minio_client = MinioService
+__minio_service: MinioService | None = None
 
 
-def get_minio_service() -> MinioService:
-    return MinioService(
-        get_settings().minio.bucket_name,
-        get_settings().minio.endpoint,
-        get_settings().minio.root_user,
-        get_settings().minio.root_password,
+def get_minio_backend() -> MinioBackend:
+    minio_settings = get_settings().minio
+    return MinioBackend(
+        minio_settings.bucket_name,
+        minio_settings.endpoint,
+        minio_settings.root_user,
+        minio_settings.root_password,
+        pool_size=minio_settings.pool_size,
+        connect_timeout=minio_settings.connect_timeout,
+        read_timeout=minio_settings.read_timeout,
     )
+
+
+def get_local_backend() -> LocalStorageBackend:
+    return LocalStorageBackend(get_settings().storage.local_root)
+
+
+def get_storage_backend() -> StorageBackend:
+    if get_settings().storage.backend == 'local':
+        return get_local_backend()
+    return get_minio_backend()
+
+
+def get_minio_service() -> MinioService:
+    '''
+    Общий для процесса сервис хранилища. Создается при первом вызове, \
+        хранилище подготавливается отдельно через `MinioService.initialize`
+
+    Returns:
+        MinioService: Сервис хранилища
+    '''
+    global __minio_service
+    if __minio_service is None:
+        __minio_service = MinioService(get_storage_backend())
+    return __minio_service
@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncGenerator, NamedTuple
+
+
+class StorageObject(NamedTuple):
+    '''
+    Объект хранилища
+
+    Args:
+        name (str): Имя объекта (ключ), например `thumbnails/<name>.jpg`
+        size (int): Размер (байт)
+        modified (datetime): Время последнего изменения (UTC)
+    '''
+    name: str
+    size: int
+    modified: datetime
+
+
+class StorageBackend(ABC):
+    '''
+    Хранилище объектов медиа-контента. Объекты адресуются плоскими \
+        ключами вида `<name>.<ext>`, `thumbnails/<name>.jpg`, \
+        `webp/<name>.webp` - так же, как в bucket MinIO, - независимо \
+        от того, как они лежат в самом хранилище
+    '''
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        '''
+        Подготовка хранилища. Выполняется один раз при запуске процесса
+        '''
+
+    @abstractmethod
+    def close(self) -> None:
+        '''
+        Освобождение ресурсов хранилища
+        '''
+
+    @abstractmethod
+    async def put(self, object_name: str, data: bytes, content_type: str) -> None:
+        '''
+        Запись объекта. Существующий объект перезаписывается
+
+        Args:
+            object_name (str): Имя объекта
+            data (bytes): Содержимое
+            content_type (str): MIME-тип
+        '''
+
+    @abstractmethod
+    async def get(self, object_name: str, offset: int = 0, length: int = 0) -> bytes:
+        '''
+        Чтение объекта или его части
+
+        Args:
+            object_name (str): Имя объекта
+            offset (int): Сдвиг начала. По-умолчанию: `0`
+            length (int): Количество байт. По-умолчанию: `0` - до конца объекта
+
+        Returns:
+            bytes: Содержимое объекта
+        '''
+
+    @abstractmethod
+    def iter_chunks(self, object_name: str, chunk_size: int) -> AsyncGenerator[bytes]:
+        '''
+        Потоковое чтение объекта частями. В памяти одновременно \
+            находится не больше одной части
+
+        Args:
+            object_name (str): Имя объекта
+            chunk_size (int): Размер части (байт)
+
+        Yields:
+            bytes: Часть объекта
+        '''
+
+    @abstractmethod
+    async def exists(self, object_name: str) -> bool:
+        '''
+        Проверка существования объекта
+
+        Args:
+            object_name (str): Имя объекта
+
+        Returns:
+            bool: `True` - объект существует
+        '''
+
+    @abstractmethod
+    async def remove(self, object_name: str) -> None:
+        '''
+        Удаление объекта. Отсутствие объекта ошибкой не считается
+
+        Args:
+            object_name (str): Имя объекта
+        '''
+
+    async def remove_many(self, object_names: list[str]) -> None:
+        '''
+        Удаление нескольких объектов
+
+        Args:
+            object_names (list[str]): Имена объектов
+        '''
+        for object_name in object_names:
+            await self.remove(object_name)
+
+    @abstractmethod
+    def iter_objects(self, prefix: str = '') -> AsyncGenerator[StorageObject]:
+        '''
+        Обход объектов хранилища
+
+        Args:
+            prefix (str): Префикс имени объекта. По-умолчанию: все объекты
+
+        Yields:
+            StorageObject: Объект хранилища
+        '''
+
+    def get_local_url(self, object_name: str) -> str | None:
+        '''
+        Получение URL объекта внутри локальной сети
+
+        Args:
+            object_name (str): Имя объекта
+
+        Returns:
+            str | None: URL объекта. `None` - хранилище не доступно \
+                напрямую, использовать открытый URL
+        '''
+        return None
@@ -0,0 +1,151 @@
+import logging
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.database import async_session
+from attachment.models.model import AttachmentModel
+from storage.services.backend import StorageBackend
+from storage.services.minio_service import MinioService
+
+
+class StorageGarbageCollector:
+    '''
+    Удаление объектов хранилища, на которые не ссылается ни одна строка \
+        `attachment`: такие объекты остаются после неудачной загрузки, \
+        когда файл уже записан, а строка в БД - нет.
+
+    Список объектов и список `attachment.file_name` читаются потоком, \
+        оба в порядке байтов (`COLLATE "C"`), и сравниваются слиянием, \
+        поэтому память не зависит от размера хранилища
+    '''
+    PREFIXES = ('', f'{MinioService.THUMBNAIL_PREFIX}/', f'{MinioService.WEBP_PREFIX}/')
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        batch_size: int = 1000,
+    ) -> None:
+        '''
+        Удаление объектов хранилища без строк `attachment`
+
+        Args:
+            backend (StorageBackend): Хранилище объектов
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            batch_size (int): Количество строк, читаемых из БД за раз, \
+                и объектов, удаляемых одним запросом
+        '''
+        self.backend = backend
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.logger = logging.getLogger('tg_logger')
+
+    async def __iter_file_names(self) -> AsyncGenerator[str]:
+        '''
+        Поток имен файлов из `attachment` в порядке байтов
+
+        Yields:
+            str: Имя файла без расширения
+        '''
+        file_name = AttachmentModel.file_name.collate('C')
+        async with self.session_factory() as db:
+            result = await db.stream_scalars(
+                select(file_name)
+                .distinct()
+                .order_by(file_name)
+                .execution_options(yield_per=self.batch_size)
+            )
+            async for name in result:
+                yield name
+
+    async def __collect_prefix(
+        self,
+        prefix: str,
+        cutoff: datetime,
+        dry_run: bool,
+    ) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            'prefix': prefix or '/',
+            'scanned': 0, 'orphans': 0, 'orphan_bytes': 0,
+            'recent': 0, 'unsorted': 0, 'deleted': 0, 'examples': [],
+        }
+        pending: list[str] = []
+        previous_stem: str | None = None
+
+        async with aclosing(self.__iter_file_names()) as file_names:
+            current = await anext(file_names, None)
+
+            async for obj in self.backend.iter_objects(prefix):
+                relative_name = obj.name[len(prefix):]
+                if '/' in relative_name:
+                    continue
+                stats['scanned'] += 1
+
+                stem = relative_name.rsplit('.', 1)[0]
+                if previous_stem is not None and stem < previous_stem:
+                    # Порядок ключей разошелся с порядком имен - без удаления
+                    stats['unsorted'] += 1
+                    continue
+                previous_stem = stem
+
+                while current is not None and current < stem:
+                    current = await anext(file_names, None)
+                if current == stem:
+                    continue
+
+                if obj.modified > cutoff:
+                    stats['recent'] += 1
+                    continue
+
+                stats['orphans'] += 1
+                stats['orphan_bytes'] += obj.size
+                if len(stats['examples']) < 10:
+                    stats['examples'].append(obj.name)
+
+                if not dry_run:
+                    pending.append(obj.name)
+                    if len(pending) >= self.batch_size:
+                        await self.backend.remove_many(pending)
+                        stats['deleted'] += len(pending)
+                        pending = []
+
+        if pending:
+            await self.backend.remove_many(pending)
+            stats['deleted'] += len(pending)
+        return stats
+
+    async def collect(
+        self,
+        grace_period: timedelta = timedelta(hours=24),
+        dry_run: bool = True,
+    ) -> AsyncGenerator[dict[str, Any]]:
+        '''
+        Поиск и удаление объектов без строк `attachment`: оригиналов, \
+            превью и WebP-вариантов
+
+        Args:
+            grace_period (timedelta): Объекты моложе этого срока не удаляются, \
+                т.к. их строка в БД может быть еще не закоммичена. По-умолчанию: 24 часа
+            dry_run (bool): Только отчет, без удаления. По-умолчанию: `True`
+
+        Yields:
+            dict[str,Any]: Отчет по каждому префиксу
+        ```
+        {
+            "prefix": prefix, [str]
+            "scanned": scanned_count, [int]
+            "orphans": orphans_count, [int]
+            "orphan_bytes": orphans_size, [int]
+            "recent": skipped_recent_count, [int]
+            "unsorted": skipped_unsorted_count, [int]
+            "deleted": deleted_count, [int]
+            "examples": [orphan_names] [list[str]]
+        }
+        ```
+        '''
+        cutoff = datetime.now(timezone.utc) - grace_period
+        for prefix in self.PREFIXES:
+            yield await self.__collect_prefix(prefix, cutoff, dry_run)
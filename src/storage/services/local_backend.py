@@ -0,0 +1,163 @@
+import os
+import heapq
+import asyncio
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncGenerator, Iterator
+
+from storage.services.backend import StorageBackend, StorageObject
+
+
+class LocalStorageBackend(StorageBackend):
+    '''
+    Хранилище объектов в папке на диске для развертывания на одном сервере. \
+        Объекты раскладываются по подпапкам из первых символов имени: \
+        `<name>.<ext>` лежит в `<root>/ab/cd/<name>.<ext>`, \
+        `thumbnails/<name>.jpg` - в `<root>/thumbnails/ab/cd/<name>.jpg`. \
+        Файлы отдает Caddy (`file_server`) по тем же путям `/i/` и `/t/`
+    '''
+    TMP_SUFFIX = '.tmp'
+
+    def __init__(self, root: str | Path) -> None:
+        '''
+        Хранилище объектов в папке на диске
+
+        Args:
+            root (str | Path): Корневая папка хранилища
+        '''
+        self.root = Path(root)
+
+    def get_path(self, object_name: str) -> Path:
+        '''
+        Получение пути к файлу объекта
+
+        Args:
+            object_name (str): Имя объекта
+
+        Returns:
+            Path: Путь к файлу объекта
+        '''
+        prefix, _, base = object_name.rpartition('/')
+        directory = self.root / prefix if prefix else self.root
+        return directory / base[:2] / base[2:4] / base
+
+    async def initialize(self) -> None:
+        await asyncio.to_thread(self.root.mkdir, parents=True, exist_ok=True)
+
+    def close(self) -> None:
+        pass
+
+    def __write(self, object_name: str, data: bytes) -> None:
+        path = self.get_path(object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=self.TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    async def put(self, object_name: str, data: bytes, content_type: str) -> None:
+        '''
+        Запись объекта. Запись атомарная: файл пишется во временный \
+            в той же папке и затем переименовывается
+
+        Args:
+            object_name (str): Имя объекта
+            data (bytes): Содержимое
+            content_type (str): MIME-тип. Не сохраняется - Caddy \
+                определяет его по расширению
+        '''
+        await asyncio.to_thread(self.__write, object_name, data)
+
+    def __read(self, object_name: str, offset: int, length: int) -> bytes:
+        with open(self.get_path(object_name), 'rb') as f:
+            f.seek(offset)
+            return f.read(length or -1)
+
+    async def get(self, object_name: str, offset: int = 0, length: int = 0) -> bytes:
+        return await asyncio.to_thread(self.__read, object_name, offset, length)
+
+    async def iter_chunks(self, object_name: str, chunk_size: int) -> AsyncGenerator[bytes]:
+        f = await asyncio.to_thread(open, self.get_path(object_name), 'rb')
+        try:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+
+    async def exists(self, object_name: str) -> bool:
+        return await asyncio.to_thread(self.get_path(object_name).is_file)
+
+    async def remove(self, object_name: str) -> None:
+        await asyncio.to_thread(self.get_path(object_name).unlink, missing_ok=True)
+
+    def __scan(self, directory: Path) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
+        '''
+        Подпапки и файлы папки в порядке имен. Временные файлы пропускаются
+        '''
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            return [], []
+        directories = [e for e in entries if e.is_dir()]
+        files = [e for e in entries if e.is_file() and not e.name.endswith(self.TMP_SUFFIX)]
+        return directories, files
+
+    def __iter_shards(self, shards: list[os.DirEntry], prefix: str) -> Iterator[StorageObject]:
+        for first in shards:
+            for second in self.__scan(Path(first.path))[0]:
+                for file in self.__scan(Path(second.path))[1]:
+                    stat = file.stat()
+                    yield StorageObject(
+                        f'{prefix}{file.name}',
+                        stat.st_size,
+                        datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                    )
+
+    def __iter_directory(self, directory: Path, prefix: str) -> Iterator[StorageObject]:
+        '''
+        Обход объектов папки в порядке имен без чтения всего списка. \
+            Папки шардов (`ab/cd`) - начало имени объекта, поэтому их \
+            обход по порядку дает объекты по порядку. Папки префиксов \
+            (`thumbnails`) обходятся так же и сливаются с ними
+        '''
+        directories = self.__scan(directory)[0]
+        yield from heapq.merge(
+            self.__iter_shards([e for e in directories if len(e.name) <= 2], prefix),
+            *[
+                self.__iter_directory(Path(e.path), f'{prefix}{e.name}/')
+                for e in directories
+                if len(e.name) > 2
+            ],
+            key=lambda obj: obj.name,
+        )
+
+    async def iter_objects(self, prefix: str = '') -> AsyncGenerator[StorageObject]:
+        '''
+        Обход объектов хранилища в порядке имен. Папки читаются \
+            по мере обхода, объекты передаются пачками из пула потоков
+
+        Args:
+            prefix (str): Префикс имени объекта. По-умолчанию: все объекты
+
+        Yields:
+            StorageObject: Объект хранилища
+        '''
+        directory, _, _ = prefix.rpartition('/')
+        objects = (
+            obj
+            for obj in self.__iter_directory(self.root / directory, f'{directory}/' if directory else '')
+            if obj.name.startswith(prefix)
+        )
+        while page := await asyncio.to_thread(lambda: list(islice(objects, 1000))):
+            for obj in page:
+                yield obj
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import mimetypes
+from typing import AsyncGenerator
+
+from storage.services.backend import StorageBackend, StorageObject
+
+
+class StorageMigrationService:
+    '''
+    Копирование объектов между хранилищами, например из bucket MinIO \
+        в папку на диске. Объекты копируются параллельно с ограничением \
+        количества одновременных копирований
+    '''
+
+    def __init__(
+        self,
+        source: StorageBackend,
+        target: StorageBackend,
+        concurrency: int = 16,
+    ) -> None:
+        '''
+        Копирование объектов между хранилищами
+
+        Args:
+            source (StorageBackend): Исходное хранилище
+            target (StorageBackend): Целевое хранилище
+            concurrency (int): Количество одновременных копирований
+        '''
+        self.source = source
+        self.target = target
+        self.concurrency = concurrency
+        self.logger = logging.getLogger('tg_logger')
+
+    async def migrate(self, overwrite: bool = False, report_every: int = 1000) -> AsyncGenerator[dict[str, int]]:
+        '''
+        Копирование всех объектов исходного хранилища. Уже скопированные \
+            объекты пропускаются, поэтому прерванное копирование можно \
+            запустить повторно
+
+        Args:
+            overwrite (bool): Перезаписать объекты, которые уже есть в целевом хранилище
+            report_every (int): Через сколько объектов сообщать о прогрессе
+
+        Yields:
+            dict[str,int]: Прогресс
+        ```
+        {
+            "processed": processed_count, [int]
+            "copied": copied_count, [int]
+            "skipped": skipped_count, [int]
+            "failed": failed_count, [int]
+            "bytes": copied_bytes [int]
+        }
+        ```
+        '''
+        stats = {'processed': 0, 'copied': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: set[asyncio.Task] = set()
+        next_report = report_every
+
+        async def copy(obj: StorageObject) -> None:
+            try:
+                if not overwrite and await self.target.exists(obj.name):
+                    stats['skipped'] += 1
+                    return
+                data = await self.source.get(obj.name)
+                content_type, _ = mimetypes.guess_type(obj.name)
+                await self.target.put(obj.name, data, content_type or 'application/octet-stream')
+                stats['copied'] += 1
+                stats['bytes'] += len(data)
+            except Exception as e:
+                stats['failed'] += 1
+                self.logger.warning(f'Не удалось скопировать {obj.name}: {e}')
+            finally:
+                stats['processed'] += 1
+                semaphore.release()
+
+        async for obj in self.source.iter_objects():
+            await semaphore.acquire()
+            task = asyncio.create_task(copy(obj))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            if stats['processed'] >= next_report:
+                next_report += report_every
+                yield dict(stats)
+
+        await asyncio.gather(*tasks)
+        yield dict(stats)
@@ -0,0 +1,254 @@
+import ssl
+import json
+import asyncio
+from io import BytesIO
+from functools import partial
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, TypeVar
+from minio import Minio
+from minio.error import S3Error
+from minio.deleteobjects import DeleteObject
+from urllib3 import PoolManager, Retry, Timeout, disable_warnings
+
+from storage.services.backend import StorageBackend, StorageObject
+
+T = TypeVar('T')
+
+
+class MinioBackend(StorageBackend):
+    '''
+    Хранилище объектов в bucket MinIO
+    '''
+
+    def __init__(
+        self,
+        bucket_name: str,
+        endpoint: str,
+        root_user: str | None = None,
+        root_password: str | None = None,
+        pool_size: int = 32,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+    ) -> None:
+        '''
+        Хранилище объектов в bucket MinIO. Сетевых запросов не делает - \
+            bucket настраивается в `initialize`
+
+        Args:
+            bucket_name (str): Имя bucket
+            endpoint (str): Адрес MinIO
+            root_user (str | None): Пользователь MinIO
+            root_password (str | None): Пароль MinIO
+            pool_size (int): Максимум одновременных соединений (и потоков) к MinIO. \
+                Потоковое чтение объектов (`iter_chunks`) занимает не больше \
+                половины соединений
+            connect_timeout (float): Таймаут подключения (секунд)
+            read_timeout (float): Таймаут чтения (секунд)
+        '''
+        context = ssl.create_default_context()
+        context.options |= ssl.OP_NO_SSLv3 | ssl.OP_NO_SSLv2
+
+        disable_warnings()
+
+        self._client = Minio(
+            endpoint,
+            access_key=root_user,
+            secret_key=root_password,
+            secure=False,
+            http_client=PoolManager(
+                cert_reqs="CERT_NONE",
+                maxsize=pool_size,
+                block=True,
+                timeout=Timeout(connect=connect_timeout, read=read_timeout),
+                retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+            )
+        )
+
+        self._bucket_name = bucket_name
+        self._endpoint = endpoint
+        self.__executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='minio')
+        # Открытый поток держит соединение из пула все время чтения. Части
+        # читаются в отдельном пуле потоков: иначе, когда все соединения
+        # заняты потоками, потоки общего пула ждут соединение и чтение частей,
+        # которое их освободит, не выполняется
+        max_streams = max(1, pool_size // 2)
+        self.__streams = asyncio.Semaphore(max_streams)
+        self.__stream_executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix='minio-stream')
+        self.__initialized = False
+        self.__init_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> Minio:
+        return self._client
+
+    @property
+    def bucket_name(self) -> str:
+        return self._bucket_name
+
+    async def _run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        '''
+        Выполнение блокирующего запроса к MinIO в пуле потоков клиента
+
+        Args:
+            func (Callable[..., T]): Метод клиента MinIO
+            *args (Any): Позиционные аргументы
+            **kwargs (Any): Именованные аргументы
+
+        Returns:
+            T: Результат запроса
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, partial(func, *args, **kwargs))
+
+    async def __ensure_bucket_exists(self):
+        '''
+        Проверка существования MinIO Bucket. В случае, если не существует, создает его
+
+        Raises:
+            S3Error: Ошибка MinIO
+        '''
+        exists = await self._run(
+            self.client.bucket_exists,
+            self.bucket_name
+        )
+        if not exists:
+            await self._run(
+                self.client.make_bucket,
+                self.bucket_name
+            )
+
+    async def initialize(self) -> None:
+        '''
+        Создание bucket, если его нет, и открытие доступа на чтение. \
+            Выполняется один раз при запуске процесса
+
+        Raises:
+            S3Error: Ошибка MinIO
+        '''
+        async with self.__init_lock:
+            if self.__initialized:
+                return
+            await self.__ensure_bucket_exists()
+
+            policy = json.dumps(
+                {
+                    "Version": "2012-10-17",
+                    "Statement": [
+                        {
+                            "Effect": "Allow",
+                            "Principal": "*",
+                            "Action": ["s3:GetObject"],
+                            "Resource": [f"arn:aws:s3:::{self._bucket_name}/*"]
+                        }
+                    ]
+                }
+            )
+            await self._run(self.client.set_bucket_policy, self._bucket_name, policy)
+            self.__initialized = True
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=False)
+        self.__stream_executor.shutdown(wait=False)
+        self.client._http.clear()
+
+    async def put(self, object_name: str, data: bytes, content_type: str) -> None:
+        await self._run(
+            self.client.put_object,
+            self.bucket_name,
+            object_name,
+            BytesIO(data),
+            len(data),
+            content_type=content_type,
+        )
+
+    async def get(self, object_name: str, offset: int = 0, length: int = 0) -> bytes:
+        def read() -> bytes:
+            response = self.client.get_object(
+                self.bucket_name, object_name, offset=offset, length=length
+            )
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+
+        return await self._run(read)
+
+    async def iter_chunks(self, object_name: str, chunk_size: int) -> AsyncGenerator[bytes]:
+        loop = asyncio.get_running_loop()
+        async with self.__streams:
+            response = await loop.run_in_executor(
+                self.__stream_executor,
+                partial(self.client.get_object, self.bucket_name, object_name),
+            )
+            try:
+                while chunk := await loop.run_in_executor(self.__stream_executor, response.read, chunk_size):
+                    yield chunk
+            finally:
+                response.close()
+                response.release_conn()
+
+    async def exists(self, object_name: str) -> bool:
+        try:
+            await self._run(self.client.stat_object, self.bucket_name, object_name)
+            return True
+        except S3Error as exc:
+            if exc.code in ('NoSuchKey', 'NoSuchObject'):
+                return False
+            raise
+
+    async def remove(self, object_name: str) -> None:
+        try:
+            await self._run(self.client.remove_object, self.bucket_name, object_name)
+        except S3Error as exc:
+            if exc.code != 'NoSuchKey':
+                raise
+
+    async def remove_many(self, object_names: list[str]) -> None:
+        '''
+        Удаление нескольких объектов одним запросом `remove_objects` \
+            на каждую тысячу объектов
+
+        Args:
+            object_names (list[str]): Имена объектов
+
+        Raises:
+            S3Error: Не удалось удалить часть объектов
+        '''
+        def remove() -> list[Any]:
+            errors: list[Any] = []
+            for i in range(0, len(object_names), 1000):
+                errors.extend(self.client.remove_objects(
+                    self.bucket_name,
+                    [DeleteObject(name) for name in object_names[i:i + 1000]],
+                ))
+            return errors
+
+        errors = await self._run(remove)
+        if errors:
+            raise S3Error(
+                None, errors[0].code, errors[0].message, errors[0].name,  # type: ignore
+                None, None, self.bucket_name, errors[0].name,
+            )
+
+    async def iter_objects(self, prefix: str = '') -> AsyncGenerator[StorageObject]:
+        '''
+        Обход объектов bucket в порядке имен. Список запрашивается \
+            у MinIO постранично в пуле потоков клиента
+
+        Args:
+            prefix (str): Префикс имени объекта. По-умолчанию: все объекты
+
+        Yields:
+            StorageObject: Объект хранилища
+        '''
+        objects = self.client.list_objects(self.bucket_name, prefix=prefix or None, recursive=True)
+        while page := await self._run(lambda: list(islice(objects, 1000))):
+            for obj in page:
+                if obj.is_dir:
+                    continue
+                yield StorageObject(obj.object_name, obj.size, obj.last_modified)
+
+    def get_local_url(self, object_name: str) -> str | None:
+        return f'http://{self._endpoint}/{self.bucket_name}/{object_name}'
@@ -1,60 +1,55 @@
 from io import BytesIO
 import os
-import ssl
 import uuid
-import json
 import asyncio
+import logging
 import mimetypes
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncGenerator
 from PIL import Image
-from minio import Minio
 from minio.error import S3Error
-from urllib3 import PoolManager, disable_warnings
 
 from config import get_settings
 from attachment.schemas.schema import AttachmentMinioSchema
 from exceptions.exception import FileIsTooLargeError, WasNotCreatedError
+from storage.services.backend import StorageBackend
 
 
 class MinioService:
-    def __init__(
-        self,
-        bucket_name: str,
-        endpoint: str,
-        root_user: str | None = None,
-        root_password: str | None = None,
-    ) -> None:
-        context = ssl.create_default_context()
-        context.options |= ssl.OP_NO_SSLv3 | ssl.OP_NO_SSLv2
-
-        disable_warnings()
-
-        self._client = Minio(
-            endpoint,
-            access_key=root_user,
-            secret_key=root_password,
-            secure=False,
-            http_client=PoolManager(
-                cert_reqs="CERT_NONE"
-            )
-        )
+    THUMBNAIL_PREFIX = 'thumbnails'
+    THUMBNAIL_EXTENSION = 'jpg'
+    WEBP_PREFIX = 'webp'
+    HASH_SIZE = 8
 
-        self._bucket_name = bucket_name
-
-        __policy = json.dumps(
-            {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Principal": "*",
-                        "Action": ["s3:GetObject"],
-                        "Resource": [f"arn:aws:s3:::{self._bucket_name}/*"]
-                    }
-                ]
-            }
-        )
-        self.client.set_bucket_policy(self._bucket_name, __policy)
+    def __init__(self, backend: StorageBackend) -> None:
+        '''
+        Работа с медиа-контентом в хранилище: загрузка, превью, \
+            WebP-варианты и URL. Создается один раз на процесс. \
+            Сами объекты хранятся в `backend` - bucket MinIO или папке на диске
+
+        Args:
+            backend (StorageBackend): Хранилище объектов
+        '''
+        self.backend = backend
         self.__settings = get_settings()
+        self.logger = logging.getLogger('tg_logger')
+        self.__hash_pool: ProcessPoolExecutor | None = None
+
+    async def initialize(self) -> None:
+        '''
+        Подготовка хранилища. Выполняется один раз при запуске процесса
+        '''
+        await self.backend.initialize()
+
+    def close(self) -> None:
+        '''
+        Освобождение ресурсов хранилища и пула процессов хеширования
+        '''
+        if self.__hash_pool is not None:
+            self.__hash_pool.shutdown(wait=False, cancel_futures=True)
+            self.__hash_pool = None
+        self.backend.close()
 
     @classmethod
     def __split_file_name(cls, full_file_name: str) -> tuple[str, str]:
@@ -74,26 +69,6 @@ class MinioService:
         file_name = ".".join(splitted)
         return (file_name, extension)
 
-    async def __ensure_bucket_exists(self):
-        '''
-        Проверка существования MinIO Bucket. В случае, если не существует, создает его
-
-        Raises:
-            S3Error: Ошибка MinIO
-        '''
-        try:
-            exists = await asyncio.to_thread(
-                self.client.bucket_exists,
-                self.bucket_name
-            )
-            if not exists:
-                await asyncio.to_thread(
-                    self.client.make_bucket,
-                    self.bucket_name
-                )
-        except S3Error as e:
-            raise e
-
     def __get_image_size(self, bytes: BytesIO) -> tuple[int, int]:
         '''
         Получить размер изображения.
@@ -113,17 +88,309 @@ class MinioService:
         bytes.seek(pos)
         return width, height
 
+    @staticmethod
+    def read_image_size(data: bytes) -> tuple[int, int] | None:
+        '''
+        Получение размера изображения по его началу. Pillow читает \
+            только заголовок, поэтому полного файла не нужно
+
+        Args:
+            data (bytes): Начало файла изображения
+
+        Returns:
+            tuple[int,int] | None: Ширина и высота. `None` - заголовок \
+                не поместился в `data` или формат не распознан
+        '''
+        try:
+            with Image.open(BytesIO(data)) as img:
+                return img.size
+        except (OSError, SyntaxError, ValueError):
+            return None
+
+    def make_thumbnail(self, data: bytes) -> bytes:
+        '''
+        Создание превью изображения: JPEG, вписанный в квадрат \
+            `attachment.thumbnail_size`. Блокирующая операция, \
+            вызывать вне event loop
+
+        Args:
+            data (bytes): Исходное изображение
+
+        Returns:
+            bytes: Превью в формате JPEG
+        '''
+        settings = self.__settings.attachment
+        with Image.open(BytesIO(data)) as source:
+            source.seek(0)
+            if source.mode in ('RGBA', 'LA', 'P'):
+                rgba = source.convert('RGBA')
+                img = Image.new('RGB', rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel('A'))
+            else:
+                img = source.convert('RGB')
+            img.thumbnail((settings.thumbnail_size, settings.thumbnail_size))
+
+            thumbnail = BytesIO()
+            img.save(thumbnail, 'JPEG', quality=settings.thumbnail_quality, optimize=True)
+            return thumbnail.getvalue()
+
+    @staticmethod
+    def encode_webp(data: bytes, quality: int) -> bytes:
+        '''
+        Перекодирование изображения в WebP. Блокирующая операция, \
+            вызывать вне event loop. Статический метод, чтобы его \
+            можно было выполнять в пуле процессов
+
+        Args:
+            data (bytes): Исходное изображение
+            quality (int): Качество WebP (0-100)
+
+        Returns:
+            bytes: Изображение в формате WebP
+        '''
+        with Image.open(BytesIO(data)) as source:
+            source.seek(0)
+            has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+            img = source.convert('RGBA' if has_alpha else 'RGB')
+
+            webp = BytesIO()
+            img.save(webp, 'WEBP', quality=quality, method=4)
+            return webp.getvalue()
+
+    @classmethod
+    def image_hash(cls, data: bytes) -> int:
+        '''
+        Перцептивный хеш изображения (dHash, 64 бита): изображение \
+            уменьшается до 9x8 в оттенках серого, каждый бит - сравнение \
+            яркости соседних пикселей. Перекодирование, смена размера и \
+            формата почти не меняют хеш. Блокирующая операция, \
+            вызывать вне event loop
+
+        Args:
+            data (bytes): Исходное изображение
+
+        Returns:
+            int: Хеш как знаковое 64-битное число (для `BIGINT`)
+        '''
+        with Image.open(BytesIO(data)) as img:
+            img.seek(0)
+            img.draft('L', (cls.HASH_SIZE * 4, cls.HASH_SIZE * 4))
+            pixels = list(
+                img.convert('L')
+                .resize((cls.HASH_SIZE + 1, cls.HASH_SIZE), Image.Resampling.LANCZOS)
+                .getdata()
+            )
+
+        value = 0
+        for row in range(cls.HASH_SIZE):
+            for col in range(cls.HASH_SIZE):
+                left = pixels[row * (cls.HASH_SIZE + 1) + col]
+                right = pixels[row * (cls.HASH_SIZE + 1) + col + 1]
+                value = (value << 1) | (left > right)
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    @staticmethod
+    def hash_distance(first: int, second: int) -> int:
+        '''
+        Расстояние Хэмминга между перцептивными хешами
+
+        Args:
+            first (int): Первый хеш
+            second (int): Второй хеш
+
+        Returns:
+            int: Количество различающихся бит (0-64)
+        '''
+        return ((first ^ second) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+    @staticmethod
+    def is_degenerate_hash(phash: int) -> bool:
+        '''
+        Хеш однотонного или градиентного изображения: все биты одинаковы, \
+            и совпадение таких хешей не означает одинаковых изображений
+
+        Args:
+            phash (int): Перцептивный хеш
+
+        Returns:
+            bool: `True` - по хешу нельзя искать дубликаты
+        '''
+        return phash in (0, -1)
+
+    async def compute_image_hash(self, data: bytes) -> int | None:
+        '''
+        Вычисление перцептивного хеша изображения в пуле процессов \
+            (`attachment.hash_workers`). Пул создается при первом вызове \
+            и пересоздается, если его процесс аварийно завершился
+
+        Args:
+            data (bytes): Исходное изображение
+
+        Returns:
+            int | None: Хеш. `None` - изображение не удалось прочитать
+        '''
+        if self.__hash_pool is None:
+            self.__hash_pool = ProcessPoolExecutor(max_workers=self.__settings.attachment.hash_workers)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__hash_pool, self.image_hash, data)
+        except BrokenProcessPool as exc:
+            self.logger.error(f'Пул вычисления хешей завершился аварийно: {exc}')
+            self.__hash_pool.shutdown(wait=False, cancel_futures=True)
+            self.__hash_pool = ProcessPoolExecutor(max_workers=self.__settings.attachment.hash_workers)
+            return None
+        except (OSError, SyntaxError, ValueError) as exc:
+            self.logger.warning(f'Не удалось вычислить хеш изображения: {exc}')
+            return None
+
+    def get_webp_object_name(self, file_name: str) -> str:
+        '''
+        Получение имени объекта WebP-варианта в хранилище
+
+        Args:
+            file_name (str): Имя исходного файла без расширения
+
+        Returns:
+            str: Имя объекта WebP-варианта
+        '''
+        return f'{self.WEBP_PREFIX}/{file_name}.webp'
+
+    async def upload_webp(self, file_name: str, data: bytes, webp: bytes | None = None) -> int:
+        '''
+        Загрузка WebP-варианта изображения в хранилище. Вариант загружается, \
+            только если он меньше оригинала
+
+        Args:
+            file_name (str): Имя исходного файла без расширения
+            data (bytes): Исходное изображение
+            webp (bytes | None): Уже перекодированное изображение. \
+                `None` - перекодировать в потоке
+
+        Returns:
+            int: Размер загруженного варианта (байт). `0` - вариант не меньше оригинала и не загружен
+
+        Raises:
+            WasNotCreatedError: Не удалось загрузить вариант в хранилище
+        '''
+        if webp is None:
+            webp = await asyncio.to_thread(
+                self.encode_webp, data, self.__settings.attachment.webp_quality
+            )
+        if len(webp) >= len(data):
+            return 0
+        await self.put_bytes(self.get_webp_object_name(file_name), webp, 'image/webp')
+        return len(webp)
+
+    def get_thumbnail_object_name(self, file_name: str) -> str:
+        '''
+        Получение имени объекта превью в хранилище
+
+        Args:
+            file_name (str): Имя исходного файла без расширения
+
+        Returns:
+            str: Имя объекта превью
+        '''
+        return f'{self.THUMBNAIL_PREFIX}/{file_name}.{self.THUMBNAIL_EXTENSION}'
+
+    async def upload_thumbnail(self, file_name: str, data: bytes) -> None:
+        '''
+        Создание превью изображения и загрузка его в хранилище
+
+        Args:
+            file_name (str): Имя исходного файла без расширения
+            data (bytes): Исходное изображение
+
+        Raises:
+            WasNotCreatedError: Не удалось загрузить превью в хранилище
+        '''
+        thumbnail = await asyncio.to_thread(self.make_thumbnail, data)
+        await self.put_bytes(
+            self.get_thumbnail_object_name(file_name),
+            thumbnail,
+            'image/jpeg',
+        )
+
+    async def put_bytes(self, object_name: str, data: bytes, content_type: str) -> None:
+        '''
+        Загрузка объекта в хранилище
+
+        Args:
+            object_name (str): Имя объекта
+            data (bytes): Содержимое
+            content_type (str): MIME-тип
+
+        Raises:
+            WasNotCreatedError: Не удалось загрузить объект в хранилище
+        '''
+        try:
+            await self.backend.put(object_name, data, content_type)
+        except (S3Error, OSError) as exc:
+            raise WasNotCreatedError(exc)
+
+    async def get_object_bytes(self, object_name: str, offset: int = 0, length: int = 0) -> bytes:
+        '''
+        Чтение объекта из хранилища
+
+        Args:
+            object_name (str): Имя объекта
+            offset (int): Сдвиг начала. По-умолчанию: `0`
+            length (int): Количество байт. По-умолчанию: `0` - до конца объекта
+
+        Returns:
+            bytes: Содержимое объекта
+
+        Raises:
+            S3Error | OSError: Ошибка хранилища
+        '''
+        return await self.backend.get(object_name, offset, length)
+
+    async def iter_object_chunks(self, object_name: str, chunk_size: int) -> AsyncGenerator[bytes]:
+        '''
+        Потоковое чтение объекта из хранилища частями
+
+        Args:
+            object_name (str): Имя объекта
+            chunk_size (int): Размер части (байт)
+
+        Yields:
+            bytes: Часть объекта
+
+        Raises:
+            S3Error | OSError: Ошибка хранилища
+        '''
+        async for chunk in self.backend.iter_chunks(object_name, chunk_size):
+            yield chunk
+
+    async def object_exists(self, object_name: str) -> bool:
+        '''
+        Проверка существования объекта в хранилище
+
+        Args:
+            object_name (str): Имя объекта
+
+        Returns:
+            bool: `True` - объект существует
+
+        Raises:
+            S3Error | OSError: Ошибка хранилища
+        '''
+        return await self.backend.exists(object_name)
+
     async def upload_file(
         self,
         file: BytesIO,
-        file_ext: str
+        file_ext: str,
+        phash: int | None = None,
     ) -> AttachmentMinioSchema:
         '''
-        Загрузка файла в MinIO
+        Загрузка файла в MinIO. Для изображений вычисляется перцептивный хеш
 
         Args:
             file (BytesIO): Загружаемый файл
             file_ext (str): Расширение файла
+            phash (int | None): Уже вычисленный перцептивный хеш. \
+                `None` - вычислить для изображения
 
         Returns:
             AttachmentMinioSchema: Упрощенная Pydantic-схема медиа-контента, \
@@ -134,8 +401,6 @@ class MinioService:
             WasNotCreatedError: Не удалось загрузить файл в MinIO
             Exception: Прочие ошибки, связаныне с MinIO
         '''
-        await self.__ensure_bucket_exists()
-
         try:
             safe_name = uuid.uuid4().hex
             full_file_name = f"{safe_name}.{file_ext.lower()}"
@@ -161,24 +426,35 @@ class MinioService:
             if 'image' in mime_type:
                 width, height = self.__get_image_size(file)
             
-            await asyncio.to_thread(
-                self.client.put_object,
-                self.bucket_name,
-                full_file_name,
-                file,
-                file_size,
-                # content_type=mime_type
-            )
+            await self.backend.put(full_file_name, file.getvalue(), mime_type)
+
+            webp_size = None
+            if 'image' in mime_type:
+                if phash is None:
+                    phash = await self.compute_image_hash(file.getvalue())
+
+                try:
+                    await self.upload_thumbnail(safe_name, file.getvalue())
+                except Exception as exc:
+                    self.logger.warning(f'Не удалось создать превью {full_file_name}: {exc}')
+
+                if self.__settings.attachment.webp_enabled:
+                    try:
+                        webp_size = await self.upload_webp(safe_name, file.getvalue())
+                    except Exception as exc:
+                        self.logger.warning(f'Не удалось создать WebP {full_file_name}: {exc}')
 
             return AttachmentMinioSchema(
                 file_name=safe_name,
                 file_extension=file_ext,
                 file_size=file_size,
                 width=width,
-                height=height
+                height=height,
+                webp_size=webp_size,
+                phash=phash,
             )
 
-        except S3Error as exc:
+        except (S3Error, OSError) as exc:
             raise WasNotCreatedError(exc)
 
     async def delete_file(self, file_name: str, file_ext: str) -> bool:
@@ -199,62 +475,74 @@ class MinioService:
         full_file_name = f"{file_name}.{file_ext.lower()}"
 
         try:
-            await asyncio.to_thread(
-                self.client.remove_object,
-                self.bucket_name,
-                full_file_name
-            )
+            for object_name in (
+                full_file_name,
+                self.get_thumbnail_object_name(file_name),
+                self.get_webp_object_name(file_name),
+            ):
+                await self.backend.remove(object_name)
             return True
-        except S3Error as exc:
-            if exc.code == "NoSuchKey":
-                return True
-            else:
-                raise WasNotCreatedError(f"Не удалось удалить файл: {exc}")
+        except (S3Error, OSError) as exc:
+            raise WasNotCreatedError(f"Не удалось удалить файл: {exc}")
+
+    def get_object_name(self, file_name: str, file_ext: str, webp: bool = False) -> str:
+        '''
+        Получение имени объекта файла в хранилище
 
-    @property
-    def client(self) -> Minio:
-        return self._client
+        Args:
+            file_name (str): Имя файла без расширения
+            file_ext (str): Расширение файла
+            webp (bool): Имя WebP-варианта. По-умолчанию: `False`
 
-    @property
-    def bucket_name(self) -> str:
-        return self._bucket_name
+        Returns:
+            str: Имя объекта
+        '''
+        if webp:
+            return self.get_webp_object_name(file_name)
+        return f'{file_name}.{file_ext}'
 
-    def get_local_file_url(self, file_name: str, file_ext: str) -> str:
+    def get_local_file_url(self, file_name: str, file_ext: str, webp: bool = False) -> str:
         '''
         Получение закрытого URL файла в MinIO
 
         Args:
             file_name (str): Полное имя файла
             file_ext (str): Расширение файла
+            webp (bool): URL WebP-варианта. По-умолчанию: `False`
 
         Returns:
             str: URL файла в MinIO
         '''
-        return f'http://{self.__settings.minio.endpoint}/{self.__settings.minio.bucket_name}/{file_name}.{file_ext}'
+        path = self.get_object_name(file_name, file_ext, webp)
+        return self.backend.get_local_url(path) or self.get_global_file_url(file_name, file_ext, webp)
 
-    def get_global_file_url(self, file_name: str, file_ext: str) -> str:
+    def get_global_file_url(self, file_name: str, file_ext: str, webp: bool = False) -> str:
         '''
         Получение открытого URL файла в MinIO
 
         Args:
             file_name (str): Полное имя файла
             file_ext (str): Расширение файла
+            webp (bool): URL WebP-варианта. По-умолчанию: `False`
 
         Returns:
             str: URL файла в MinIO
         '''
-        return f'https://{self.__settings.minio.domain}/i/{file_name}.{file_ext}'
+        return f'https://{self.__settings.minio.domain}/i/{self.get_object_name(file_name, file_ext, webp)}'
         # return f'https://{self.__settings.minio.domain}/{self.__settings.minio.bucket_name}/{file_name}.{file_ext}'
     
     def get_thumbnail_url(self, file_name: str, file_ext: str) -> str:
         '''
-        Получение URL превью в MinIO
+        Получение URL превью в MinIO. Превью всегда в формате JPEG, \
+            независимо от расширения исходного файла. Расширение исходного \
+            файла передается в `?ext=`: если превью еще не создано, Caddy \
+            отдает по этой ссылке оригинал
 
         Args:
             file_name (str): Полное имя файла
-            file_ext (str): Расширение файла
+            file_ext (str): Расширение исходного файла
 
         Returns:
             str: URL файла в MinIO
         '''
-        return f'https://{self.__settings.minio.domain}/t/{file_name}.{file_ext}'
+        return f'https://{self.__settings.minio.domain}/t/{file_name}.{self.THUMBNAIL_EXTENSION}?ext={file_ext}'
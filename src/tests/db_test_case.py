@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Iterator
+from unittest import IsolatedAsyncioTestCase
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import (
+    create_async_engine, async_sessionmaker, AsyncConnection, AsyncEngine, AsyncSession
+)
+
+from config import get_settings
+
+
+class DbTestCase(IsolatedAsyncioTestCase):
+    '''
+    Тест с БД из настроек `postgres`. Тест выполняется внутри транзакции, \
+        которая откатывается в конце, поэтому коммиты сервисов превращаются \
+        в точки сохранения и данные в БД не остаются. Если БД недоступна, \
+        тест пропускается
+    '''
+    engine: AsyncEngine
+    connection: AsyncConnection
+    session_factory: async_sessionmaker[AsyncSession]
+
+    async def asyncSetUp(self) -> None:
+        # Режим отладки asyncio сохраняет стек создания каждой задачи - \
+        # на тысячах запросов тест замедляется в разы
+        asyncio.get_running_loop().set_debug(False)
+        self.engine = create_async_engine(get_settings().postgres.db_dsn, poolclass=NullPool)
+        try:
+            self.connection = await self.engine.connect()
+        except (OSError, ConnectionError) as exc:
+            await self.engine.dispose()
+            self.skipTest(f'БД недоступна: {exc}')
+        await self.connection.begin()
+        self.session_factory = async_sessionmaker(
+            bind=self.connection,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            join_transaction_mode='create_savepoint',
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.connection.rollback()
+        await self.connection.close()
+        await self.engine.dispose()
+
+    @contextmanager
+    def count_queries(self) -> Iterator[list[str]]:
+        '''
+        Сбор запросов к БД внутри блока. Точки сохранения, которыми \
+            тест изолирует коммиты, не учитываются
+
+        Yields:
+            list[str]: Выполненные запросы, пополняется по ходу блока
+        '''
+        statements: list[str] = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not statement.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+                statements.append(statement)
+
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(self.engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
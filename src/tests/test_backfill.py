@@ -0,0 +1,95 @@
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from PIL import Image
+from sqlalchemy import select
+
+from attachment.models.model import AttachmentModel
+from attachment.services.backfill import AttachmentBackfillService
+from global_var.services.service import GlobalVarService
+from message.models.model import MessageModel
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_service import MinioService
+from tests.db_test_case import DbTestCase
+
+
+class AttachmentBackfillTest(DbTestCase):
+    CURSOR_NAME = 'dimensions_backfill_last_id'
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.storage_dir = TemporaryDirectory()
+        self.minio_service = MinioService(LocalStorageBackend(self.storage_dir.name))
+        await self.minio_service.initialize()
+        self.service = AttachmentBackfillService(
+            self.minio_service, self.session_factory, concurrency=4, batch_size=2
+        )
+
+        image = BytesIO()
+        Image.new('RGB', (12, 8), (200, 100, 50)).save(image, 'JPEG')
+        self.image = image.getvalue()
+
+        async with self.session_factory() as db:
+            db.add(MessageModel(tg_msg_id=1, text='пост'))
+            attachments = [
+                AttachmentModel(
+                    tg_msg_id=1,
+                    tg_file_url=f'https://cdn.example/{i}.jpg',
+                    file_name=f'backfill{i:04d}',
+                    file_extension='jpg',
+                    file_size=len(self.image),
+                )
+                for i in range(6)
+            ]
+            db.add_all(attachments)
+            await db.commit()
+            self.ids = [a.id for a in attachments]
+            self.names = [a.file_name for a in attachments]
+
+    async def asyncTearDown(self) -> None:
+        self.minio_service.close()
+        self.storage_dir.cleanup()
+        await super().asyncTearDown()
+
+    async def put_images(self, indexes: list[int]) -> None:
+        for i in indexes:
+            await self.minio_service.put_bytes(f'{self.names[i]}.jpg', self.image, 'image/jpeg')
+
+    async def get_rows(self) -> list[AttachmentModel]:
+        async with self.session_factory() as db:
+            return list((await db.scalars(
+                select(AttachmentModel).where(AttachmentModel.id.in_(self.ids)).order_by(AttachmentModel.id)
+            )).all())
+
+    async def get_cursor(self) -> str | None:
+        async with self.session_factory() as db:
+            return await GlobalVarService(db).get_value(self.CURSOR_NAME)
+
+    async def test_dimensions_cursor_stops_at_failure(self) -> None:
+        await self.put_images([0, 1, 3, 4, 5])
+
+        progress = [p async for p in self.service.dimensions(restart=True)]
+
+        self.assertEqual(progress[-1]['updated'], 5)
+        self.assertEqual(progress[-1]['failed'], 1)
+        self.assertEqual(
+            [(a.width, a.height) for a in await self.get_rows()],
+            [(12, 8), (12, 8), (None, None), (12, 8), (12, 8), (12, 8)],
+        )
+        self.assertEqual(await self.get_cursor(), str(self.ids[2] - 1))
+
+        await self.put_images([2])
+        progress = [p async for p in self.service.dimensions()]
+
+        self.assertEqual(progress[-1]['updated'], 1)
+        self.assertEqual(progress[-1]['failed'], 0)
+        self.assertEqual((await self.get_rows())[2].width, 12)
+        self.assertEqual(await self.get_cursor(), str(self.ids[2]))
+
+    async def test_hashes_saves_rows_of_each_batch(self) -> None:
+        await self.put_images(list(range(6)))
+
+        progress = [p async for p in self.service.hashes(workers=1)]
+
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1]['updated'], 6)
+        self.assertTrue(all(a.phash is not None for a in await self.get_rows()))
@@ -0,0 +1,56 @@
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from unittest import mock
+from aiogram.types import Chat, Message, PhotoSize
+
+from attachment.services.service import AttachmentService
+from global_var.services.service import GlobalVarService
+from message.services.service import MessageService
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_service import MinioService
+from tests.db_test_case import DbTestCase
+from tg.bot.services.channel import ChannelService
+
+
+class ChannelServiceTest(DbTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.storage_dir = TemporaryDirectory()
+        self.minio_service = MinioService(LocalStorageBackend(self.storage_dir.name))
+        self.bot = mock.AsyncMock()
+
+    async def asyncTearDown(self) -> None:
+        self.minio_service.close()
+        self.storage_dir.cleanup()
+        await super().asyncTearDown()
+
+    def post(self, msg_id: int, text: str | None = None) -> Message:
+        return Message(
+            message_id=msg_id,
+            date=datetime.now(),
+            chat=Chat(id=-1001, type='channel', username='chan'),
+            text=text,
+            photo=None if text else [PhotoSize(file_id='f', file_unique_id='u', width=8, height=8)],
+        )
+
+    async def ingest(self, message: Message) -> tuple[bool, int]:
+        async with self.session_factory() as db:
+            message_service = MessageService(
+                db, AttachmentService(db, self.minio_service), GlobalVarService(db)
+            )
+            model = await ChannelService(db, message_service, self.bot).ingest(message)
+            return model is not None, await message_service.get_last_parsed_msg_id()
+
+    async def test_post_without_text_advances_cursor(self) -> None:
+        '''
+        Пост без текста не сохраняется и не скачивается, но курсор \
+            парсинга за него сдвигается
+        '''
+        async with self.session_factory() as db:
+            await MessageService(db, mock.Mock(), GlobalVarService(db)).set_last_parsed_msg_id(5)
+            await db.commit()
+
+        self.assertEqual(await self.ingest(self.post(5)), (False, 6))
+        self.bot.get_file.assert_not_awaited()
+
+        self.assertEqual(await self.ingest(self.post(6, 'пост')), (True, 7))
@@ -0,0 +1,58 @@
+import tg.bot
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from PIL import Image
+from sqlalchemy import select
+
+from attachment.models.model import AttachmentModel
+from ingestion.services.export import ExportImportService
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_service import MinioService
+from tests.db_test_case import DbTestCase
+
+
+class ExportImportTest(DbTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.storage_dir = TemporaryDirectory()
+        self.export_dir = TemporaryDirectory()
+        self.minio_service = MinioService(LocalStorageBackend(self.storage_dir.name))
+        await self.minio_service.initialize()
+        self.service = ExportImportService(self.minio_service, self.session_factory)
+
+    async def asyncTearDown(self) -> None:
+        self.minio_service.close()
+        self.storage_dir.cleanup()
+        self.export_dir.cleanup()
+        await super().asyncTearDown()
+
+    def write_export(self, msg_id: int) -> None:
+        export_dir = Path(self.export_dir.name)
+        (export_dir / 'photos').mkdir()
+        image = Image.linear_gradient('L').resize((64, 48)).convert('RGB')
+        image.save(export_dir / 'photos' / 'photo.jpg', 'JPEG')
+        messages = [{
+            'id': msg_id,
+            'type': 'message',
+            'date': '2024-01-01T00:00:00',
+            'text': 'пост из экспорта',
+            'photo': 'photos/photo.jpg',
+        }]
+        (export_dir / 'result.json').write_text(json.dumps({'messages': messages}), encoding='utf-8')
+
+    async def test_import_saves_phash(self) -> None:
+        msg_id = 9_000_001
+        self.write_export(msg_id)
+
+        progress = [p async for p in self.service.import_export(Path(self.export_dir.name))]
+
+        self.assertEqual(progress[-1]['attachments'], 1)
+        async with self.session_factory() as db:
+            attachment = await db.scalar(select(AttachmentModel).filter_by(tg_msg_id=msg_id))
+        assert attachment is not None
+        data = await self.minio_service.get_object_bytes(
+            f'{attachment.file_name}.{attachment.file_extension}'
+        )
+        self.assertIsNotNone(attachment.phash)
+        self.assertEqual(attachment.phash, MinioService.image_hash(data))
@@ -0,0 +1,225 @@
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+from unittest import mock
+from PIL import Image
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from attachment.services.service import AttachmentService
+from global_var.services.service import GlobalVarService
+from ingestion.services.service import IngestionService
+from attachment.models.model import AttachmentModel
+from message.models.model import MessageModel
+from message.services.service import MessageService
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_service import MinioService
+from tests.db_test_case import DbTestCase
+
+
+class StubScraper:
+    '''
+    Страницы канала из `total` постов по одному изображению, \
+        без обращения к t.me
+    '''
+
+    def __init__(self, total: int, page_size: int = 20, first_msg_id: int = 1) -> None:
+        self.first_msg_id = first_msg_id
+        self.last_msg_id = first_msg_id + total
+        self.page_size = page_size
+
+    async def get_first_msg_id(self) -> int:
+        return self.first_msg_id
+
+    async def get_last_msg_id(self) -> int:
+        return self.last_msg_id
+
+    async def parse_messages(self, after: int) -> list[dict[str, Any]]:
+        return [
+            {
+                'id': msg_id,
+                'text': f'пост {msg_id} ' + 'текст ' * 20,
+                'image_urls': [f'https://cdn.example/{msg_id}.jpg'],
+            }
+            for msg_id in range(after + 1, min(after + 1 + self.page_size, self.last_msg_id))
+        ]
+
+
+class IngestionServiceTest(DbTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.storage_dir = TemporaryDirectory()
+        self.minio_service = MinioService(LocalStorageBackend(self.storage_dir.name))
+        await self.minio_service.initialize()
+
+        image = BytesIO()
+        Image.new('RGB', (8, 8), (200, 100, 50)).save(image, 'JPEG')
+        self.image = image.getvalue()
+
+    async def asyncTearDown(self) -> None:
+        self.minio_service.close()
+        self.storage_dir.cleanup()
+        await super().asyncTearDown()
+
+    async def message_service_factory(self, db: AsyncSession) -> MessageService:
+        return MessageService(db, AttachmentService(db, self.minio_service), GlobalVarService(db))
+
+    async def download_file(self, url: str) -> dict[str, Any]:
+        if url in self.failing_urls:
+            raise OSError(f'{url} недоступен')
+        return {'file': BytesIO(self.image), 'name': Path(url).stem, 'ext': 'jpg'}
+
+    async def ingest(self, scraper: StubScraper, on_page=None) -> list[dict[str, Any]]:
+        service = IngestionService(scraper, self.message_service_factory, self.session_factory)  # type: ignore
+        pages = []
+        with (
+            mock.patch('attachment.services.service.download_file', self.download_file),
+            mock.patch('ingestion.services.service.asyncio.sleep', mock.AsyncMock()),
+            mock.patch('ingestion.services.service.random.randint', return_value=0),
+        ):
+            async for page in service.parse(scraper.first_msg_id, scraper.last_msg_id):
+                pages.append({'current': len(page['current']), 'skipped': page['skipped']})
+                if on_page is not None:
+                    on_page(len(pages))
+        return pages
+
+    async def count_messages(self) -> int:
+        async with self.session_factory() as db:
+            return await db.scalar(select(func.count()).select_from(MessageModel)) or 0
+
+    async def get_attachment_ids(self, tg_msg_id: int) -> list[int]:
+        async with self.session_factory() as db:
+            return list((await db.scalars(
+                select(AttachmentModel.id).where(AttachmentModel.tg_msg_id == tg_msg_id)
+            )).all())
+
+    async def test_memory_is_flat(self) -> None:
+        '''
+        Память за вторые 5000 постов почти не растет: страницы не \
+            накапливаются в сессии
+        '''
+        self.failing_urls: set[str] = set()
+        scraper = StubScraper(10000)
+        traced: dict[int, int] = {}
+
+        def on_page(page: int) -> None:
+            # Кеши SQLAlchemy (скомпилированные запросы) заполняются примерно
+            # за первые 4000 постов, поэтому сравниваются 250-я и 500-я страницы
+            if page == 50:
+                tracemalloc.start()
+            elif page in (250, 500):
+                traced[page] = tracemalloc.get_traced_memory()[0]
+
+        try:
+            pages = await self.ingest(scraper, on_page)
+        finally:
+            tracemalloc.stop()
+
+        growth = traced[500] - traced[250]
+        self.assertEqual(sum(page['current'] for page in pages), 10000)
+        self.assertEqual(await self.count_messages(), 10000)
+        self.assertLess(growth, 2 * 1024 * 1024, f'Память выросла на {growth} байт')
+
+    async def test_failed_post_keeps_page(self) -> None:
+        '''
+        Ошибка в одном посте не отменяет сохраненные посты той же страницы
+        '''
+        self.failing_urls = {'https://cdn.example/5.jpg'}
+        pages = await self.ingest(StubScraper(10))
+
+        self.assertEqual(pages[0], {'current': 9, 'skipped': {5}})
+        self.assertEqual(await self.count_messages(), 9)
+
+    async def test_integrity_error_keeps_page(self) -> None:
+        '''
+        Ошибка БД при сохранении поста откатывает только его точку \
+            сохранения, а не всю страницу
+        '''
+        self.failing_urls = set()
+        async with self.session_factory() as db:
+            await db.execute(text(
+                'ALTER TABLE attachment ADD CONSTRAINT test_rejected_url '
+                f"CHECK (tg_file_url <> '{AttachmentService.get_media_url(5)}')"
+            ))
+            await db.commit()
+
+        with self.assertLogs('tg_logger', 'WARNING') as logs:
+            pages = await self.ingest(StubScraper(10))
+
+        self.assertEqual(pages[0], {'current': 9, 'skipped': {5}})
+        self.assertEqual(await self.count_messages(), 9)
+        self.assertIn('test_rejected_url', '\n'.join(logs.output))
+
+    async def test_channel_post_media_is_not_duplicated(self) -> None:
+        '''
+        Медиафайл поста, уже полученного из `channel_post`, парсинг \
+            находит по ссылке на пост и не загружает повторно
+        '''
+        self.failing_urls = set()
+        async with self.session_factory() as db:
+            message_service = await self.message_service_factory(db)
+            await message_service.ingest(3, 'пост 3', [(3, 3, BytesIO(self.image), 'jpg')])
+            await db.commit()
+        attachment_id = await self.get_attachment_ids(3)
+
+        pages = await self.ingest(StubScraper(10))
+
+        self.assertEqual(pages[0], {'current': 10, 'skipped': set()})
+        self.assertEqual(await self.get_attachment_ids(3), attachment_id)
+
+    async def test_reextract_matches_media_by_url(self) -> None:
+        '''
+        Повторное извлечение сопоставляет строки с медиа поста по ключу \
+            или ссылке на CDN, а не по порядку, и не присваивает ключ, \
+            который уже есть у другой строки
+        '''
+        cdn = [f'https://cdn.example/reextract{i}.jpg' for i in range(3)]
+        async with self.session_factory() as db:
+            db.add_all([MessageModel(tg_msg_id=100, text='пост 100'), MessageModel(tg_msg_id=200, text='пост 200')])
+            attachments = [
+                AttachmentModel(
+                    tg_msg_id=tg_msg_id,
+                    tg_file_url=url,
+                    file_name=f'reextract{i:04d}',
+                    file_extension='jpg',
+                    file_size=len(self.image),
+                )
+                for i, (tg_msg_id, url) in enumerate([
+                    (100, cdn[2]),
+                    (100, AttachmentService.get_media_url(100)),
+                    (100, cdn[1]),
+                    (200, AttachmentService.get_media_url(101)),
+                    (200, 'https://cdn.example/unknown.jpg'),
+                ])
+            ]
+            db.add_all(attachments)
+            await db.commit()
+            ids = [a.id for a in attachments]
+
+        service = IngestionService(StubScraper(0), self.message_service_factory, self.session_factory)  # type: ignore
+        stats = {'pages': 0, 'messages': 0, 'attachments': 0, 'new_media': 0, 'skipped': 0, 'missing': 0}
+        posts = {
+            100: {'id': 100, 'text': 'пост 100', 'image_urls': cdn},
+            200: {'id': 200, 'text': 'пост 200', 'image_urls': ['https://cdn.example/a.jpg', 'https://cdn.example/b.jpg']},
+        }
+        await service._IngestionService__reextract_batch(posts, stats, False)  # type: ignore
+
+        async with self.session_factory() as db:
+            urls = {
+                row.id: row.tg_file_url
+                for row in await db.execute(
+                    select(AttachmentModel.id, AttachmentModel.tg_file_url).where(AttachmentModel.id.in_(ids))
+                )
+            }
+        self.assertEqual([urls[i] for i in ids], [
+            AttachmentService.get_media_url(102),
+            AttachmentService.get_media_url(100),
+            cdn[1],
+            AttachmentService.get_media_url(101),
+            'https://cdn.example/unknown.jpg',
+        ])
+        self.assertEqual(stats['attachments'], 1)
+        self.assertEqual(stats['skipped'], 3)
+        self.assertEqual(stats['new_media'], 0)
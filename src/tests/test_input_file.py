@@ -0,0 +1,138 @@
+import os
+import sys
+import asyncio
+import subprocess
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, InputFile
+
+from config import get_settings
+from storage.services.local_backend import LocalStorageBackend
+from storage.services.minio_service import MinioService
+from tg.bot.services.input_file import StorageInputFile
+
+OBJECT_NAME = 'streamtest0001.jpg'
+
+
+async def open_file(minio_service: MinioService, streamed: bool) -> InputFile:
+    '''
+    Файл для отправки так же, как его готовит `MediaService.inchat_media`
+    '''
+    if streamed:
+        return StorageInputFile(
+            minio_service,
+            OBJECT_NAME,
+            chunk_size=get_settings().attachment.stream_chunk_size,
+        )
+    return BufferedInputFile(await minio_service.get_object_bytes(OBJECT_NAME), OBJECT_NAME)
+
+
+async def send(minio_service: MinioService, streamed: bool) -> int:
+    '''
+    Чтение файла частями, как при загрузке в Telegram
+
+    Returns:
+        int: Прочитано байт
+    '''
+    file = await open_file(minio_service, streamed)
+    sent = 0
+    async with Bot('42:TEST') as bot:
+        async for chunk in file.read(bot):
+            sent += len(chunk)
+    return sent
+
+
+def peak_rss() -> int:
+    '''
+    Пиковый RSS процесса (байт). `ru_maxrss` не подходит: после fork/exec \
+        он наследует пик родительского процесса
+    '''
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    raise OSError('VmHWM недоступен')
+
+
+def measure_rss(root: str, streamed: bool) -> int:
+    '''
+    Рост пикового RSS процесса за одну отправку (байт)
+    '''
+    minio_service = MinioService(LocalStorageBackend(root))
+    before = peak_rss()
+    asyncio.run(send(minio_service, streamed))
+    return peak_rss() - before
+
+
+class StorageInputFileMemoryTest(IsolatedAsyncioTestCase):
+    '''
+    Пиковая память при отправке файла из памяти (`BufferedInputFile`) \
+        и частями из хранилища (`StorageInputFile`)
+    '''
+
+    def setUp(self) -> None:
+        self.settings = get_settings().attachment
+        self.storage_dir = TemporaryDirectory()
+        self.minio_service = MinioService(LocalStorageBackend(self.storage_dir.name))
+
+    def tearDown(self) -> None:
+        self.storage_dir.cleanup()
+
+    async def put_object(self, size: int) -> None:
+        await self.minio_service.backend.initialize()
+        await self.minio_service.put_bytes(OBJECT_NAME, os.urandom(size), 'image/jpeg')
+
+    async def peak_memory(self, streamed: bool) -> int:
+        tracemalloc.start()
+        try:
+            self.assertEqual(await send(self.minio_service, streamed), self.size)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    async def test_peak_memory_at_threshold(self) -> None:
+        '''
+        Файл размером `stream_threshold`: из памяти он держится целиком, \
+            частями - не больше нескольких частей
+        '''
+        self.size = self.settings.stream_threshold
+        await self.put_object(self.size)
+
+        buffered = await self.peak_memory(streamed=False)
+        streamed = await self.peak_memory(streamed=True)
+
+        print(f'\nstream_threshold={self.size}: buffered={buffered}, streamed={streamed}')
+        self.assertGreaterEqual(buffered, self.size)
+        self.assertLess(streamed, 4 * self.settings.stream_chunk_size + 256 * 1024)
+
+    async def test_peak_rss(self) -> None:
+        '''
+        Пиковый RSS отдельного процесса при отправке файла \
+            в 16 раз больше `stream_threshold`
+        '''
+        if not Path('/proc/self/status').exists():
+            self.skipTest('Пиковый RSS читается из /proc')
+        self.size = 16 * self.settings.stream_threshold
+        await self.put_object(self.size)
+
+        rss = {}
+        for mode in ('buffered', 'streamed'):
+            result = subprocess.run(
+                [sys.executable, '-m', 'tests.test_input_file', mode, self.storage_dir.name],
+                cwd=Path(__file__).parent.parent,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            rss[mode] = int(result.stdout.split()[-1])
+
+        print(f'\nsize={self.size}: buffered RSS +{rss["buffered"]}, streamed RSS +{rss["streamed"]}')
+        self.assertGreaterEqual(rss['buffered'], self.size * 0.9)
+        self.assertLess(rss['streamed'], self.size / 4)
+
+
+if __name__ == '__main__':
+    print(measure_rss(sys.argv[2], streamed=sys.argv[1] == 'streamed'))
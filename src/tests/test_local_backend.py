@@ -0,0 +1,52 @@
+import os
+import random
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase, mock
+
+from storage.services.local_backend import LocalStorageBackend
+
+
+class LocalStorageBackendTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.storage_dir = TemporaryDirectory()
+        self.backend = LocalStorageBackend(self.storage_dir.name)
+        await self.backend.initialize()
+
+        rng = random.Random(42)
+        # Имена на "th" и "we" попадают между объектами префиксов
+        # `thumbnails/` и `webp/` при сортировке всего списка
+        bases = [
+            ''.join(rng.choices('0123456789abcdefhtuw', k=8)) + '.jpg'
+            for _ in range(300)
+        ] + ['thab.jpg', 'thz.jpg', 'webb.jpg', 'wez.jpg', 'ab.jpg']
+        self.names = sorted({
+            f'{prefix}{base}'
+            for base in bases
+            for prefix in ('', 'thumbnails/', 'webp/')
+            if rng.random() < 0.7
+        })
+        for name in self.names:
+            await self.backend.put(name, b'x', 'image/jpeg')
+
+    async def asyncTearDown(self) -> None:
+        self.storage_dir.cleanup()
+
+    async def test_iter_objects_in_name_order(self) -> None:
+        names = [obj.name async for obj in self.backend.iter_objects()]
+        self.assertEqual(names, self.names)
+
+    async def test_iter_objects_by_prefix(self) -> None:
+        for prefix in ('thumbnails/', 'th', 'webp/a'):
+            names = [obj.name async for obj in self.backend.iter_objects(prefix)]
+            self.assertEqual(names, [n for n in self.names if n.startswith(prefix)], prefix)
+
+    def test_first_object_reads_few_directories(self) -> None:
+        '''
+        Для первого объекта читаются только папки на пути к нему, \
+            а не все хранилище
+        '''
+        with mock.patch('storage.services.local_backend.os.scandir', wraps=os.scandir) as scandir:
+            objects = self.backend._LocalStorageBackend__iter_directory(Path(self.storage_dir.name), '')  # type: ignore
+            self.assertEqual(next(objects).name, self.names[0])
+        self.assertLess(scandir.call_count, 10)
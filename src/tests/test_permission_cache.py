@@ -0,0 +1,82 @@
+from unittest import mock
+from sqlalchemy import func, select
+
+from botcommand.models.model import BotCommandModel
+from botcommand.services.service import BotCommandService
+from permission.models.model import PermissionModel
+from permission.services.cache import PermissionCache
+from permission.services.service import PermissionService
+from role.models.model import RoleModel
+from role.services.service import RoleService
+from tests.db_test_case import DbTestCase
+
+
+class PermissionCacheTest(DbTestCase):
+    '''
+    Кеш доступа и `ReplicaRouter.mark_written` сбрасываются только \
+        после фиксации транзакции, которая изменила доступ
+    '''
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.cache = PermissionCache()
+        self.mark_written = mock.patch('db.database.replica_router.mark_written').start()
+        self.addCleanup(mock.patch.stopall)
+
+        async with self.session_factory() as db:
+            # Последовательности id отстают от строк, добавленных миграциями
+            role = RoleModel(id=9_000_001, name='test_permission_cache')
+            botcommand = BotCommandModel(id=9_000_001, name='test_permission_cache')
+            db.add_all([role, botcommand])
+            await db.flush()
+            db.add(PermissionModel(role_id=role.id, botcommand_id=botcommand.id))
+            await db.commit()
+            self.role_id = role.id
+            self.botcommand_id = botcommand.id
+
+    def set_matrix(self) -> None:
+        self.cache.set_matrix({'test_permission_cache': frozenset([self.role_id])})
+
+    async def count(self, model: type[RoleModel] | type[PermissionModel]) -> int:
+        async with self.session_factory() as db:
+            return await db.scalar(select(func.count()).select_from(model)) or 0
+
+    async def test_invalidate_after_commit(self) -> None:
+        async with self.session_factory() as db:
+            service = PermissionService(
+                db, BotCommandService(db, self.cache), RoleService(db, self.cache), self.cache
+            )
+            self.set_matrix()
+            await service.delete({'role_id': self.role_id, 'botcommand_id': self.botcommand_id})
+
+            self.assertIsNotNone(self.cache.get_matrix())
+            self.mark_written.assert_not_called()
+            await db.commit()
+            self.assertIsNone(self.cache.get_matrix())
+            self.mark_written.assert_called_once()
+
+    async def test_rollback_keeps_cache(self) -> None:
+        async with self.session_factory() as db:
+            service = BotCommandService(db, self.cache)
+            self.set_matrix()
+            await service.delete({'id': self.botcommand_id})
+            await db.rollback()
+
+            self.assertIsNotNone(self.cache.get_matrix())
+            self.mark_written.assert_not_called()
+
+    async def test_role_delete(self) -> None:
+        '''
+        Удаляется только роль из фильтра вместе с ее ограничениями доступа
+        '''
+        roles = await self.count(RoleModel)
+        permissions = await self.count(PermissionModel)
+
+        async with self.session_factory() as db:
+            self.set_matrix()
+            await RoleService(db, self.cache).delete({'id': self.role_id})
+            await db.commit()
+
+        self.assertIsNone(self.cache.get_matrix())
+        self.assertEqual(await self.count(RoleModel), roles - 1)
+        self.assertEqual(await self.count(PermissionModel), permissions - 1)
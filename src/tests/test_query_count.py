@@ -0,0 +1,106 @@
+from botcommand.services.service import BotCommandService
+from exceptions.exception import NotFoundError
+from global_var.services.service import GlobalVarService
+from permission.services.cache import PermissionCache
+from permission.services.service import PermissionService
+from role.models.model import RoleModel
+from role.services.service import RoleService
+from user.models.model import UserModel
+from user.services.service import UserService
+from tests.db_test_case import DbTestCase
+
+
+class QueryCountTest(DbTestCase):
+    '''
+    Количество запросов частых операций: запись переменной - один \
+        UPSERT, получение или создание пользователя - один \
+        `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`
+    '''
+
+    async def test_set_value(self) -> None:
+        async with self.session_factory() as db:
+            service = GlobalVarService(db)
+            with self.count_queries() as statements:
+                await service.set_value('test_query_count', '1')
+            self.assertEqual(len(statements), 1, statements)
+
+            with self.count_queries() as statements:
+                await service.set_value('test_query_count', '2')
+            self.assertEqual(len(statements), 1, statements)
+
+            with self.count_queries() as statements:
+                value = await service.get_value('test_query_count')
+            self.assertEqual(value, '2')
+            self.assertEqual(len(statements), 1, statements)
+
+    async def test_get_by_id_and_name(self) -> None:
+        async with self.session_factory() as db:
+            permission_service = PermissionService(
+                db,
+                BotCommandService(db),
+                RoleService(db),
+                PermissionCache(),
+            )
+            service = UserService(db, permission_service)
+
+            with self.count_queries() as statements:
+                user = await service.get_by_id_and_name(9_000_000_001, 'test_query_count')
+            self.assertEqual(user.role_id, 2)
+            self.assertEqual(len(statements), 1, statements)
+
+            db.expunge_all()
+            with self.count_queries() as statements:
+                user = await service.get_by_id_and_name(9_000_000_001, 'test_query_count')
+            self.assertEqual(user.user_name, 'test_query_count')
+            self.assertEqual(len(statements), 1, statements)
+
+    async def test_get_or_create(self) -> None:
+        '''
+        Существующая строка возвращается без изменений
+        '''
+        async with self.session_factory() as db:
+            service = RoleService(db)
+            role, created = await service.get_or_create(
+                RoleModel(id=9_000_001, name='test_query_count'), ['id'], load_relationships=False
+            )
+            self.assertTrue(created)
+
+            role, created = await service.get_or_create(
+                RoleModel(id=9_000_001, name='test_query_count_1'), ['id'], load_relationships=False
+            )
+            self.assertFalse(created)
+            self.assertEqual(role.name, 'test_query_count')
+
+    async def test_update(self) -> None:
+        '''
+        Обновление - один `UPDATE ... RETURNING` и для модели, загруженной \
+            сессией, и для новой модели
+        '''
+        async with self.session_factory() as db:
+            permission_service = PermissionService(
+                db,
+                BotCommandService(db),
+                RoleService(db),
+                PermissionCache(),
+            )
+            service = UserService(db, permission_service)
+            user = await service.get_by_id_and_name(9_000_000_001, 'test_query_count')
+
+            user.user_name = 'test_query_count_1'
+            with self.count_queries() as statements:
+                user = await service.update(user, {'id': user.id}, refresh=False)
+            self.assertEqual(len(statements), 1, statements)
+            self.assertEqual(user.user_name, 'test_query_count_1')
+            self.assertFalse(db.dirty)
+
+            with self.count_queries() as statements:
+                user = await service.update(
+                    UserModel(id=user.id, user_name='test_query_count_2'),
+                    {'id': user.id},
+                    refresh=False,
+                )
+            self.assertEqual(len(statements), 1, statements)
+            self.assertEqual((user.user_name, user.role_id), ('test_query_count_2', 2))
+
+            with self.assertRaises(NotFoundError):
+                await service.update(UserModel(id=9_000_000_002, user_name='x'), {'id': 9_000_000_002})
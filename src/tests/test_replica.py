@@ -0,0 +1,168 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, mock
+from sqlalchemy import delete, make_url, text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+
+from config import get_settings
+from db.replica import ReplicaRouter
+from global_var.models.model import GlobalVarModel
+from global_var.services.service import GlobalVarService
+
+
+class ReplicaTestCase(IsolatedAsyncioTestCase):
+    '''
+    Тест `ReplicaRouter` с основной БД из настроек `postgres`. Если БД \
+        недоступна, тест пропускается
+    '''
+
+    async def asyncSetUp(self) -> None:
+        asyncio.get_running_loop().set_debug(False)
+        self.engines: list[AsyncEngine] = []
+        self.primary = self.session_factory(get_settings().postgres.db_dsn)
+        try:
+            async with self.primary() as db:
+                await db.execute(text('SELECT 1'))
+        except (OSError, ConnectionError) as exc:
+            await self.dispose()
+            self.skipTest(f'БД недоступна: {exc}')
+
+    async def asyncTearDown(self) -> None:
+        await self.dispose()
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+    def session_factory(self, dsn: str) -> async_sessionmaker[AsyncSession]:
+        engine = create_async_engine(dsn, poolclass=NullPool)
+        self.engines.append(engine)
+        return async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class ReplicaRouterTest(ReplicaTestCase):
+    async def test_without_replica(self) -> None:
+        router = ReplicaRouter(self.primary)
+
+        self.assertFalse(router.enabled)
+        self.assertFalse(await router.use_replica())
+
+    async def test_unreachable_replica(self) -> None:
+        dsn = make_url(get_settings().postgres.db_dsn).set(host='127.0.0.1', port=1)
+        router = ReplicaRouter(self.primary, self.session_factory(dsn.render_as_string(hide_password=False)), check_interval=0)
+
+        with self.assertLogs('tg_logger', 'WARNING'):
+            self.assertFalse(await router.use_replica())
+
+    async def test_not_in_recovery(self) -> None:
+        '''
+        Экземпляр не в режиме восстановления считается не отстающим, \
+            в том числе после записи
+        '''
+        router = ReplicaRouter(self.primary, self.primary, check_interval=0)
+
+        self.assertTrue(await router.use_replica())
+        router.mark_written()
+        self.assertTrue(await router.use_replica())
+
+    async def test_check_interval(self) -> None:
+        '''
+        Между проверками используется последний результат, `mark_written` \
+            сбрасывает его
+        '''
+        router = ReplicaRouter(self.primary, self.primary, check_interval=3600)
+        self.assertTrue(await router.use_replica())
+
+        check = mock.AsyncMock(return_value=False)
+        with mock.patch.object(router, '_ReplicaRouter__check', check):
+            self.assertTrue(await router.use_replica())
+            check.assert_not_called()
+
+            router.mark_written()
+            self.assertFalse(await router.use_replica())
+            check.assert_called_once()
+
+
+class StreamingReplicaTest(ReplicaTestCase):
+    '''
+    Тест с потоковой репликой из настроек `postgres.replica_host`. \
+        Воспроизведение WAL на реплике приостанавливается \
+        (`pg_wal_replay_pause`), поэтому нужны права суперпользователя. \
+        Без реплики тест пропускается
+    '''
+    VAR_NAME = 'replica_router_test'
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        dsn = get_settings().postgres.db_dsn_replica
+        reason = None
+        if dsn:
+            self.replica = self.session_factory(dsn)
+            try:
+                async with self.replica() as db:
+                    if not await db.scalar(text('SELECT pg_is_in_recovery()')):
+                        reason = 'Реплика не в режиме восстановления'
+            except (OSError, ConnectionError) as exc:
+                reason = f'Реплика недоступна: {exc}'
+        else:
+            reason = 'Реплика не настроена (POSTGRES__REPLICA_HOST)'
+        if reason is not None:
+            await self.dispose()
+            self.skipTest(reason)
+
+    async def asyncTearDown(self) -> None:
+        await self.set_replay_paused(False)
+        async with self.primary() as db:
+            await db.execute(delete(GlobalVarModel).where(GlobalVarModel.name == self.VAR_NAME))
+            await db.commit()
+        await super().asyncTearDown()
+
+    async def set_replay_paused(self, paused: bool) -> None:
+        async with self.replica() as db:
+            await db.execute(text(f'SELECT pg_wal_replay_{"pause" if paused else "resume"}()'))
+
+    async def write(self) -> None:
+        async with self.primary() as db:
+            await GlobalVarService(db).set_value(self.VAR_NAME, str(time.time()))
+            await db.commit()
+
+    async def wait_replica(self, router: ReplicaRouter, timeout: float = 10) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if await router.use_replica():
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    async def test_mark_written(self) -> None:
+        '''
+        После `mark_written` реплика не используется, пока не воспроизведет \
+            запись, даже если отставание допустимо
+        '''
+        router = ReplicaRouter(self.primary, self.replica, max_lag=3600, check_interval=0)
+        self.assertTrue(await self.wait_replica(router))
+
+        await self.set_replay_paused(True)
+        await self.write()
+        router.mark_written()
+        self.assertFalse(await router.use_replica())
+        self.assertFalse(await router.use_replica())
+
+        await self.set_replay_paused(False)
+        self.assertTrue(await self.wait_replica(router))
+
+    async def test_lag_fallback(self) -> None:
+        '''
+        Реплика, которая отстает больше `max_lag`, не используется
+        '''
+        router = ReplicaRouter(self.primary, self.replica, max_lag=0.5, check_interval=0)
+        self.assertTrue(await self.wait_replica(router))
+
+        await self.set_replay_paused(True)
+        await self.write()
+        await asyncio.sleep(1)
+        self.assertFalse(await router.use_replica())
+
+        await self.set_replay_paused(False)
+        self.assertTrue(await self.wait_replica(router))
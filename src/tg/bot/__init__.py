@@ -3,13 +3,25 @@ import asyncio
 from aiogram import Bot, Dispatcher
 
 from config import get_settings
+from storage.dependencies.get_minio_services import get_minio_service
+from dependencies import (
+    SessionLocal,
+    get_bot_request_partition_manager,
+    get_bot_request_writer,
+    get_file_id_warmer,
+    get_permission_service,
+    get_search_warmer,
+)
 from tg.bot.menu import router as menu_router
 from tg.bot.chat import router as chat_router
+from tg.bot.channel import router as channel_router
 from tg.bot.logs import setup_async_tg_logger
+from tg.bot.middlewares import DbSessionMiddleware
 
 routers = [
     menu_router,
     chat_router,
+    channel_router,
 ]
 
 if not get_settings().telegram.bot_token:
@@ -23,5 +35,33 @@ tg_handler = setup_async_tg_logger(bot, get_settings().telegram.chat_id)
 async def main():
     logging.basicConfig(level=logging.INFO)
     dp = Dispatcher()
+    dp.update.outer_middleware(DbSessionMiddleware())
     dp.include_routers(*routers)
-    await dp.start_polling(bot)
+
+    minio_service = get_minio_service()
+    await minio_service.initialize()
+
+    async with SessionLocal() as db:
+        await (await get_permission_service(db)).load_matrix()
+
+    bot_request_writer = get_bot_request_writer()
+    writer_task = asyncio.create_task(bot_request_writer.run())
+
+    search_warmer_task = asyncio.create_task(get_search_warmer().run())
+    partition_task = asyncio.create_task(get_bot_request_partition_manager().run())
+
+    warmer_task: asyncio.Task | None = None
+    if get_settings().telegram.storage_chat_id:
+        warmer_task = asyncio.create_task(get_file_id_warmer(bot).run())
+
+    try:
+        await dp.start_polling(bot)
+    finally:
+        search_warmer_task.cancel()
+        partition_task.cancel()
+        if warmer_task is not None:
+            warmer_task.cancel()
+        bot_request_writer.close()
+        await writer_task
+        logging.info(f'Запросы боту: {bot_request_writer.stats}')
+        minio_service.close()
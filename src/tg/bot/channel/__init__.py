@@ -0,0 +1,19 @@
+from aiogram import F, Router, types
+
+from db.database import replica_router
+from dependencies import get_search_warmer
+from dependencies.container import ServiceContainer
+from tg.bot.services.channel import ChannelService
+
+router = Router()
+
+
+@router.channel_post(F.chat.func(ChannelService.is_source_channel))
+@router.edited_channel_post(F.chat.func(ChannelService.is_source_channel))
+async def channel_post(message: types.Message, services: ServiceContainer) -> None:
+    channel_service = await services.channel_service()
+    if await channel_service.ingest(message) is not None:
+        # Пост должен быть виден поиску сразу: фиксируем до сброса кеша
+        await services.db.commit()
+        replica_router.mark_written()
+        get_search_warmer().invalidate()
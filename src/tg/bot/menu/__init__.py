@@ -1,4 +1,7 @@
+import time
+from typing import AsyncGenerator, Awaitable, Callable
 from aiogram import types, F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandStart
 from aiogram.types import (
     InputMediaPhoto,
@@ -11,16 +14,17 @@ from aiogram.types import (
     InlineQueryResultAudio,
 )
 
-from bot_request.schemas.schema import BotRequestCreateSchema
-from bot_request.models.model import BotRequestModel
 from dependencies import (
     get_settings,
-    get_user_service,
-    get_media_service,
-    get_bot_request_service
+    get_bot_request_writer,
+    get_ingestion_coordinator,
+    get_ingestion_service,
+    get_search_warmer,
 )
-from db.database import get_db
-from user.models.model import UserModel
+from dependencies.container import ServiceContainer
+from db.database import replica_router
+from db.metrics import db_metrics
+from permission.services.cache import CachedUser
 from exceptions.exception import NotFoundError
 
 router = Router()
@@ -29,64 +33,120 @@ router = Router()
 async def send_single_media(
     message: types.Message,
     media: InputMediaPhoto | InputMediaVideo | InputMediaDocument | InputMediaAudio
-) -> None:
+) -> types.Message:
     if isinstance(media, InputMediaPhoto):
-        await message.answer_photo(media.media, caption=media.caption)
+        return await message.answer_photo(media.media, caption=media.caption)
 
     elif isinstance(media, InputMediaVideo):
-        await message.answer_video(media.media, caption=media.caption)
+        return await message.answer_video(media.media, caption=media.caption)
 
     elif isinstance(media, InputMediaDocument):
-        await message.answer_document(media.media, caption=media.caption)
+        return await message.answer_document(media.media, caption=media.caption)
 
     elif isinstance(media, InputMediaAudio):
-        await message.answer_audio(media.media, caption=media.caption)
+        return await message.answer_audio(media.media, caption=media.caption)
 
     else:
         raise ValueError("Unsupported media type")
 
 
-async def check_permission(message: types.Message | types.InlineQuery) -> tuple[bool, UserModel | None]:
+async def send_media(
+    message: types.Message,
+    media_list: list[tuple[int, InputMediaPhoto | InputMediaVideo]],
+    reload: Callable[[list[int]], Awaitable[list[tuple[int, InputMediaPhoto | InputMediaVideo]]]] | None = None,
+) -> tuple[list[tuple[int, InputMediaPhoto | InputMediaVideo]], list[types.Message]]:
+    '''
+    Отправка найденных медиа: одно - отдельным сообщением, \
+        несколько - альбомами по 10. Если Telegram отклонил альбом \
+        с сохраненными `file_id`, заново загружается и отправляется \
+        только этот альбом, уже отправленные не повторяются
+
+    Args:
+        message (types.Message): Сообщение пользователя
+        media_list (list[tuple[int, InputMediaPhoto|InputMediaVideo]]): Медиа \
+            для отправки в формате `MediaService.inchat_media`
+        reload (Callable[[list[int]], Awaitable[list[tuple[int, InputMediaPhoto|InputMediaVideo]]]] | None): \
+            Получение медиа по ID без сохраненных `file_id`. \
+            По-умолчанию: `None` - ошибка отправки не обрабатывается
+
+    Returns:
+        tuple[list[tuple[int, InputMediaPhoto|InputMediaVideo]], list[types.Message]]: \
+            Отправленные медиа и сообщения, которые вернул Telegram, в том же порядке
+
+    Raises:
+        TelegramBadRequest: Telegram отклонил медиа, загруженные из хранилища
+    '''
+    async def send_chunk(chunk: list[tuple[int, InputMediaPhoto | InputMediaVideo]]) -> list[types.Message]:
+        if len(chunk) == 1:
+            return [await send_single_media(message, chunk[0][1])]
+        return await message.answer_media_group([media for _, media in chunk])  # type: ignore
+
+    sent_media: list[tuple[int, InputMediaPhoto | InputMediaVideo]] = []
+    sent: list[types.Message] = []
+    for i in range(0, len(media_list), 10):
+        chunk = media_list[i:i + 10]
+        try:
+            messages = await send_chunk(chunk)
+        except TelegramBadRequest:
+            # Сохраненный file_id мог стать недействительным - загружаем файлы альбома заново
+            if reload is None or not any(isinstance(media.media, str) for _, media in chunk):
+                raise
+            chunk = await reload([media_id for media_id, _ in chunk])
+            if not chunk:
+                continue
+            messages = await send_chunk(chunk)
+        sent_media.extend(chunk)
+        sent.extend(messages)
+    return sent_media, sent
+
+
+async def check_permission(
+    message: types.Message | types.InlineQuery,
+    services: ServiceContainer,
+    command: str = 'find',
+) -> tuple[bool, CachedUser | None]:
     '''
-    Проверка доступа пользователя, отправившего сообщение
+    Проверка доступа пользователя, отправившего сообщение. Роль пользователя \
+        и матрица доступа берутся из кеша, поэтому обычно запросов к БД нет
 
     Args:
         message (types.Message | types.InlineQuery): Сообщение, отправленное пользователем
+        services (ServiceContainer): Сервисы обновления
+        command (str): Команда, доступ к которой проверяется. По-умолчанию: `find`
 
     Returns:
-        tuple[bool,UserModel|None]: `(permission, user)`. \
+        tuple[bool,CachedUser|None]: `(permission, user)`. \
             `permission` - предоставить доступ, \
-                `user` - SQLAlchemy модель пользователя
+                `user` - пользователь и его роль
         ```
     '''
     permitted = False
     answer = ''
-    user: UserModel | None = None
+    user: CachedUser | None = None
 
     if not message.from_user:
         return permitted, None
 
-    async for db in get_db():
-        user_service = await get_user_service(db)
-        user = await user_service.get_by_id_and_name(
-            message.from_user.id,
-            message.from_user.username,
-        )
-        permitted, answer = await user_service.check_permission(
-            'find',
-            message.from_user.id,
-            message.from_user.username,
-        )
-        if not permitted and type(message) is types.Message:
-            await message.answer(answer)
+    user_service = await services.user_service()
+    user = await user_service.get_cached(
+        message.from_user.id,
+        message.from_user.username,
+    )
+    permitted, answer = await user_service.check_permission(
+        command,
+        message.from_user.id,
+        message.from_user.username,
+    )
+    if not permitted and type(message) is types.Message:
+        await message.answer(answer)
 
     return permitted, user
 
 
 @router.message(CommandStart())
-async def start(message: types.Message) -> None:
+async def start(message: types.Message, services: ServiceContainer) -> None:
     # ### ПРОВЕРКА ДОСТУПА ### #
-    permitted, user = await check_permission(message)
+    permitted, user = await check_permission(message, services)
     if not permitted or not user:
         return
     # ######################## #
@@ -97,71 +157,100 @@ async def start(message: types.Message) -> None:
 
 
 @router.message(Command("parse"))
-async def parse(message: types.Message) -> None:
+async def parse(message: types.Message, services: ServiceContainer) -> None:
     # ### ПРОВЕРКА ДОСТУПА ### #
-    permitted, user = await check_permission(message)
+    permitted, user = await check_permission(message, services)
     if not permitted or not user:
         return
     # ######################## #
 
-    async for db in get_db():
-        media_service = await get_media_service(db)
-        async for msg in media_service.update_messages_base(show_msg=True):
-            await message.answer(msg)
+    # Парсинг пишет в БД своими сессиями, а сессия обновления не должна
+    # держать соединение в открытой транзакции до конца обхода канала
+    await services.release()
 
+    async def __parse_job() -> AsyncGenerator[str, None]:
+        async for msg in get_ingestion_service().update_messages_base(show_msg=True):
+            yield msg
 
-@router.message(Command("find"))
-async def find(message: types.Message) -> None:
+    async for msg in get_ingestion_coordinator().run(__parse_job):
+        await message.answer(msg)
+    replica_router.mark_written()
+    get_search_warmer().invalidate()
+
+
+@router.message(Command("stats"))
+async def stats(message: types.Message, services: ServiceContainer) -> None:
     # ### ПРОВЕРКА ДОСТУПА ### #
-    permitted, user = await check_permission(message)
+    permitted, user = await check_permission(message, services, 'stats')
     if not permitted or not user:
         return
     # ######################## #
 
-    async for db in get_db():
-        error_msg = "Пожалуйста, укажите текст для поиска."
-        if not message.text:
-            await message.reply(error_msg)
-            return
-
-        query_text = message.text[len("/find "):].strip().lower()
-
-        bot_request_service = await get_bot_request_service(db)
-        await bot_request_service.create(
-            BotRequestModel.from_schema(BotRequestCreateSchema(
-                user_id=user.id,
-                text=query_text,
-                request_type='chat'
-            ))
+    checkout_wait = db_metrics.checkout_wait
+    lines = [
+        f'Статистика БД за {(time.time() - db_metrics.started) / 60:.0f} мин.',
+        f'Соединений из пула: {db_metrics.checkouts}, '
+        f'ожидание p50/p95/max: {checkout_wait.quantile(0.5):.0f}/'
+        f'{checkout_wait.quantile(0.95):.0f}/{checkout_wait.max:.0f} мс',
+        '',
+        'Запросы по суммарному времени:',
+    ]
+    for sql, statement_stats in db_metrics.top_statements(10):
+        latency = statement_stats.latency
+        lines.append(
+            f'{latency.count} раз, {latency.sum:.0f} мс, '
+            f'p95 {latency.quantile(0.95):.0f} мс, строк {statement_stats.rows}, '
+            f'ошибок {statement_stats.errors}: {sql[:200]}'
         )
 
-        if not query_text:
-            await message.reply(error_msg)
-            return
+    await message.answer('\n'.join(lines)[:4096])
 
-        media_service = await get_media_service(db)
 
-        try:
-            media_list = await media_service.inchat_media(query_text)
+@router.message(Command("find"))
+async def find(message: types.Message, services: ServiceContainer) -> None:
+    # ### ПРОВЕРКА ДОСТУПА ### #
+    permitted, user = await check_permission(message, services)
+    if not permitted or not user:
+        return
+    # ######################## #
 
-            if not media_list:
-                raise NotFoundError(f'Ничего не найдено с текстом "{query_text}"')
+    error_msg = "Пожалуйста, укажите текст для поиска."
+    if not message.text:
+        await message.reply(error_msg)
+        return
+
+    query_text = message.text[len("/find "):].strip().lower()
+
+    get_bot_request_writer().submit(user.id, query_text, 'chat')
+
+    if not query_text:
+        await message.reply(error_msg)
+        return
 
-            if len(media_list) == 1:
-                await send_single_media(message, media_list[0])
-            elif len(media_list) > 10:
-                for i in range(0, len(media_list), 10):
-                    chunk = media_list[i:i + 10]
-                    await message.answer_media_group(chunk)
-            else:
-                await message.answer_media_group(media_list)
+    media_service = await services.media_service()
 
-        except NotFoundError as e:
-            await message.answer(str(e))
+    try:
+        media_list = await media_service.inchat_media(query_text)
+
+        if not media_list:
+            raise NotFoundError(f'Ничего не найдено с текстом "{query_text}"')
+
+        async def reload(ids: list[int]) -> list[tuple[int, InputMediaPhoto | InputMediaVideo]]:
+            media = await media_service.inchat_media(query_text, use_file_ids=False, ids=ids)
+            await services.release()
+            return media
+
+        # Отправка файлов в Telegram может идти долго - соединение с БД на это время не держим
+        await services.release()
+        sent_media, sent = await send_media(message, media_list, reload)
+        await media_service.save_file_ids(sent_media, sent)
+
+    except NotFoundError as e:
+        await message.answer(str(e))
 
 
 @router.inline_query()
-async def inline_msg(inline_query: types.InlineQuery) -> None:
+async def inline_msg(inline_query: types.InlineQuery, services: ServiceContainer) -> None:
     async def __empty_answer(cache_time: int):
         await inline_query.answer(
             results=[],
@@ -169,7 +258,7 @@ async def inline_msg(inline_query: types.InlineQuery) -> None:
         )
 
     # ### ПРОВЕРКА ДОСТУПА ### #
-    permitted, user = await check_permission(inline_query)
+    permitted, user = await check_permission(inline_query, services)
     if not permitted or not user:
         return
     # ######################## #
@@ -186,30 +275,22 @@ async def inline_msg(inline_query: types.InlineQuery) -> None:
         await __empty_answer(cache_time)
         return
 
-    async for db in get_db():
-        media_service = await get_media_service(db)
+    media_service = await services.media_service()
 
-        bot_request_service = await get_bot_request_service(db)
-        await bot_request_service.create(
-            BotRequestModel.from_schema(BotRequestCreateSchema(
-                user_id=user.id,
-                text=query_text,
-                request_type='inline',
-            ))
+    get_bot_request_writer().submit(user.id, query_text, 'inline')
+
+    try:
+        media_list = await media_service.inline_media(
+            query_text,
+            offset,
+            limit
         )
+    except NotFoundError:
+        await __empty_answer(cache_time)
+        return
 
-        try:
-            media_list = await media_service.inline_media(
-                query_text,
-                offset,
-                limit
-            )
-        except NotFoundError:
-            await __empty_answer(cache_time)
-            return
-
-        for inline_media in media_list:
-            results.append(inline_media)
+    for inline_media in media_list:
+        results.append(inline_media)
 
     if not results:
         await __empty_answer(cache_time)
@@ -0,0 +1,49 @@
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.database import async_session
+from dependencies.container import ServiceContainer
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    '''
+    Одна сессия БД на обновление Telegram. Обработчик получает сессию \
+        (`db`) и контейнер сервисов на ней (`services`) через данные \
+        обработчика. Транзакция фиксируется один раз после успешной \
+        обработки и откатывается при ошибке. Соединение из пула берется \
+        только при первом запросе, поэтому обновления без обращений \
+        к БД соединений не занимают. Долгие обработчики фиксируют \
+        транзакцию раньше через `ServiceContainer.release`
+    '''
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = async_session) -> None:
+        '''
+        Одна сессия БД на обновление Telegram
+
+        Args:
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+        '''
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        bot: Bot | None = data.get('bot')
+        async with self.session_factory() as db:
+            services = ServiceContainer(db, bot)
+            data['db'] = db
+            data['services'] = services
+            try:
+                result = await handler(event, data)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+            finally:
+                await services.close()
+            return result
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from io import BytesIO
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Chat, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from message.models.model import MessageModel
+from message.services.service import MessageService
+
+
+class ChannelService:
+    '''
+    Добавление постов в базу напрямую из обновлений `channel_post` \
+        и `edited_channel_post`. Работает, если бот - администратор канала. \
+        Парсинг `t.me/s/<channel>` при этом остается способом догнать \
+        пропущенные посты
+    '''
+    __media_groups: OrderedDict[str, int] = OrderedDict()
+    __media_groups_lock = asyncio.Lock()
+    __max_media_groups = 1024
+
+    def __init__(self, db: AsyncSession, message_service: MessageService, bot: Bot) -> None:
+        self.db = db
+        self.message_service = message_service
+        self.bot = bot
+        self.logger = logging.getLogger('tg_logger')
+
+    @staticmethod
+    def is_source_channel(chat: Chat) -> bool:
+        '''
+        Проверка, что обновление пришло из канала, указанного в настройках
+
+        Args:
+            chat (Chat): Чат, из которого пришло обновление
+
+        Returns:
+            bool: `True` - канал из настроек
+        '''
+        settings = get_settings().telegram
+        if chat.username and chat.username.lower() == settings.channel_name.lower():
+            return True
+        return str(chat.id) in (settings.channel_id, f'-100{settings.channel_id}')
+
+    async def __download_media(self, message: Message) -> tuple[BytesIO, str] | None:
+        '''
+        Скачивание медиа-контента поста через Bot API
+
+        Args:
+            message (Message): Пост канала
+
+        Returns:
+            tuple[BytesIO, str] | None: Файл и его расширение. \
+                `None` - в посте нет поддерживаемого медиа-контента
+        '''
+        settings = get_settings().attachment
+
+        if message.photo:
+            file_id = message.photo[-1].file_id
+        elif message.video:
+            file_id = message.video.file_id
+        elif message.animation:
+            file_id = message.animation.file_id
+        else:
+            return None
+
+        try:
+            tg_file = await self.bot.get_file(file_id)
+        except TelegramBadRequest as e:
+            self.logger.warning(f'Не удалось получить файл поста {message.message_id}: {e}')
+            return None
+
+        if not tg_file.file_path:
+            return None
+        if (tg_file.file_size or 0) > settings.max_size:
+            return None
+
+        file_ext = tg_file.file_path.split('.')[-1].lower()
+        if file_ext not in settings.extensions:
+            return None
+
+        file = await self.bot.download_file(tg_file.file_path, BytesIO())
+        if file is None:
+            return None
+        return file, file_ext  # type: ignore
+
+    async def ingest(self, message: Message) -> MessageModel | None:
+        '''
+        Добавление поста канала в базу
+
+        Посты альбома приходят отдельными обновлениями с общим `media_group_id`. \
+            Как и при парсинге, весь медиа-контент альбома прикрепляется \
+            к сообщению с ID первого поста альбома
+
+        Args:
+            message (Message): Пост канала
+
+        Returns:
+            MessageModel | None: SQLAlchemy-модель сообщения. \
+                `None` - пост без текста и не из альбома
+        '''
+        text = message.text or message.caption
+        model: MessageModel | None = None
+
+        if message.media_group_id is None:
+            # Пост без текста не сохраняется, поэтому его медиа не скачивается
+            if text:
+                media = await self.__download_media(message)
+                files = [(message.message_id, message.message_id, *media)] if media else None
+                model = await self.message_service.ingest(message.message_id, text, files)
+        else:
+            media = await self.__download_media(message)
+            async with self.__media_groups_lock:
+                tg_msg_id = self.__remember_media_group(message.media_group_id, message.message_id)
+                files = [(tg_msg_id, message.message_id, *media)] if media else None
+                model = await self.message_service.ingest(tg_msg_id, text, files)
+                await self.db.commit()
+
+        # Курсор сдвигается только без пропусков: если бот пропустил посты,
+        # /parse должен их догнать. Пост без текста тоже сдвигает курсор,
+        # иначе на нем курсор остановится и следующие посты его не сдвинут
+        if message.message_id == await self.message_service.get_last_parsed_msg_id():
+            await self.message_service.set_last_parsed_msg_id(message.message_id + 1)
+        await self.db.commit()
+        return model
+
+    def __remember_media_group(self, media_group_id: str, msg_id: int) -> int:
+        '''
+        Получение ID сообщения, к которому прикрепляется медиа-контент альбома
+
+        Args:
+            media_group_id (str): ID альбома
+            msg_id (int): ID поста альбома
+
+        Returns:
+            int: ID первого полученного поста альбома
+        '''
+        groups = self.__media_groups
+        if media_group_id not in groups:
+            groups[media_group_id] = msg_id
+            if len(groups) > self.__max_media_groups:
+                groups.popitem(last=False)
+        return groups[media_group_id]
@@ -0,0 +1,41 @@
+from typing import AsyncGenerator
+from aiogram import Bot
+from aiogram.types import InputFile
+
+from storage.services.minio_service import MinioService
+
+
+class StorageInputFile(InputFile):
+    '''
+    Файл для отправки в Telegram, который читается из хранилища частями \
+        прямо во время загрузки. В отличие от `BufferedInputFile`, файл \
+        не держится в памяти целиком: на каждую отправку приходится \
+        не больше одной части размером `chunk_size`
+    '''
+
+    def __init__(
+        self,
+        minio_service: MinioService,
+        object_name: str,
+        filename: str | None = None,
+        chunk_size: int = 64 * 1024,
+    ) -> None:
+        '''
+        Файл для отправки в Telegram, читаемый из хранилища частями
+
+        Args:
+            minio_service (MinioService): Сервис хранилища
+            object_name (str): Имя объекта в хранилище
+            filename (str | None): Имя файла для Telegram. По-умолчанию: имя объекта
+            chunk_size (int): Размер части (байт)
+        '''
+        super().__init__(
+            filename=filename or object_name.rsplit('/', 1)[-1],
+            chunk_size=chunk_size,
+        )
+        self.minio_service = minio_service
+        self.object_name = object_name
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        async for chunk in self.minio_service.iter_object_chunks(self.object_name, self.chunk_size):
+            yield chunk
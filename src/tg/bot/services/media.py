@@ -1,73 +1,44 @@
 import hashlib
-from io import BytesIO
+import asyncio
+import logging
 from aiogram.types import (
+    Message,
     BufferedInputFile,
+    InputFile,
     InputMediaPhoto,
     InputMediaVideo,
-    InputMediaDocument,
-    InputMediaAudio,
     InlineQueryResultPhoto,
+    InlineQueryResultCachedPhoto,
 )
-from typing import Any, AsyncGenerator, Literal
-import minio
-import logging
+from typing import Any, Collection, Literal
 from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 
-from async_requests import download_file
 from config import get_settings
 from message.models.model import MessageModel
 from message.services.service import MessageService
 from storage.services.minio_service import MinioService
+from tg.bot.services.input_file import StorageInputFile
+from tg.bot.services.search_cache import SearchCache
 from exceptions.exception import NotFoundError
 
 
 class MediaService:
-    def __init__(self, db: AsyncSession, message_service: MessageService, minio_service: MinioService) -> None:
+    def __init__(
+        self,
+        db: AsyncSession,
+        message_service: MessageService,
+        minio_service: MinioService,
+        search_cache: SearchCache | None = None,
+        read_message_service: MessageService | None = None,
+    ) -> None:
         self.db = db
         self.message_service = message_service
         self.minio_service = minio_service
-
-    def __get_msg_url(self, msg_id: int) -> str:
-        settings = get_settings()
-        return f'https://t.me/{settings.telegram.channel_name}/{msg_id}'
-
-    async def update_messages_base(self, show_msg=False) -> AsyncGenerator[str, None]:
-        '''
-        Парсинг всех сообщений в канале
-
-        Args:
-            show_msg (bool): Выводить спаршеные сообщения отправителю. По-умолчанию `False`
-
-        Yields:
-            Iterator[AsyncGenerator[str]]: Прогресс парсинга
-        '''
-        yield 'Запуск парсинга...'
-        skipped = set()
-
-        try:
-            async for msg in self.message_service.parse_new():
-                if show_msg:
-                    current = msg['current']
-                    skipped.update(msg['skipped'])
-                    current_str = '\n'.join([self.__get_msg_url(msg_id) for msg_id in current])
-                    skipped_str = '\n'.join([self.__get_msg_url(msg_id) for msg_id in skipped])
-                    last = msg['last']
-                    first = msg['first']
-                    total = msg['total']
-                    output = (f'Парсинг...\n\n'
-                              f'Текущие:\n{current_str}\n'
-                              f'Первое: {self.__get_msg_url(first)}\n'
-                              f'Последнее: {self.__get_msg_url(last)}\n' +
-                              (f'Пропущенные:\n{skipped_str}\n' if skipped else '') +
-                              f'Итого сообщений за этот момент: {total}')
-                    await self.db.commit()
-                    yield output
-        except minio.error.S3Error as e:
-            message = e.message or str(e)
-            logging.error(message)
-            yield message
-        yield 'Парсинг завершен'
+        self.search_cache = search_cache
+        # Поиск может идти через реплику, запись file_id - только в основную БД
+        self.read_message_service = read_message_service or message_service
+        self.logger = logging.getLogger('tg_logger')
 
     async def find_media(
         self,
@@ -76,9 +47,14 @@ class MediaService:
         reverse: bool = False,
         offset: int = 0,
         limit: int = 50,
-    ) -> list[dict[str, str | None]]:
+    ) -> list[dict[str, Any]]:
         '''
-        Поиск медиа по тексту в канале
+        Поиск медиа по тексту в канале через `read_message_service` \
+            (реплику, если она не отстает). Результаты сохраняются в `search_cache`, \
+            повторный поиск с теми же параметрами к БД не обращается. Если включено \
+            `attachment.collapse_duplicates`, из результатов убираются \
+            изображения, перцептивный хеш которых отличается от уже \
+            найденного не больше чем на `attachment.duplicate_distance` бит
 
         Args:
             text (str): Текст на картинке
@@ -89,24 +65,35 @@ class MediaService:
             NotFoundError: Не удалось найти
 
         Returns:
-            list[dict[str,str|None]]: Список словарей с данными о картинке или сообщение об ошибке
+            list[dict[str,Any]]: Список словарей с данными о картинке или сообщение об ошибке
             Словарь:
         ```
         {
+            "id": attachment_id, [int]
+            "file_id": telegram_file_id, [str|None]
+            "object_name": storage_object_name, [str]
+            "size": file_size, [int]
             "url": media_url, [str]
             "thumbnail_url": thumbnail_url, [str]
             "text": message_text, [str]
             "type": "vid" | "img" | None, [str|None]
             "name": file_name, [str]
             "ext": file_ext, [str]
+            "phash": perceptual_hash, [int|None]
         }
         ```
         '''
+        cache_key = (text, url_type, reverse, offset, limit)
+        if self.search_cache is not None:
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         order_by = MessageModel.id.asc()
         if reverse:
             order_by = MessageModel.id.desc()
 
-        found = await self.message_service.find_with_value(
+        found = await self.read_message_service.find_with_value(
             filter={'text': text},
             offset=offset,
             limit=limit,
@@ -115,8 +102,9 @@ class MediaService:
 
         settings = get_settings()
 
-        result: list[dict[str, str | None]] = []
-        
+        result: list[dict[str, Any]] = []
+        seen_hashes: list[int] = []
+
         for msg in found:
             if url_type == 'local':
                 get_url_func = self.minio_service.get_local_file_url
@@ -125,16 +113,28 @@ class MediaService:
             else:
                 raise AttributeError('Неверный url_type - только local или global')
 
-            media_data = []
+            media_data: list[dict[str, Any]] = []
             for a in msg.attachments:
+                # Inline-результаты Telegram принимают только JPEG, поэтому
+                # WebP-вариант используется только для загрузки внутри сети
+                webp = (
+                    url_type == 'local'
+                    and settings.attachment.webp_enabled
+                    and bool(a.webp_size)
+                )
                 media_data.append(
                     {
-                        'url': get_url_func(a.file_name, a.file_extension),
+                        'id': a.id,
+                        'file_id': a.tg_file_id,
+                        'object_name': self.minio_service.get_object_name(a.file_name, a.file_extension, webp),
+                        'size': a.webp_size if webp else a.file_size,
+                        'url': get_url_func(a.file_name, a.file_extension, webp),
                         'thumbnail_url': self.minio_service.get_thumbnail_url(a.file_name, a.file_extension),
                         'name': a.file_name,
                         'ext': a.file_extension,
                         'width': a.width,
                         'height': a.height,
+                        'phash': a.phash,
                     }
                 )
 
@@ -146,7 +146,24 @@ class MediaService:
                     file_type = 'img'
                 elif data['ext'] in settings.attachment.video_extensions:
                     file_type = 'vid'
+
+                if (
+                    settings.attachment.collapse_duplicates
+                    and data['phash'] is not None
+                    and not MinioService.is_degenerate_hash(data['phash'])
+                ):
+                    if any(
+                        MinioService.hash_distance(data['phash'], phash) <= settings.attachment.duplicate_distance
+                        for phash in seen_hashes
+                    ):
+                        continue
+                    seen_hashes.append(data['phash'])
+
                 result.append({
+                    'id': data['id'],
+                    'file_id': data['file_id'],
+                    'object_name': data['object_name'],
+                    'size': data['size'],
                     'text': msg.text,
                     'url': data['url'],
                     'thumbnail_url': data['thumbnail_url'],
@@ -155,12 +172,22 @@ class MediaService:
                     'ext': data['ext'],
                     'width': data['width'],
                     'height': data['height'],
+                    'phash': data['phash'],
                 })
+        if self.search_cache is not None:
+            self.search_cache.set(cache_key, result)
         return result
 
-    async def inline_media(self, text: str, offset: int, limit: int) -> list[InlineQueryResultPhoto]:
+    async def inline_media(
+        self,
+        text: str,
+        offset: int,
+        limit: int,
+    ) -> list[InlineQueryResultPhoto | InlineQueryResultCachedPhoto]:
         '''
-        Медиа при вводе @bot_name в поле ввода сообщения
+        Медиа при вводе @bot_name в поле ввода сообщения. Изображения \
+            с сохраненным `file_id` отдаются как `InlineQueryResultCachedPhoto`, \
+            и Telegram не скачивает их с наших `/i/` и `/t/`
 
         Args:
             text (str): Текст для поиска
@@ -168,12 +195,12 @@ class MediaService:
             limit (int): Предел количества изображений за один запрос
 
         Returns:
-            list[InlineQueryResultPhoto]: Найденные изображения
+            list[InlineQueryResultPhoto | InlineQueryResultCachedPhoto]: Найденные изображения
 
         Raises:
             NotFoundError: Не удалось найти
         '''
-        media = []
+        media: list[InlineQueryResultPhoto | InlineQueryResultCachedPhoto] = []
         found = await self.find_media(
             text,
             url_type='global',
@@ -184,11 +211,20 @@ class MediaService:
 
         for media_data in found:
             if media_data['type'] == 'img':
+                title = (media_data['text'] or '')[:64]
+                if media_data['file_id']:
+                    media.append(InlineQueryResultCachedPhoto(
+                        id=str(uuid.uuid4()),
+                        photo_file_id=media_data['file_id'],
+                        title=title,
+                        description=f"Отправлено из канала @{get_settings().telegram.channel_name}",
+                    ))
+                    continue
+
                 photo_url = media_data['url']
                 thumbnail_url = media_data['thumbnail_url']
                 if not photo_url or not thumbnail_url:
                     continue
-                title = (media_data['text'] or '')[:64]
                 width = media_data['width']
                 height = media_data['height']
                 media.append(InlineQueryResultPhoto(
@@ -202,35 +238,129 @@ class MediaService:
                 ))
         return media
 
-    async def inchat_media(self, text: str) -> list[InputMediaAudio | InputMediaDocument | InputMediaPhoto | InputMediaVideo]:
+    async def inchat_media(
+        self,
+        text: str,
+        use_file_ids: bool = True,
+        ids: Collection[int] | None = None,
+    ) -> list[tuple[int, InputMediaPhoto | InputMediaVideo]]:
         '''
-        Медиа в чате с ботом
+        Медиа в чате с ботом. Медиафайлы, которые бот уже отправлял, \
+            отправляются по сохраненному `file_id` без загрузки из хранилища. \
+            Файлы больше `attachment.stream_threshold` читаются из хранилища \
+            частями прямо во время отправки. Остальные загружаются параллельно; \
+            файлы, которые не удалось загрузить за `attachment.fetch_timeout`, \
+            пропускаются
 
         Args:
             text (str): Текст для поиска
+            use_file_ids (bool): Использовать сохраненные `file_id`. \
+                По-умолчанию: `True`. `False` - загрузить все файлы заново, \
+                например если Telegram отклонил `file_id`
+            ids (Collection[int] | None): Только медиафайлы с этими ID. \
+                По-умолчанию: `None` - все найденные
 
         Returns:
-            list[InputMediaAudio|InputMediaDocument|InputMediaPhoto|InputMediaVideo]: Список найденных медиа
+            list[tuple[int, InputMediaPhoto|InputMediaVideo]]: ID медиафайла и медиа для отправки
 
         Raises:
             NotFoundError: Ничего не найдено
         '''
-        result = []
-        found = await self.find_media(text, 'local')
-        for media_data in found:
-            file_data = await download_file(media_data['url'])  # type: ignore
-            file: BytesIO = file_data['file']
-            buffered_file = BufferedInputFile(
-                file.getvalue(),
-                f'{file_data['name']}.{file_data['ext']}'
-            )
-
-            media: InputMediaAudio | InputMediaDocument | InputMediaPhoto | InputMediaVideo | None = None
+        settings = get_settings().attachment
+        found = [
+            media_data
+            for media_data in await self.find_media(text, 'local')
+            if media_data['type'] in ('img', 'vid')
+            and (ids is None or media_data['id'] in ids)
+        ]
+        semaphore = asyncio.Semaphore(settings.fetch_concurrency)
+
+        async def fetch(media_data: dict[str, Any]) -> str | InputFile | None:
+            if use_file_ids and media_data['file_id']:
+                return media_data['file_id']
+
+            object_name = media_data['object_name']
+            if (media_data['size'] or 0) > settings.stream_threshold:
+                return StorageInputFile(
+                    self.minio_service,
+                    object_name,
+                    chunk_size=settings.stream_chunk_size,
+                )
+
+            async with semaphore:
+                try:
+                    data = await asyncio.wait_for(
+                        self.minio_service.get_object_bytes(object_name),
+                        settings.fetch_timeout,
+                    )
+                except Exception as e:
+                    self.logger.warning(f'Не удалось загрузить {object_name}: {e!r}')
+                    return None
+            return BufferedInputFile(data, object_name.rsplit('/', 1)[-1])
+
+        files = await asyncio.gather(*[fetch(media_data) for media_data in found])
+
+        result: list[tuple[int, InputMediaPhoto | InputMediaVideo]] = []
+        for media_data, file in zip(found, files):
+            if file is None:
+                continue
+            media: InputMediaPhoto | InputMediaVideo
             if media_data['type'] == 'img':
-                media = InputMediaPhoto(media=buffered_file)
-            elif media_data['type'] == 'vid':
-                media = InputMediaVideo(media=buffered_file)
+                media = InputMediaPhoto(media=file)
+            else:
+                media = InputMediaVideo(media=file)
+            result.append((int(media_data['id']), media))
+        return result
 
+    @staticmethod
+    def get_file_id(message: Message) -> str | None:
+        '''
+        Получение `file_id` медиафайла из отправленного сообщения
+
+        Args:
+            message (Message): Сообщение, отправленное ботом
+
+        Returns:
+            str | None: `file_id`. `None` - в сообщении нет медиафайла
+        '''
+        if message.photo:
+            return message.photo[-1].file_id
+        for media in (message.video, message.animation, message.document, message.audio):
             if media:
-                result.append(media)
-        return result
+                return media.file_id
+        return None
+
+    async def save_file_ids(
+        self,
+        sent: list[tuple[int, InputMediaPhoto | InputMediaVideo]],
+        messages: list[Message],
+    ) -> None:
+        '''
+        Сохранение `file_id` медиафайлов, которые были загружены в Telegram \
+            при отправке, чтобы следующие отправки обходились без загрузки
+
+        Args:
+            sent (list[tuple[int, InputMediaPhoto|InputMediaVideo]]): Отправленные медиа в формате `inchat_media`
+            messages (list[Message]): Сообщения, которые вернул Telegram, в том же порядке
+        '''
+        file_ids: dict[int, str] = {}
+        for (attachment_id, media), message in zip(sent, messages):
+            if isinstance(media.media, str):
+                continue
+            file_id = self.get_file_id(message)
+            if file_id:
+                file_ids[attachment_id] = file_id
+
+        if file_ids:
+            await self.set_file_ids(file_ids)
+
+    async def set_file_ids(self, file_ids: dict[int, str]) -> None:
+        '''
+        Сохранение `file_id` медиафайлов в БД и в результатах поиска из кеша
+
+        Args:
+            file_ids (dict[int, str]): `file_id` по ID медиафайла
+        '''
+        await self.message_service.attachment_service.set_tg_file_ids(file_ids)
+        if self.search_cache is not None:
+            self.search_cache.set_file_ids(file_ids)
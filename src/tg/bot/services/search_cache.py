@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class SearchCache:
+    '''
+    Кеш результатов поиска медиа в памяти процесса: LRU с ограничением \
+        времени жизни записей. Сбрасывается после добавления постов, \
+        чтобы новые посты сразу попадали в выдачу
+    '''
+
+    def __init__(self, ttl: float = 600, max_size: int = 1000) -> None:
+        '''
+        Кеш результатов поиска медиа
+
+        Args:
+            ttl (float): Время жизни записи (секунд)
+            max_size (int): Максимум записей. При переполнении \
+                вытесняются давно не использованные
+        '''
+        self.ttl = ttl
+        self.max_size = max_size
+        self.__entries: OrderedDict[Hashable, tuple[list[dict[str, Any]], float]] = OrderedDict()
+
+    def get(self, key: Hashable) -> list[dict[str, Any]] | None:
+        '''
+        Получение результатов поиска
+
+        Args:
+            key (Hashable): Параметры поиска
+
+        Returns:
+            list[dict[str,Any]] | None: Копия результатов. `None` - нет в кеше или устарели
+        '''
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        result, expires = entry
+        if time.monotonic() >= expires:
+            del self.__entries[key]
+            return None
+        self.__entries.move_to_end(key)
+        return [dict(item) for item in result]
+
+    def set(self, key: Hashable, result: list[dict[str, Any]]) -> None:
+        '''
+        Сохранение результатов поиска
+
+        Args:
+            key (Hashable): Параметры поиска
+            result (list[dict[str,Any]]): Результаты поиска
+        '''
+        self.__entries[key] = ([dict(item) for item in result], time.monotonic() + self.ttl)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def set_file_ids(self, file_ids: dict[int, str]) -> int:
+        '''
+        Обновление `file_id` медиафайлов в сохраненных результатах, \
+            чтобы после загрузки в Telegram кеш не отдавал старые значения
+
+        Args:
+            file_ids (dict[int, str]): `file_id` по ID медиафайла
+
+        Returns:
+            int: Количество обновленных результатов
+        '''
+        updated = 0
+        for result, _ in self.__entries.values():
+            for item in result:
+                file_id = file_ids.get(item.get('id'))  # type: ignore
+                if file_id is not None and item.get('file_id') != file_id:
+                    item['file_id'] = file_id
+                    updated += 1
+        return updated
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self.__entries.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def clear(self) -> None:
+        '''
+        Сброс кеша
+        '''
+        self.__entries.clear()
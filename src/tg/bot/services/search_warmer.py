@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.database import async_session
+from bot_request.services.rollup import BotRequestRollupService
+from tg.bot.services.media import MediaService
+from tg.bot.services.search_cache import SearchCache
+from exceptions.exception import NotFoundError
+
+
+class SearchWarmer:
+    '''
+    Прогрев кеша поиска самыми частыми запросами. Периодически пополняет \
+        суточные счетчики запросов и выполняет поиск по `top_queries` \
+        самым частым запросам с теми же параметрами, что и inline-режим, \
+        поэтому сразу после запуска бота и после добавления постов \
+        популярные запросы отдаются из кеша
+    '''
+
+    def __init__(
+        self,
+        media_service_factory: Callable[[AsyncSession], Awaitable[MediaService]],
+        search_cache: SearchCache,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        top_queries: int = 50,
+        period: timedelta = timedelta(days=7),
+        interval: float = 300,
+        inline_limit: int = 50,
+        rollup_delay: float = 60,
+    ) -> None:
+        '''
+        Прогрев кеша поиска самыми частыми запросами
+
+        Args:
+            media_service_factory (Callable[[AsyncSession], Awaitable[MediaService]]): \
+                Создание сервиса медиа для сессии БД
+            search_cache (SearchCache): Кеш поиска
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            top_queries (int): Количество прогреваемых запросов
+            period (timedelta): За какой период учитываются запросы
+            interval (float): Период пополнения счетчиков и прогрева (секунд)
+            inline_limit (int): Количество результатов на страницу inline-режима
+            rollup_delay (float): Через сколько секунд запрос попадает в счетчики
+        '''
+        self.media_service_factory = media_service_factory
+        self.search_cache = search_cache
+        self.session_factory = session_factory
+        self.top_queries = top_queries
+        self.period = period
+        self.interval = interval
+        self.inline_limit = inline_limit
+        self.rollup_delay = rollup_delay
+        self.logger = logging.getLogger('tg_logger')
+        self.__warm_requested = asyncio.Event()
+
+    async def rollup(self) -> int:
+        '''
+        Пополнение суточных счетчиков новыми запросами
+
+        Returns:
+            int: Количество обновленных счетчиков
+        '''
+        async with self.session_factory() as db:
+            return await BotRequestRollupService(db, delay=self.rollup_delay).rollup()
+
+    async def warm(self) -> int:
+        '''
+        Поиск по самым частым запросам, которых еще нет в кеше
+
+        Returns:
+            int: Количество прогретых запросов
+        '''
+        warmed = 0
+        async with self.session_factory() as db:
+            queries = await BotRequestRollupService(db).get_top_queries(
+                self.top_queries,
+                since=datetime.now(UTC) - self.period,
+            )
+            media_service = await self.media_service_factory(db)
+            for query in queries:
+                if (query, 'global', True, 0, self.inline_limit) in self.search_cache:
+                    continue
+                try:
+                    await media_service.find_media(
+                        query, 'global', reverse=True, offset=0, limit=self.inline_limit
+                    )
+                except NotFoundError:
+                    continue
+                warmed += 1
+        return warmed
+
+    def invalidate(self) -> None:
+        '''
+        Сброс кеша поиска после добавления постов и запрос повторного прогрева
+        '''
+        self.search_cache.clear()
+        self.__warm_requested.set()
+
+    async def run(self) -> None:
+        '''
+        Периодическое пополнение счетчиков и прогрев кеша, а также \
+            прогрев после `invalidate`. Работает до отмены задачи
+        '''
+        while True:
+            self.__warm_requested.clear()
+            try:
+                await self.rollup()
+                warmed = await self.warm()
+                if warmed:
+                    self.logger.info(f'Прогрето запросов поиска: {warmed}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f'Не удалось прогреть кеш поиска: {e}')
+
+            try:
+                await asyncio.wait_for(self.__warm_requested.wait(), self.interval)
+            except TimeoutError:
+                pass
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import BufferedInputFile
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from db.database import async_session
+from bot_request.services.rollup import BotRequestRollupService
+from tg.bot.services.media import MediaService
+from exceptions.exception import NotFoundError
+
+
+class FileIdWarmer:
+    '''
+    Фоновое получение `file_id` для популярных изображений. Изображения \
+        из результатов самых частых запросов один раз отправляются в \
+        служебный чат, а полученные `file_id` сохраняются, после чего \
+        inline-режим отдает их как `InlineQueryResultCachedPhoto` \
+        и Telegram больше не скачивает их с `/i/` и `/t/`
+    '''
+
+    def __init__(
+        self,
+        bot: Bot,
+        media_service_factory: Callable[[AsyncSession], Awaitable[MediaService]],
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+        send_delay: float = 1,
+        period: timedelta = timedelta(days=30),
+    ) -> None:
+        '''
+        Фоновое получение `file_id` для популярных изображений
+
+        Args:
+            bot (Bot): Бот
+            media_service_factory (Callable[[AsyncSession], Awaitable[MediaService]]): \
+                Создание сервиса медиа для сессии БД
+            session_factory (async_sessionmaker[AsyncSession]): Фабрика сессий БД
+            send_delay (float): Пауза между отправками в служебный чат (секунд)
+            period (timedelta): За какой период учитываются запросы
+        '''
+        self.bot = bot
+        self.media_service_factory = media_service_factory
+        self.session_factory = session_factory
+        self.send_delay = send_delay
+        self.period = period
+        self.logger = logging.getLogger('tg_logger')
+        self.__settings = get_settings().telegram
+
+    async def __upload(self, media_service: MediaService, media_data: dict) -> str | None:
+        '''
+        Отправка изображения в служебный чат
+
+        Args:
+            media_service (MediaService): Сервис медиа
+            media_data (dict): Изображение в формате `MediaService.find_media`
+
+        Returns:
+            str | None: `file_id`. `None` - не удалось отправить
+        '''
+        full_file_name = f'{media_data["name"]}.{media_data["ext"]}'
+        data = await media_service.minio_service.get_object_bytes(full_file_name)
+
+        while True:
+            try:
+                message = await self.bot.send_photo(
+                    self.__settings.storage_chat_id,  # type: ignore
+                    BufferedInputFile(data, full_file_name),
+                    disable_notification=True,
+                )
+                break
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+
+        try:
+            await message.delete()
+        except TelegramBadRequest:
+            pass
+        return media_service.get_file_id(message)
+
+    async def warm(self) -> int:
+        '''
+        Получение `file_id` для изображений из результатов самых частых \
+            запросов, у которых его еще нет
+
+        Returns:
+            int: Количество сохраненных `file_id`
+        '''
+        saved = 0
+        async with self.session_factory() as db:
+            media_service = await self.media_service_factory(db)
+            queries = await BotRequestRollupService(db).get_top_queries(
+                self.__settings.file_id_warm_top_queries,
+                since=datetime.now(UTC) - self.period,
+            )
+
+            pending: dict[int, dict] = {}
+            for query in queries:
+                try:
+                    found = await media_service.find_media(query, 'global', reverse=True)
+                except NotFoundError:
+                    continue
+                for media_data in found:
+                    if media_data['type'] == 'img' and not media_data['file_id']:
+                        pending.setdefault(media_data['id'], media_data)  # type: ignore
+                if len(pending) >= self.__settings.file_id_warm_batch:
+                    break
+
+            for attachment_id, media_data in list(pending.items())[:self.__settings.file_id_warm_batch]:
+                try:
+                    file_id = await self.__upload(media_service, media_data)
+                except Exception as e:
+                    self.logger.warning(f'Не удалось получить file_id для {media_data["name"]}: {e}')
+                    continue
+                if file_id:
+                    await media_service.set_file_ids({attachment_id: file_id})
+                    await db.commit()
+                    saved += 1
+                await asyncio.sleep(self.send_delay)
+        return saved
+
+    async def run(self) -> None:
+        '''
+        Периодическое получение `file_id`. Работает до отмены задачи
+        '''
+        while True:
+            try:
+                saved = await self.warm()
+                if saved:
+                    self.logger.info(f'Сохранено file_id: {saved}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f'Не удалось получить file_id: {e}')
+            await asyncio.sleep(self.__settings.file_id_warm_interval)
@@ -1,14 +1,18 @@
 import logging
 from typing import Any
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.strategy_options import _AttrType
 
 from base.service import BaseService
+from db.database import replica_router
+from db.events import after_commit
 from user.repositories.repository import UserRepository
 from user.models.model import UserModel
 from role.services.service import RoleService
 from user.schemas.schema import UserSimpleSchema
 from permission.services.service import PermissionService
+from permission.services.cache import CachedUser
 
 FORBIDDEN_MSG = 'Доступ запрещен'
 
@@ -18,12 +22,20 @@ class UserService(BaseService[UserModel]):
     Бизнес-логика пользователя
     '''
 
-    def __init__(self, db: AsyncSession, permission_service: PermissionService):
+    def __init__(
+        self,
+        db: AsyncSession,
+        permission_service: PermissionService,
+        read_db: AsyncSession | None = None,
+    ):
         '''
         Бизнес-логика пользователя
 
         Args:
             db (AsyncSession): Асинхронная сессия БД
+            permission_service (PermissionService): Сервис доступа
+            read_db (AsyncSession | None): Сессия для чтения роли пользователя \
+                (реплика). По-умолчанию: `None` - `db`
         '''
         super().__init__(
             UserRepository(db),
@@ -33,6 +45,7 @@ class UserService(BaseService[UserModel]):
         )
         self.role_service = RoleService(db)
         self.permission_service = permission_service
+        self.read_db = read_db or db
 
     async def get_all(
         self,
@@ -77,31 +90,83 @@ class UserService(BaseService[UserModel]):
 
     async def get_by_id_and_name(self, id: int, username: str | None) -> UserModel:
         '''
-        Получить пользователя по его id и username
+        Получить пользователя по его id и username. Нового пользователя \
+            создает с ролью "user". Связи пользователя (роль, запросы) \
+            не подгружаются
 
         Raises:
-            RuntimeError: get_db() did not yield a session
+            WasNotCreatedError: Пользователь не был создан
 
         Returns:
             UserModel: SQLAlchemy модель пользователя
         '''
-        filter = {'id': id}
-        user: UserModel | None = None
-        if not await self.exists(filter, raise_exc=False):
-            await self.create(UserModel.from_schema(
+        user, _ = await self.get_or_create(
+            UserModel.from_schema(
                 UserSimpleSchema(id=id, user_name=username, role_id=2)
-            ))
-        user = await self.get(filter, [UserModel.role])
-        if not user:
-            raise RuntimeError("Пользователь не был создан")
+            ),
+            ['id'],
+            load_relationships=False,
+        )
+        return user
+
+    async def get_cached(self, id: int, username: str | None) -> CachedUser:
+        '''
+        Получить пользователя для проверки доступа. Роль берется из кеша, \
+            к БД запрос идет, только если пользователя нет в кеше. Роль \
+            читается из `read_db`, новый пользователь создается в основной БД
+
+        Args:
+            id (int): Идентификатор пользователя
+            username (str | None): @username
+
+        Returns:
+            CachedUser: Пользователь и его роль
+        '''
+        cache = self.permission_service.cache
+        user = cache.get_user(id)
+        if user is None:
+            row = (await self.read_db.execute(
+                select(UserModel.id, UserModel.user_name, UserModel.role_id)
+                .where(UserModel.id == id)
+            )).one_or_none()
+            if row is not None:
+                user = CachedUser(*row)
+            else:
+                model = await self.get_by_id_and_name(id, username)
+                user = CachedUser(model.id, model.user_name, model.role_id)
+            cache.set_user(user)
         return user
 
-    async def create(self, model: UserModel) -> UserModel:
+    async def update(self, model: UserModel, filter: dict[str, Any], refresh: bool = True) -> UserModel:
+        '''
+        Обновление пользователя. После фиксации транзакции пользователь \
+            удаляется из кеша доступа, чтобы смена роли применилась сразу
+
+        Args:
+            model (UserModel): SQLAlchemy-модель пользователя
+            filter (dict[str, Any]): фильтр поиска пользователя в БД. \
+                `{"Название_атрибута": Значение_атрибута}`
+            refresh (bool): Перечитать пользователя со связанными моделями
+
+        Returns:
+            UserModel: SQLAlchemy-модель пользователя
+
+        Raises:
+            NotFoundError: Не удалось найти пользователя
+        '''
+        model = await super().update(model, filter, refresh)
+        user_id = model.id
+        after_commit(self.repository.db, lambda: self.permission_service.cache.invalidate_user(user_id))
+        after_commit(self.repository.db, replica_router.mark_written)
+        return model
+
+    async def create(self, model: UserModel, refresh: bool = True) -> UserModel:
         '''
         Создать новую сущность в базе данных
 
         Args:
             model (UserModel): Данные для создания пользователя
+            refresh (bool): Перечитать пользователя со связанными моделями
 
         Returns:
             UserModel: SQLAlchemy-модель пользователя
@@ -112,7 +177,7 @@ class UserService(BaseService[UserModel]):
             AlreadyExistsError: Пользователь уже существует
         '''
         await self.role_service.exists({"id": model.role_id})
-        return await super().create(model)
+        return await super().create(model, refresh)
 
     async def check_permission(self, command: str, id: int, username: str | None) -> tuple[bool, str]:
         '''
@@ -120,12 +185,13 @@ class UserService(BaseService[UserModel]):
 
         Args:
             command (str): Отправленная команда без /
-            message (types.Message): Отправленное пользователем сообщение
+            id (int): Идентификатор пользователя
+            username (str | None): @username
 
         Returns:
             tuple[bool, str]: Разрешить/запретить доступ; ответ бота
         '''
-        user = await self.get_by_id_and_name(id, username)
+        user = await self.get_cached(id, username)
         permitted = await self.permission_service.check_permission(
             command, user, raise_exc=False
         )